@@ -1,21 +1,15 @@
+import asyncio
 from datetime import datetime, timezone
 from typing import Annotated, List, Optional
 
 import fastapi
-from fastapi import Depends, Request, Form, Body, Query
+from fastapi import Depends, Request, Form, Body, Header, Query
 from fastapi.responses import FileResponse, Response, StreamingResponse
 from pathlib import Path
 import json
 
 from pydantic_ai.messages import (
-    ModelMessage,
-    ModelRequest,
-    ModelResponse,
     SystemPromptPart,
-    TextPart,
-    UserPromptPart,
-    ToolCallPart,
-    ToolReturnPart,
     FinalResultEvent,
     FunctionToolCallEvent,
     FunctionToolResultEvent,
@@ -24,14 +18,18 @@ from pydantic_ai.messages import (
     TextPartDelta,
     ToolCallPartDelta,
 )
-from pydantic_ai.exceptions import UnexpectedModelBehavior
 from pydantic_ai import Agent
 from pydantic import BaseModel
 
-from app.models.chat_models import ChatMessage
 from app.models.chat_message_request import ChatMessageRequest
 from app.services.chat_database import Database
+from app.services.chat_message_renderer import to_chat_message
 from app.services.agent_service import AgentService
+from app.models.user_context import UserContext
+from app.config.chat_config import chat_config
+from app.services.upload_janitor import upload_janitor
+from app.services.chat_history_window import chat_history_window
+from app.services.chat_stream_encoder import ChatStreamEncoder
 
 
 router = fastapi.APIRouter()
@@ -39,138 +37,84 @@ router = fastapi.APIRouter()
 _agent = None
 
 
-def get_agent(
-    dietaryPreferences: List[str],
-    allergies: List[str],
-    selectedGoals: List[str],
-):
-    """Get or create the chat agent."""
+def get_agent() -> Agent:
+    """Get or create the chat agent, shared by all users; profiles are passed per run."""
     global _agent
     if _agent is None:
-        _agent = AgentService.create_chat_agent(
-            dietaryPreferences=dietaryPreferences,
-            allergies=allergies,
-            selectedGoals=selectedGoals,
-        )
+        _agent = AgentService.create_chat_agent()
     return _agent
 
 
 STATIC_DIR = Path(__file__).parent.parent / "static"
 
 
-def to_chat_message(m: ModelMessage) -> Optional[ChatMessage]:
-    """Convert a model message to a chat message format."""
-    if isinstance(m, ModelRequest):
-        user_prompt_part_found = any(
-            isinstance(part, UserPromptPart) for part in m.parts
-        )
-        tool_return_parts = [
-            part for part in m.parts if isinstance(part, ToolReturnPart)
-        ]
-
-        if user_prompt_part_found:
-            for part in m.parts:
-                if isinstance(part, UserPromptPart):
-                    assert isinstance(part.content, str)
-                    return {
-                        "role": "user",
-                        "timestamp": part.timestamp.isoformat(),
-                        "content": part.content,
-                    }
-            return None
-
-        if tool_return_parts:
-            message = {
-                "role": "model",
-                "timestamp": tool_return_parts[0].timestamp.isoformat(),
-                "content": "",
-                "tool_returns": [],
-            }
-            for part in tool_return_parts:
-                message["tool_returns"].append(
-                    {
-                        "tool_call_id": part.tool_call_id,
-                        "content": part.content,
-                        "tool_name": getattr(part, "tool_name", "tool_return"),
-                    }
-                )
-            return message
+async def get_chat_db(request: Request) -> Database:
+    """Dependency returning the application-wide chat database, created at startup."""
+    database = getattr(request.app.state, "chat_db", None)
+    if database is None:
+        raise fastapi.HTTPException(status_code=503, detail="Chat database is not configured")
+    return database
 
-        return None
 
-    elif isinstance(m, ModelResponse):
-        content_parts = []
-        tool_calls = []
-        tool_returns = []
+def _chat_row_line(row: dict) -> Optional[str]:
+    """
+    One stored, pre-rendered message as an NDJSON line, with its id added as
+    the last key, or None if the stored JSON is not an object.
+    """
+    rendered = row["rendered"].strip()
+    if rendered.startswith("{") and rendered.endswith("}") and rendered[1:-1].strip():
+        # Splice the id into the JSON object instead of parsing it
+        return f'{rendered[:-1]}, "id": {json.dumps(row["id"])}}}\n'
 
-        for part in m.parts:
-            if isinstance(part, TextPart):
-                content_parts.append(part.content)
-            elif isinstance(part, ToolCallPart):
-                tool_calls.append(
-                    {
-                        "tool_name": part.tool_name,
-                        "args": part.args,
-                        "tool_call_id": part.tool_call_id,
-                    }
-                )
-            elif isinstance(part, ToolReturnPart):
-                tool_name = part.tool_name if hasattr(part, "tool_name") else None
-                if not tool_name and hasattr(part, "content"):
-                    tool_name = (
-                        "calculate_nutrition_by_food_description"  # Our main tool
-                    )
-
-                content = part.content
-                if hasattr(content, "model_dump"):
-                    content = content.model_dump()
-
-                tool_returns.append(
-                    {
-                        "tool_call_id": part.tool_call_id,
-                        "content": content,
-                        "tool_name": tool_name,
-                    }
-                )
-
-        content = "".join(content_parts)
-
-        message = {
-            "role": "model",
-            "timestamp": m.timestamp.isoformat(),
-            "content": content,
-        }
-
-        if tool_calls:
-            message["tool_calls"] = tool_calls
-        if tool_returns:
-            message["tool_returns"] = tool_returns
-
-        return message
-
-    raise UnexpectedModelBehavior(f"Unexpected message type for chat app: {m}")
+    # Not a non-empty object as render_chat_message writes it; re-encode it
+    try:
+        message = json.loads(rendered)
+    except ValueError:
+        message = None
+    if not isinstance(message, dict):
+        print(f"Skipping chat message {row['id']}: stored rendering is not a JSON object")
+        return None
+    message["id"] = row["id"]
+    return json.dumps(message) + "\n"
 
 
-async def get_chat_db():
-    """Dependency to get chat database instance."""
-    db = await Database.connect()
-    return db
+def _stream_chat_rows(rows: List[dict]):
+    """Yield the stored, pre-rendered messages as NDJSON lines."""
+    for row in rows:
+        if row["rendered"]:
+            line = _chat_row_line(row)
+            if line is not None:
+                yield line.encode("utf-8")
 
 
 @router.get("/messages")
 async def get_chat_messages(
     user_id: Annotated[str, Query(..., description="User ID to get messages for")],
+    database: Annotated[Database, Depends(get_chat_db)],
+    before: Annotated[
+        Optional[int], Query(description="Return messages older than this message id")
+    ] = None,
+    after: Annotated[
+        Optional[int], Query(description="Return messages newer than this message id")
+    ] = None,
+    limit: Annotated[int, Query(ge=1, le=500, description="Maximum number of stored rows")] = 50,
 ) -> Response:
-    """Get all chat messages for a specific user."""
-    try:
-        database = await get_chat_db()
-        msgs = await database.get_messages(user_id)
-        chat_messages = [to_chat_message(m) for m in msgs]
-        filtered_messages = [msg for msg in chat_messages if msg is not None]
+    """
+    Get one page of chat messages for a specific user, as NDJSON.
+
+    Without a cursor the latest page is returned. Messages are oldest first and
+    carry their id. When more messages may exist in the paging direction, the
+    X-Next-Cursor header holds the id to pass as the same parameter (before,
+    or after) for the next page.
+    """
+    if before is not None and after is not None:
+        raise fastapi.HTTPException(
+            status_code=400, detail="Pass either before or after, not both"
+        )
 
-        return Response(
-            b"\n".join(json.dumps(msg).encode("utf-8") for msg in filtered_messages),
-            media_type="text/plain",
+    try:
+        rows = await database.get_message_page(
+            user_id, before=before, after=after, limit=limit
         )
     except Exception as e:
         print(f"Error in get_chat_messages: {e}")
@@ -180,15 +124,35 @@ async def get_chat_messages(
             status_code=500,
         )
 
+    headers = {}
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = str(rows[-1]["id"] if after is not None else rows[0]["id"])
+
+    return StreamingResponse(
+        _stream_chat_rows(rows), media_type="application/x-ndjson", headers=headers
+    )
+
 
 @router.post("/messages")
-async def post_chat_message(messagePayload: ChatMessageRequest) -> StreamingResponse:
-    """Send a chat message and stream the response."""
+async def post_chat_message(
+    messagePayload: ChatMessageRequest,
+    database: Annotated[Database, Depends(get_chat_db)],
+    stream: Annotated[
+        Optional[str],
+        Query(description="Streaming protocol: full (default) or delta"),
+    ] = None,
+    x_chat_stream: Annotated[Optional[str], Header(alias="X-Chat-Stream")] = None,
+) -> StreamingResponse:
+    """
+    Send a chat message and stream the response.
+
+    Clients opt into delta streaming with ?stream=delta or an X-Chat-Stream:
+    delta header; see ChatStreamEncoder for the line format.
+    """
+    stream_mode = ChatStreamEncoder.negotiate(stream, x_chat_stream)
 
     async def stream_messages():
         """Streams new line delimited JSON `Message`s to the client using node-by-node iteration."""
-        database = await get_chat_db()
-
         prompt = messagePayload.prompt
         user_id = messagePayload.user_id
         local_time = messagePayload.local_time
@@ -199,16 +163,22 @@ async def post_chat_message(messagePayload: ChatMessageRequest) -> StreamingResp
 
         if foodimage:
             prompt += f"\n\n[User provided an image: {foodimage}]"
+            # Chat history references the image, so keep it out of upload eviction
+            await asyncio.to_thread(upload_janitor.pin_url, foodimage)
 
         messages = await database.get_messages(user_id)
+        summary = await chat_history_window.get_summary(database, user_id)
+        history = chat_history_window.apply(messages, summary)
 
-        agent = get_agent(
-            dietaryPreferences=dietary_preferences or [],
-            allergies=allergies or [],
-            selectedGoals=selected_goals or [],
+        agent = get_agent()
+        user_context = UserContext(
+            user_id=user_id,
+            dietary_preferences=dietary_preferences,
+            allergies=allergies,
+            selected_goals=selected_goals,
+            max_concurrent_tools=chat_config.tool_concurrency,
         )
 
-        accumulated_text = ""
         tool_calls = []
         tool_returns = []
         base_timestamp = None
@@ -223,7 +193,11 @@ async def post_chat_message(messagePayload: ChatMessageRequest) -> StreamingResp
         else:
             base_timestamp = datetime.now(timezone.utc)
 
-        async with agent.iter(prompt, message_history=messages) as run:
+        encoder = ChatStreamEncoder(base_timestamp.isoformat(), mode=stream_mode)
+
+        async with agent.iter(
+            prompt, message_history=history.messages, deps=user_context
+        ) as run:
             async for node in run:
                 if Agent.is_user_prompt_node(node):
                     user_message = {
@@ -231,7 +205,7 @@ async def post_chat_message(messagePayload: ChatMessageRequest) -> StreamingResp
                         "timestamp": base_timestamp.isoformat(),
                         "content": prompt,
                     }
-                    yield json.dumps(user_message).encode("utf-8") + b"\n"
+                    yield encoder.message(user_message)
 
                 elif Agent.is_model_request_node(node):
                     if base_timestamp is None:
@@ -241,32 +215,21 @@ async def post_chat_message(messagePayload: ChatMessageRequest) -> StreamingResp
                         async for event in request_stream:
                             if isinstance(event, PartDeltaEvent):
                                 if isinstance(event.delta, TextPartDelta):
-                                    accumulated_text += event.delta.content_delta
-                                    partial_message = {
-                                        "role": "model",
-                                        "timestamp": base_timestamp.isoformat(),
-                                        "content": accumulated_text,
-                                        "is_partial": True,
-                                    }
-                                    yield json.dumps(partial_message).encode(
-                                        "utf-8"
-                                    ) + b"\n"
+                                    yield encoder.text_delta(event.delta.content_delta)
 
                             elif isinstance(event, FinalResultEvent):
-                                if accumulated_text and not event.tool_name:
+                                if encoder.accumulated_text and not event.tool_name:
                                     final_message = {
                                         "role": "model",
                                         "timestamp": base_timestamp.isoformat(),
-                                        "content": accumulated_text,
+                                        "content": encoder.accumulated_text,
                                         "is_final": True,
                                     }
                                     if tool_calls:
                                         final_message["tool_calls"] = tool_calls
                                     if tool_returns:
                                         final_message["tool_returns"] = tool_returns
-                                    yield json.dumps(final_message).encode(
-                                        "utf-8"
-                                    ) + b"\n"
+                                    yield encoder.message(final_message)
 
                 elif Agent.is_call_tools_node(node):
                     async with node.stream(run.ctx) as handle_stream:
@@ -286,9 +249,7 @@ async def post_chat_message(messagePayload: ChatMessageRequest) -> StreamingResp
                                     "tool_calls": [tool_call],
                                     "is_tool_call": True,
                                 }
-                                yield json.dumps(tool_call_message).encode(
-                                    "utf-8"
-                                ) + b"\n"
+                                yield encoder.message(tool_call_message)
 
                             elif isinstance(event, FunctionToolResultEvent):
                                 content = event.result.content
@@ -313,9 +274,7 @@ async def post_chat_message(messagePayload: ChatMessageRequest) -> StreamingResp
                                     "tool_returns": [tool_return],
                                     "is_tool_result": True,
                                 }
-                                yield json.dumps(tool_result_message).encode(
-                                    "utf-8"
-                                ) + b"\n"
+                                yield encoder.message(tool_result_message)
 
                 elif Agent.is_end_node(node):
                     if run.result and run.result.output:
@@ -329,21 +288,28 @@ async def post_chat_message(messagePayload: ChatMessageRequest) -> StreamingResp
                             final_message["tool_calls"] = tool_calls
                         if tool_returns:
                             final_message["tool_returns"] = tool_returns
-                        yield json.dumps(final_message).encode("utf-8") + b"\n"
+                        yield encoder.message(final_message)
 
         result = run.result
-        await database.add_messages(user_id, result.new_messages_json(), base_timestamp)
+        await database.add_messages(
+            user_id, result.new_messages_json(), base_timestamp, result.new_messages()
+        )
+        chat_history_window.schedule_summary(
+            database, user_id, messages, summary, history.cutoff
+        )
 
     return StreamingResponse(stream_messages(), media_type="text/plain")
 
 
 @router.get("/messages/{message_id}/tools")
 async def get_message_tools(
-    message_id: str, user_id: Annotated[str, Query(..., description="User ID")]
+    message_id: str,
+    user_id: Annotated[str, Query(..., description="User ID")],
+    database: Annotated[Database, Depends(get_chat_db)],
 ) -> Response:
     """Get tool information for a specific message."""
-    database = await get_chat_db()
-    message_data = await database.supabase_db.get_message_by_id(user_id, message_id)
+    message = await database.get_message_by_id(user_id, message_id)
+    message_data = to_chat_message(message) if message else None
 
     if not message_data:
         return Response(
@@ -14,7 +14,19 @@ class ChatConfig:
     def __init__(self):
         self.gemini_api_key = self._get_gemini_key()
         self.model_name = "gemini-2.0-flash-exp"
+        # History sent to the model: at most this many messages, and the last
+        # history_max_turns turns that fit history_token_budget (estimated at
+        # 4 characters per token). Older turns are folded into a stored summary.
         self.max_messages = 100
+        self.history_max_turns = int(
+            get_env_variable_safe("CHAT_HISTORY_MAX_TURNS", "10")
+        )
+        self.history_token_budget = int(
+            get_env_variable_safe("CHAT_HISTORY_TOKEN_BUDGET", "6000")
+        )
+        self.history_summary_enabled = (
+            get_env_variable_safe("CHAT_HISTORY_SUMMARY_ENABLED", "true").lower() == "true"
+        )
         self.system_prompt = """## Role & Expertise
 
 You are CalAI, an expert nutrition assistant that uses an LLM to orchestrate image + text tools and produce reliable nutrient estimates
@@ -127,7 +139,37 @@ Structure responses with:
 Remember: Your goal is to empower users with knowledge and practical tools to make informed nutrition decisions that support their health and lifestyle goals.
 """
         self.enable_debug = True
-        self.database_file = ".chat_app_messages.sqlite"
+        self.database_file = get_env_variable_safe(
+            "CHAT_DATABASE_FILE", ".chat_app_messages.sqlite"
+        )
+
+        # Tool calls of one agent run that may execute concurrently
+        self.tool_concurrency = int(get_env_variable_safe("CHAT_TOOL_CONCURRENCY", "3"))
+
+        # Write-behind persistence of chat messages
+        self.write_batch_size = int(get_env_variable_safe("CHAT_WRITE_BATCH_SIZE", "200"))
+        self.write_flush_interval_seconds = float(
+            get_env_variable_safe("CHAT_WRITE_FLUSH_INTERVAL_SECONDS", "1.0")
+        )
+        self.write_max_buffered_rows = int(
+            get_env_variable_safe("CHAT_WRITE_MAX_BUFFERED_ROWS", "10000")
+        )
+
+        # Delta streaming: send the full text every this many deltas (0 disables)
+        self.stream_snapshot_every = int(
+            get_env_variable_safe("CHAT_STREAM_SNAPSHOT_EVERY", "50")
+        )
+
+        # Parsed per-user history kept in memory between turns
+        self.history_cache_max_users = int(
+            get_env_variable_safe("CHAT_HISTORY_CACHE_MAX_USERS", "1000")
+        )
+        self.history_cache_max_bytes = int(
+            get_env_variable_safe("CHAT_HISTORY_CACHE_MAX_BYTES", str(256 * 1024 * 1024))
+        )
+        self.history_cache_ttl_seconds = int(
+            get_env_variable_safe("CHAT_HISTORY_CACHE_TTL_SECONDS", "900")
+        )
 
     def _get_gemini_key(self) -> Optional[str]:
         """Get Google Gemini API key from environment variables."""
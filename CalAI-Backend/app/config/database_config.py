@@ -0,0 +1,36 @@
+"""
+Configuration settings for the chat database.
+"""
+
+from app.utils.envManager import get_env_variable_safe
+
+
+class DatabaseConfig:
+    """Configuration for chat storage and the application-wide Supabase client."""
+
+    def __init__(self):
+        # Chat storage: "supabase", or "sqlite" (ChatConfig.database_file) for single-node deployments
+        self.chat_storage_backend = get_env_variable_safe(
+            "CHAT_STORAGE_BACKEND", "supabase"
+        ).lower()
+        self.sqlite_read_threads = int(
+            get_env_variable_safe("CHAT_SQLITE_READ_THREADS", "4")
+        )
+
+        self.supabase_url = get_env_variable_safe("SUPABASE_URL", "")
+        self.supabase_key = get_env_variable_safe("SUPABASE_KEY", "")
+
+        # One pooled client is shared by all requests for the life of the app
+        self.max_connections = int(
+            get_env_variable_safe("SUPABASE_MAX_CONNECTIONS", "20")
+        )
+        self.keepalive_expiry_seconds = float(
+            get_env_variable_safe("SUPABASE_KEEPALIVE_EXPIRY_SECONDS", "30")
+        )
+        self.connect_timeout = float(
+            get_env_variable_safe("SUPABASE_CONNECT_TIMEOUT", "5")
+        )
+        self.timeout = float(get_env_variable_safe("SUPABASE_TIMEOUT", "30"))
+
+
+database_config = DatabaseConfig()
@@ -0,0 +1,42 @@
+"""
+Configuration settings for outbound HTTP connections.
+"""
+
+from app.utils.envManager import get_env_variable_safe
+
+
+class HttpConfig:
+    """Configuration for the shared outbound HTTP connection pool."""
+
+    def __init__(self):
+        # Timeouts in seconds
+        self.connect_timeout = float(
+            get_env_variable_safe("HTTP_CONNECT_TIMEOUT", "5")
+        )
+        self.read_timeout = float(get_env_variable_safe("HTTP_READ_TIMEOUT", "10"))
+
+        # Pool sizing: total connections and connections kept per host
+        self.max_connections = int(
+            get_env_variable_safe("HTTP_MAX_CONNECTIONS", "100")
+        )
+        self.max_connections_per_host = int(
+            get_env_variable_safe("HTTP_MAX_CONNECTIONS_PER_HOST", "20")
+        )
+        self.keepalive_expiry_seconds = float(
+            get_env_variable_safe("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30")
+        )
+
+        # Retries for idempotent requests on connection errors and transient statuses
+        self.max_retries = int(get_env_variable_safe("HTTP_MAX_RETRIES", "2"))
+        self.retry_backoff_seconds = float(
+            get_env_variable_safe("HTTP_RETRY_BACKOFF_SECONDS", "0.3")
+        )
+        self.retry_statuses = (429, 502, 503, 504)
+
+        # HTTP/2 is used by the async client when the h2 package is installed
+        self.http2_enabled = (
+            get_env_variable_safe("HTTP2_ENABLED", "true").lower() == "true"
+        )
+
+
+http_config = HttpConfig()
@@ -0,0 +1,60 @@
+"""
+Configuration settings for the nutrition analysis pipeline.
+"""
+
+from app.utils.envManager import get_env_variable_safe
+
+
+class NutritionConfig:
+    """Configuration for nutrition analysis."""
+
+    def __init__(self):
+        # Result cache: "memory" (in-process LRU), "disk" or "none"
+        self.result_cache_backend = get_env_variable_safe(
+            "NUTRITION_CACHE_BACKEND", "memory"
+        ).lower()
+        self.result_cache_max_entries = int(
+            get_env_variable_safe("NUTRITION_CACHE_MAX_ENTRIES", "1024")
+        )
+        self.result_cache_ttl_seconds = int(
+            get_env_variable_safe("NUTRITION_CACHE_TTL_SECONDS", str(24 * 60 * 60))
+        )
+        self.result_cache_dir = get_env_variable_safe(
+            "NUTRITION_CACHE_DIR", ".nutrition_cache"
+        )
+
+        # Near-duplicate detection over each user's recently analysed images
+        self.near_duplicate_enabled = (
+            get_env_variable_safe("NUTRITION_NEAR_DUPLICATE_ENABLED", "true").lower()
+            == "true"
+        )
+        self.near_duplicate_max_distance = int(
+            get_env_variable_safe("NUTRITION_NEAR_DUPLICATE_MAX_DISTANCE", "6")
+        )
+        self.near_duplicate_max_images_per_user = int(
+            get_env_variable_safe("NUTRITION_NEAR_DUPLICATE_MAX_IMAGES", "50")
+        )
+
+        # Image preprocessing before the Gemini call
+        self.image_preprocessing_enabled = (
+            get_env_variable_safe("IMAGE_PREPROCESSING_ENABLED", "true").lower()
+            == "true"
+        )
+        self.image_max_edge = int(get_env_variable_safe("IMAGE_MAX_EDGE", "1536"))
+        self.image_jpeg_quality = int(
+            get_env_variable_safe("IMAGE_JPEG_QUALITY", "85")
+        )
+
+        # Batch endpoint limits
+        self.batch_max_items = int(
+            get_env_variable_safe("NUTRITION_BATCH_MAX_ITEMS", "100")
+        )
+        self.batch_default_concurrency = int(
+            get_env_variable_safe("NUTRITION_BATCH_CONCURRENCY", "4")
+        )
+        self.batch_max_concurrency = int(
+            get_env_variable_safe("NUTRITION_BATCH_MAX_CONCURRENCY", "16")
+        )
+
+
+nutrition_config = NutritionConfig()
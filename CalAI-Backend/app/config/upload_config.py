@@ -0,0 +1,66 @@
+"""
+Configuration settings for uploaded images.
+"""
+
+from typing import List
+
+from app.utils.envManager import get_env_variable_safe
+
+
+class UploadConfig:
+    """Configuration for the uploads store and the URLs it is served under."""
+
+    def __init__(self):
+        self.upload_dir = get_env_variable_safe("UPLOAD_DIR", "uploads")
+        self.base_url = get_env_variable_safe(
+            "BASE_URL", "http://localhost:8000"
+        ).rstrip("/")
+        # Other public URLs this server is reached under, e.g. an emulator host
+        self.url_aliases: List[str] = [
+            alias.strip().rstrip("/")
+            for alias in get_env_variable_safe("UPLOAD_URL_ALIASES", "").split(",")
+            if alias.strip()
+        ]
+
+        # Uploads are streamed to disk in chunks; larger files are rejected mid-stream
+        self.max_upload_bytes = int(
+            get_env_variable_safe("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024))
+        )
+        self.chunk_size_bytes = int(
+            get_env_variable_safe("UPLOAD_CHUNK_BYTES", str(1024 * 1024))
+        )
+
+        # Serving: names never change content, so responses are cacheable for long
+        self.cache_max_age_seconds = int(
+            get_env_variable_safe("UPLOAD_CACHE_MAX_AGE_SECONDS", str(365 * 24 * 60 * 60))
+        )
+        # Thumbnails are rendered on first request and kept next to the uploads
+        self.thumbnail_sizes: List[int] = sorted(
+            int(size)
+            for size in get_env_variable_safe("UPLOAD_THUMBNAIL_SIZES", "128,256,512").split(",")
+            if size.strip()
+        )
+        self.thumbnail_quality = int(
+            get_env_variable_safe("UPLOAD_THUMBNAIL_QUALITY", "80")
+        )
+
+        # Background eviction; a limit of 0 disables it
+        self.janitor_enabled = (
+            get_env_variable_safe("UPLOAD_JANITOR_ENABLED", "true").lower() == "true"
+        )
+        self.max_age_seconds = int(
+            get_env_variable_safe("UPLOAD_MAX_AGE_SECONDS", str(30 * 24 * 60 * 60))
+        )
+        self.max_total_bytes = int(
+            get_env_variable_safe("UPLOAD_MAX_TOTAL_BYTES", str(2 * 1024 * 1024 * 1024))
+        )
+        self.sweep_interval_seconds = int(
+            get_env_variable_safe("UPLOAD_SWEEP_INTERVAL_SECONDS", "600")
+        )
+        # Images sent in chat are pinned this long after they were last sent; 0 keeps pins forever
+        self.pin_ttl_seconds = int(
+            get_env_variable_safe("UPLOAD_PIN_TTL_SECONDS", str(90 * 24 * 60 * 60))
+        )
+
+
+upload_config = UploadConfig()
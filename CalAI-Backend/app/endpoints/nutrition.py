@@ -1,9 +1,13 @@
 import time
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from app.models.nutrition_input_payload import NutritionInputPayload
-from app.services.nutrition_service import NutritionService
+from app.models.nutrition_batch_payload import NutritionBatchPayload
+from app.services.async_nutrition_service import AsyncNutritionService
+from app.services.nutrition_batch_service import NutritionBatchService
+from app.services.image_service import ImageService
+from app.services.multipart_stream import check_content_length
 from app.models.service_response import NutritionServiceResponse, ErrorResponse
 from app.exceptions import BaseCalAIException, ValidationException
 from app.utils.error_handler import ErrorHandler
@@ -17,7 +21,7 @@ router = APIRouter()
     response_model=NutritionServiceResponse,
     description="Get nutrition information from an image and user input.",
 )
-def generate_nutrition_info(query: NutritionInputPayload, request: Request):
+async def generate_nutrition_info(query: NutritionInputPayload, request: Request):
     """
     Generate nutrition information from an image with comprehensive error handling.
 
@@ -31,16 +35,16 @@ def generate_nutrition_info(query: NutritionInputPayload, request: Request):
     start_time = time.time()
 
     try:
-        if not query.imageUrl:
+        if not query.imageUrl and not query.imageData:
             raise ValidationException(
-                message="Image imageUrl is required",
+                message="Image imageUrl or imageData is required",
                 error_code=ErrorCode.MISSING_REQUIRED_FIELD,
                 field="imageUrl",
                 constraint="required",
-                suggestion="Please provide a valid base64 encoded image",
+                suggestion="Please provide an image URL or a valid base64 encoded image",
             )
 
-        response = NutritionService.get_nutrition_data(
+        response = await AsyncNutritionService.get_nutrition_data(
             query=query,
         )
 
@@ -70,12 +74,109 @@ def generate_nutrition_info(query: NutritionInputPayload, request: Request):
         )
 
 
+@router.post(
+    "/get/file",
+    response_model=NutritionServiceResponse,
+    description="Get nutrition information from an uploaded image file and user input.",
+    # The body is parsed by the handler as it streams, so describe it here
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["image"],
+                        "properties": {
+                            "image": {
+                                "type": "string",
+                                "format": "binary",
+                                "description": "Food or barcode image",
+                            },
+                            "userId": {"type": "string"},
+                            "scanMode": {"type": "string"},
+                            "food_description": {"type": "string"},
+                            "dietaryPreferences": {"type": "array", "items": {"type": "string"}},
+                            "allergies": {"type": "array", "items": {"type": "string"}},
+                            "selectedGoals": {"type": "array", "items": {"type": "string"}},
+                        },
+                    }
+                }
+            },
+        }
+    },
+)
+async def generate_nutrition_info_from_file(request: Request):
+    """
+    Generate nutrition information from a multipart image upload in one round trip,
+    without storing the image under /uploads first.
+
+    The body is parsed straight from the request stream: the image is collected
+    in memory, never in a temporary file, and a body over the size limit is
+    rejected by its Content-Length or as soon as the image crosses the limit.
+    The image is sent as the `image` field; userId, scanMode, food_description,
+    dietaryPreferences, allergies and selectedGoals are the NutritionInputPayload
+    fields, sent as form fields (list fields repeated once per value).
+
+    Args:
+        request: FastAPI request object, read as the multipart body
+
+    Returns:
+        JSONResponse: Structured response with nutrition data or error information
+    """
+    start_time = time.time()
+
+    try:
+        check_content_length(request.headers.get("content-length"), ImageService.MAX_IMAGE_SIZE)
+        image_bytes, form = await ImageService.read_multipart_image(
+            request.stream(), request.headers.get("content-type", ""), field_name="image"
+        )
+
+        query = NutritionInputPayload(
+            userId=form.field("userId"),
+            scanMode=form.field("scanMode"),
+            food_description=form.field("food_description"),
+            dietaryPreferences=form.fields.get("dietaryPreferences", []),
+            allergies=form.fields.get("allergies", []),
+            selectedGoals=form.fields.get("selectedGoals", []),
+        )
+
+        response = await AsyncNutritionService.get_nutrition_data(
+            query=query, image_bytes=image_bytes
+        )
+
+        return JSONResponse(content=response.to_dict(), status_code=response.status)
+
+    except BaseCalAIException as e:
+        execution_time = time.time() - start_time
+        error_response = ErrorHandler.handle_custom_exception(
+            exception=e, request=request, execution_time=execution_time
+        )
+
+        return JSONResponse(
+            status_code=error_response.status_code, content=error_response.to_dict()
+        )
+
+    except Exception as e:
+        execution_time = time.time() - start_time
+        error_response = ErrorHandler.handle_unexpected_exception(
+            exception=e,
+            request=request,
+            execution_time=execution_time,
+            user_message="An unexpected error occurred while processing your nutrition request",
+        )
+
+        return JSONResponse(
+            status_code=error_response.status_code, content=error_response.to_dict()
+        )
+
+
 @router.post(
     "/description",
     response_model=NutritionServiceResponse,
     description="Get nutrition information from a description of food items.",
 )
-def generate_nutrition_info_from_description(
+async def generate_nutrition_info_from_description(
     query: NutritionInputPayload, request: Request
 ):
     """
@@ -98,7 +199,9 @@ def generate_nutrition_info_from_description(
                 suggestion="Please provide a valid description of the food items",
             )
 
-        response = NutritionService.log_food_nutrition_data_using_description(query)
+        response = await AsyncNutritionService.log_food_nutrition_data_using_description(
+            query
+        )
 
         return JSONResponse(content=response.to_dict(), status_code=response.status)
 
@@ -124,3 +227,43 @@ def generate_nutrition_info_from_description(
         return JSONResponse(
             status_code=error_response.status_code, content=error_response.to_dict()
         )
+
+
+@router.post(
+    "/batch",
+    description="Analyse many meals in one request, streaming NDJSON results as they complete.",
+)
+async def generate_nutrition_info_batch(payload: NutritionBatchPayload, request: Request):
+    """
+    Analyse a batch of images and descriptions with bounded concurrency.
+
+    Each completed item is streamed as one NDJSON line with its index and status;
+    a failing item produces an error line without failing the batch. The last line
+    is a summary with aggregate token usage and cost.
+
+    Args:
+        payload: The batch of nutrition queries and optional concurrency
+        request: FastAPI request object for error context
+
+    Returns:
+        StreamingResponse: application/x-ndjson stream of item and summary lines
+    """
+    start_time = time.time()
+
+    try:
+        NutritionBatchService.validate_batch(payload)
+
+        return StreamingResponse(
+            NutritionBatchService.stream_batch(payload, request),
+            media_type="application/x-ndjson",
+        )
+
+    except BaseCalAIException as e:
+        execution_time = time.time() - start_time
+        error_response = ErrorHandler.handle_custom_exception(
+            exception=e, request=request, execution_time=execution_time
+        )
+
+        return JSONResponse(
+            status_code=error_response.status_code, content=error_response.to_dict()
+        )
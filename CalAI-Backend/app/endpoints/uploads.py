@@ -0,0 +1,137 @@
+import asyncio
+import os
+import stat
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
+
+from app.config.upload_config import upload_config
+from app.exceptions import ValidationException
+from app.models.error_models import ErrorCode
+from app.services.upload_store import upload_store
+
+router = APIRouter()
+
+
+class UploadFileResponse(FileResponse):
+    """
+    FileResponse for stored uploads.
+
+    When the server offers the ASGI pathsend extension the file is handed to it
+    by path, so the body is sent with sendfile instead of being read through
+    Python. If-Range is also honoured against our own ETag.
+    """
+
+    chunk_size = 256 * 1024
+
+    def _should_use_range(self, http_if_range: str, stat_result: os.stat_result) -> bool:
+        return http_if_range == self.headers.get("etag") or super()._should_use_range(
+            http_if_range, stat_result
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        pathsend = "http.response.pathsend" in scope.get("extensions", {})
+        if pathsend and scope["method"] == "GET" and "range" not in Headers(scope=scope):
+            await send(
+                {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+            )
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+        await super().__call__(scope, receive, send)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def _stat_for_serving(path: str) -> os.stat_result:
+    """Stat a stored file and record the access for eviction."""
+    stat_result = os.stat(path)
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise FileNotFoundError(path)
+    upload_store.record_access(path)
+    return stat_result
+
+
+@router.api_route(
+    "/{name:path}",
+    methods=["GET", "HEAD"],
+    description="Serve an uploaded image, or a cached thumbnail of it.",
+)
+async def get_upload(
+    name: str,
+    request: Request,
+    size: Optional[int] = Query(
+        None, description="Serve a JPEG thumbnail with this maximum edge instead"
+    ),
+):
+    """
+    Serve a stored upload with caching headers.
+
+    Names never change content, so responses carry a strong ETag and an
+    immutable Cache-Control; a matching If-None-Match gets 304 without a body.
+    Range requests are answered with 206.
+
+    Args:
+        name: Name of the stored file under /uploads/
+        request: FastAPI request object, for the conditional headers
+        size: Thumbnail size; must be one of the configured thumbnail sizes
+
+    Returns:
+        Response: The file, a thumbnail of it, or 304 Not Modified
+
+    Raises:
+        HTTPException: 404 if there is no such upload
+        ValidationException: If size is not a configured thumbnail size
+    """
+    if size is not None and size not in upload_config.thumbnail_sizes:
+        raise ValidationException(
+            message=f"Unsupported thumbnail size: {size}",
+            error_code=ErrorCode.INVALID_INPUT,
+            field="size",
+            value=size,
+            constraint=f"one of {upload_config.thumbnail_sizes}",
+            suggestion=f"Use one of {upload_config.thumbnail_sizes}",
+        )
+
+    path = upload_store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    try:
+        stat_result = await asyncio.to_thread(_stat_for_serving, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    etag = upload_store.etag(name, stat_result)
+    if size is not None:
+        etag = f"{etag}-{size}"
+    headers = {
+        "ETag": f'"{etag}"',
+        "Cache-Control": f"public, max-age={upload_config.cache_max_age_seconds}, immutable",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if size is None:
+        return UploadFileResponse(path, headers=headers, stat_result=stat_result)
+
+    thumbnail_path = await upload_store.thumbnail(name, path, size)
+    try:
+        thumbnail_stat = await asyncio.to_thread(_stat_for_serving, thumbnail_path)
+    except FileNotFoundError:
+        # Evicted between rendering and serving; render it again
+        thumbnail_path = await upload_store.thumbnail(name, path, size)
+        thumbnail_stat = await asyncio.to_thread(_stat_for_serving, thumbnail_path)
+    return UploadFileResponse(
+        thumbnail_path, headers=headers, media_type="image/jpeg", stat_result=thumbnail_stat
+    )
@@ -8,3 +8,11 @@ class ChatMessage(TypedDict):
     role: Literal["user", "model"]
     timestamp: str
     content: str
+
+
+class ChatSummary(TypedDict):
+    """Rolling summary of the messages that fell out of a user's history window."""
+
+    summary: str
+    # Number of leading history messages the summary covers
+    message_count: int
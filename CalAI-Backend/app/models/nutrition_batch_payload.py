@@ -0,0 +1,54 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+from app.models.nutrition_input_payload import NutritionInputPayload
+
+
+class NutritionBatchPayload(BaseModel):
+    """
+    Represents a batch of nutrition analyses submitted in one request.
+    """
+
+    items: List[NutritionInputPayload] = Field(
+        ...,
+        min_length=1,
+        description="Meals to analyse; each needs an imageUrl, imageData or a food_description",
+    )
+    concurrency: Optional[int] = Field(
+        None, ge=1, description="Maximum number of items analysed at the same time"
+    )
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {
+                        "userId": "user_123",
+                        "imageUrl": "https://example.com/breakfast.jpg",
+                        "scanMode": "food",
+                    },
+                    {
+                        "userId": "user_123",
+                        "food_description": "Chicken Caesar Salad with croutons",
+                    },
+                ],
+                "concurrency": 4,
+            }
+        }
+
+
+class NutritionBatchSummary(BaseModel):
+    """Aggregate results reported on the last line of a batch stream"""
+
+    total_items: int = Field(..., description="Number of items in the batch")
+    succeeded: int = Field(0, description="Items analysed successfully")
+    failed: int = Field(0, description="Items that returned an error")
+    input_token_count: int = Field(0, description="Input tokens used across the batch")
+    output_token_count: int = Field(
+        0, description="Output tokens generated across the batch"
+    )
+    total_token_count: int = Field(0, description="Total tokens used across the batch")
+    estimated_cost: float = Field(0.0, description="Estimated cost in USD")
+    execution_time_seconds: float = Field(
+        0.0, description="Wall-clock time for the whole batch"
+    )
@@ -7,6 +7,13 @@ class NutritionInputPayload(BaseModel):
     Represents the input payload for nutrition data.
     """
 
+    userId: Optional[str] = Field(
+        None,
+        description=(
+            "ID of the requesting user. Enables reuse of results for near-identical "
+            "photos this user recently had analysed; without it that reuse is off"
+        ),
+    )
     imageData: Optional[str] = Field(None, description="Base64 encoded image data")
     imageUrl: Optional[str] = Field(
         None, description="URL of the image for nutrition analysis"
@@ -30,6 +37,7 @@ class NutritionInputPayload(BaseModel):
     class Config:
         json_schema_extra = {
             "example": {
+                "userId": "user_123",
                 "imageUrl": "https://example.com/image.jpg",
                 "scanMode": "food",
                 "food_description": "Chicken Caesar Salad with croutons",
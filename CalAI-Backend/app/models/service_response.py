@@ -16,6 +16,35 @@ class ServiceMetadata(BaseModel):
     total_token_count: Optional[int] = Field(None, description="Total tokens used")
     estimated_cost: Optional[float] = Field(None, description="Estimated cost in USD")
     execution_time_seconds: float = Field(..., description="Execution time in seconds")
+    cache_hit: Optional[bool] = Field(
+        None, description="Whether the result was served from the result cache"
+    )
+    cache_hits: Optional[int] = Field(
+        None, description="Result cache hits since the service started"
+    )
+    cache_misses: Optional[int] = Field(
+        None, description="Result cache misses since the service started"
+    )
+    near_duplicate_distance: Optional[int] = Field(
+        None,
+        description="Hamming distance to the near-duplicate image whose result was reused",
+    )
+    image_mime_type: Optional[str] = Field(
+        None, description="MIME type of the image sent to the model"
+    )
+    image_original_bytes: Optional[int] = Field(
+        None, description="Size of the image as received"
+    )
+    image_sent_bytes: Optional[int] = Field(
+        None, description="Size of the image after preprocessing"
+    )
+    coalesced: Optional[bool] = Field(
+        None,
+        description="Whether the result was shared from an identical request already in flight",
+    )
+    coalesced_requests: Optional[int] = Field(
+        None, description="Requests coalesced into in-flight calls since the service started"
+    )
 
 
 class NutritionServiceResponse(BaseModel):
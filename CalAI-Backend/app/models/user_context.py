@@ -0,0 +1,24 @@
+import asyncio
+from typing import List, Optional
+
+
+class UserContext:
+    """
+    Per-run dependencies of the chat agent: the profile of the user being
+    served, and the semaphore that caps how many tool calls of the run execute
+    at once.
+    """
+
+    def __init__(
+        self,
+        user_id: Optional[str] = None,
+        dietary_preferences: List[str] = None,
+        allergies: List[str] = None,
+        selected_goals: List[str] = None,
+        max_concurrent_tools: int = 3,
+    ):
+        self.user_id = user_id
+        self.dietary_preferences = dietary_preferences or []
+        self.allergies = allergies or []
+        self.selected_goals = selected_goals or []
+        self.tool_semaphore = asyncio.Semaphore(max_concurrent_tools)
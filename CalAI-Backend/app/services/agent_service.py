@@ -1,7 +1,7 @@
-from typing import List
 from pydantic_ai.models.gemini import GeminiModel
-from pydantic_ai import Agent
+from pydantic_ai import Agent, RunContext
 from app.config.chat_config import chat_config
+from app.models.user_context import UserContext
 from app.tools.agent_tools import create_agent_tools
 import logfire
 import os
@@ -10,20 +10,6 @@ logfire.configure()
 # logfire.instrument_pydantic_ai()
 
 
-class UserContext:
-    """Context class to store user-specific information."""
-
-    def __init__(
-        self,
-        dietary_preferences: List[str] = None,
-        allergies: List[str] = None,
-        selected_goals: List[str] = None,
-    ):
-        self.dietary_preferences = dietary_preferences or []
-        self.allergies = allergies or []
-        self.selected_goals = selected_goals or []
-
-
 class AgentService:
     # GeminiModel reads API key from GOOGLE_API_KEY or GEMINI_API_KEY environment variable
     # Set the environment variable before creating the model
@@ -33,36 +19,39 @@ class AgentService:
     model = GeminiModel(chat_config.model_name)
 
     @staticmethod
-    def create_chat_agent(
-        dietaryPreferences: List[str],
-        allergies: List[str],
-        selectedGoals: List[str],
-    ):
-        """Create and return a chat agent instance with user context."""
-
-        # Format system prompt with user preferences
-        formatted_system_prompt = chat_config.system_prompt.format(
+    def format_system_prompt(user_context: UserContext) -> str:
+        """The chat system prompt filled in with a user's profile."""
+        return chat_config.system_prompt.format(
             dietaryPreferences=(
-                ", ".join(dietaryPreferences) if dietaryPreferences else "none"
+                ", ".join(user_context.dietary_preferences)
+                if user_context.dietary_preferences
+                else "none"
+            ),
+            allergies=", ".join(user_context.allergies) if user_context.allergies else "none",
+            selectedGoals=(
+                ", ".join(user_context.selected_goals) if user_context.selected_goals else "none"
             ),
-            allergies=", ".join(allergies) if allergies else "none",
-            selectedGoals=", ".join(selectedGoals) if selectedGoals else "none",
         )
 
-        # Create new agent instance
+    @staticmethod
+    def create_chat_agent() -> Agent:
+        """
+        Create the chat agent.
+
+        One agent serves every user: the profile is passed per run as a
+        UserContext dependency, and the instructions and tools read it from
+        the run context. Instructions are sent on every request rather than
+        stored in the history, so a changed profile takes effect immediately.
+        """
         agent = Agent(
             model=AgentService.model,
-            system_prompt=formatted_system_prompt,
+            deps_type=UserContext,
         )
 
-        # Create user context
-        user_context = UserContext(
-            dietary_preferences=dietaryPreferences,
-            allergies=allergies,
-            selected_goals=selectedGoals,
-        )
+        @agent.instructions
+        def profile_instructions(ctx: RunContext[UserContext]) -> str:
+            return AgentService.format_system_prompt(ctx.deps)
 
-        # Register tools with the agent and user context
-        create_agent_tools(agent, user_context)
+        create_agent_tools(agent)
 
-        return agent
\ No newline at end of file
+        return agent
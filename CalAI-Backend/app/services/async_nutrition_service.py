@@ -0,0 +1,274 @@
+import asyncio
+import time
+from typing import Callable, Optional, TypeVar
+
+import httpx
+from google.genai import types
+
+from app.models.nutrition_input_payload import NutritionInputPayload
+from app.models.service_response import NutritionServiceResponse
+from app.services.barcode_service import BarcodeService
+from app.services.http_client import HttpClientPool
+from app.services.image_service import ImageService
+from app.services.nutrition_service import NutritionService
+from app.services.upload_resolver import upload_resolver
+from app.services.result_cache import nutrition_result_cache
+from app.services.single_flight import nutrition_single_flight
+from app.exceptions import (
+    ValidationException,
+    ImageProcessingException,
+    NutritionAnalysisException,
+)
+from app.models.error_models import ErrorCode
+
+T = TypeVar("T")
+
+
+class AsyncNutritionService:
+    """
+    Async variant of NutritionService.
+    Uses the Gemini aio client and the pooled async HTTP client so requests never
+    block the event loop or occupy a threadpool worker while waiting on the network.
+    Prompt building, error mapping and response parsing are shared with NutritionService.
+    """
+
+    @staticmethod
+    def _get_client():
+        """Get the async Gemini client backed by the shared NutritionService client."""
+        return NutritionService._get_client().aio
+
+    @staticmethod
+    async def _run_cache_call(function: Callable[..., T], *args) -> T:
+        """Run a result cache read or write, in a worker thread when the backend does file I/O."""
+        if nutrition_result_cache.blocking:
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    @staticmethod
+    async def _load_image_bytes(image_url: str) -> bytes:
+        """
+        Async variant of NutritionService._load_image_bytes.
+
+        Raises:
+            ImageProcessingException: If the image cannot be read or downloaded
+        """
+        # Our own uploads are read from disk in a worker thread; no network involved
+        local_file_path = NutritionService._local_upload_path(image_url)
+        if local_file_path:
+            return await asyncio.to_thread(upload_resolver.read_bytes, local_file_path)
+
+        try:
+            response = await HttpClientPool.get_async_client().get(image_url)
+            response.raise_for_status()
+            return response.content
+        except httpx.HTTPError as e:
+            raise ImageProcessingException(
+                message=f"Failed to download image from URL: {str(e)}",
+                error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            ) from e
+
+    @staticmethod
+    async def _get_image_bytes(query: NutritionInputPayload) -> bytes:
+        """Async variant of NutritionService._get_image_bytes."""
+        if query.imageData:
+            # Decoding a multi-megabyte base64 string is CPU work; keep it off the loop
+            return await asyncio.to_thread(ImageService.getImageBytes, query.imageData)
+        return await AsyncNutritionService._load_image_bytes(query.imageUrl)
+
+    @staticmethod
+    async def _handle_barcode_scan(
+        query: NutritionInputPayload,
+        start_time: float,
+        image_bytes: Optional[bytes] = None,
+    ) -> NutritionServiceResponse:
+        """
+        Async variant of NutritionService._handle_barcode_scan.
+
+        Args:
+            query: NutritionInputPayload containing the image and scan mode
+            start_time: Start time of the request
+            image_bytes: Image bytes already read by the caller, if any
+
+        Returns:
+            NutritionServiceResponse with product nutrition data
+        """
+        try:
+            client = AsyncNutritionService._get_client()
+
+            if image_bytes is None:
+                image_bytes = await AsyncNutritionService._get_image_bytes(query)
+            # Barcodes need full resolution, so only the MIME type is corrected here
+            image = types.Part.from_bytes(
+                data=image_bytes, mime_type=ImageService.detect_mime_type(image_bytes)
+            )
+
+            response = await client.models.generate_content(
+                model=NutritionService.GEMINI_MODEL,
+                contents=[NutritionService.BARCODE_OCR_PROMPT, image],
+            )
+
+            barcode = NutritionService._parse_barcode_text(response.text)
+
+            product_data = await BarcodeService.lookup_product_by_barcode_async(
+                barcode, HttpClientPool.get_async_client()
+            )
+
+            return NutritionService._build_barcode_response(
+                barcode, product_data, start_time
+            )
+
+        except (ValidationException, ImageProcessingException) as e:
+            raise e
+        except Exception as e:
+            raise NutritionAnalysisException(
+                message=f"Error processing barcode scan: {str(e)}",
+                error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            ) from e
+
+    @staticmethod
+    async def _analyze_image(
+        prompt: str,
+        image_bytes: bytes,
+        request_key: str,
+        query: NutritionInputPayload,
+        start_time: float,
+    ) -> NutritionServiceResponse:
+        """Async variant of NutritionService._analyze_image."""
+        cache_key = request_key if nutrition_result_cache.enabled else None
+        cached_response = await AsyncNutritionService._run_cache_call(
+            NutritionService._get_cached_response, cache_key, query, start_time
+        )
+        if cached_response:
+            return cached_response
+
+        # Decoding and re-encoding is CPU work; keep it off the loop
+        prepared_image = await asyncio.to_thread(
+            NutritionService._prepare_image, image_bytes, query
+        )
+        phash = prepared_image.phash
+        near_duplicate_response = NutritionService._get_near_duplicate_response(
+            phash, query, start_time
+        )
+        if near_duplicate_response:
+            return near_duplicate_response
+
+        client = AsyncNutritionService._get_client()
+        image = types.Part.from_bytes(
+            data=prepared_image.data, mime_type=prepared_image.mime_type
+        )
+
+        try:
+            response = await client.models.generate_content(
+                config=NutritionService.GENERATION_CONFIG,
+                model=NutritionService.GEMINI_MODEL,
+                contents=[prompt, image],
+            )
+        except Exception as e:
+            raise NutritionService._translate_gemini_error(e) from e
+
+        result = NutritionService._build_success_response(response, start_time)
+        NutritionService._record_prepared_image(prepared_image, result)
+        await AsyncNutritionService._run_cache_call(
+            NutritionService._store_cached_response, cache_key, result
+        )
+        NutritionService._store_near_duplicate(phash, query, result)
+        return result
+
+    @staticmethod
+    async def _analyze_description(
+        prompt: str, start_time: float
+    ) -> NutritionServiceResponse:
+        """Async variant of NutritionService._analyze_description."""
+        client = AsyncNutritionService._get_client()
+
+        try:
+            response = await client.models.generate_content(
+                config=NutritionService.GENERATION_CONFIG,
+                model=NutritionService.GEMINI_MODEL,
+                contents=prompt,
+            )
+        except Exception as e:
+            raise NutritionService._translate_gemini_error(e) from e
+
+        return NutritionService._build_success_response(response, start_time)
+
+    @staticmethod
+    async def get_nutrition_data(
+        query: NutritionInputPayload,
+        image_bytes: Optional[bytes] = None,
+    ) -> NutritionServiceResponse:
+        """
+        Async variant of NutritionService.get_nutrition_data.
+
+        Args:
+            query: NutritionInputPayload containing image data and user preferences
+            image_bytes: Image bytes already read by the caller (e.g. a multipart
+                upload); otherwise imageData or imageUrl from the query is used
+
+        Returns:
+            Union[NutritionServiceResponse, ErrorResponse]: Structured response with nutrition data and metadata
+        """
+        start_time = time.time()
+
+        try:
+            if query.scanMode == "barcode":
+                return await AsyncNutritionService._handle_barcode_scan(
+                    query, start_time, image_bytes
+                )
+
+            prompt = NutritionService._build_image_prompt(query)
+
+            if image_bytes is None:
+                image_bytes = await AsyncNutritionService._get_image_bytes(query)
+
+            # Sync and async callers share the same in-flight table
+            request_key = NutritionService._request_key(image_bytes, query)
+            result, shared = await nutrition_single_flight.do_async(
+                f"image:{request_key}",
+                lambda: AsyncNutritionService._analyze_image(
+                    prompt, image_bytes, request_key, query, start_time
+                ),
+            )
+            return NutritionService._build_coalesced_response(
+                result, shared, query.imageUrl, start_time
+            )
+
+        except NutritionService.PROPAGATED_EXCEPTIONS as e:
+            raise e
+
+        except Exception as e:
+            return NutritionService._build_internal_error_response(e, start_time)
+
+    @staticmethod
+    async def log_food_nutrition_data_using_description(
+        payload: NutritionInputPayload,
+    ) -> NutritionServiceResponse:
+        """
+        Async variant of NutritionService.log_food_nutrition_data_using_description.
+
+        Args:
+            payload: NutritionInputPayload containing the food description and preferences
+
+        Returns:
+            Union[NutritionServiceResponse, ErrorResponse]: Structured response with nutrition data and metadata
+        """
+        start_time = time.time()
+
+        try:
+            prompt = NutritionService._build_description_prompt(payload)
+
+            request_key = NutritionService._request_key(None, payload)
+            result, shared = await nutrition_single_flight.do_async(
+                f"description:{request_key}",
+                lambda: AsyncNutritionService._analyze_description(prompt, start_time),
+            )
+            return NutritionService._build_coalesced_response(
+                result, shared, None, start_time
+            )
+
+        except NutritionService.PROPAGATED_EXCEPTIONS as e:
+            raise e
+
+        except Exception as e:
+            return NutritionService._build_internal_error_response(e, start_time)
+
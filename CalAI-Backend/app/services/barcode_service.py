@@ -1,12 +1,30 @@
-import requests
+import httpx
 from typing import Optional, Dict, Any
 from app.exceptions import ValidationException
+from app.services.http_client import HttpClientPool
 from app.models.error_models import ErrorCode
 
 
 class BarcodeService:
     """Service for handling barcode scanning and product lookup."""
     
+    OPEN_FOOD_FACTS_URL = "https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
+
+    @staticmethod
+    def _parse_product(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Extract the fields we use from an Open Food Facts product payload."""
+        if data.get("status") == 1:  # Product found
+            product = data.get("product", {})
+            return {
+                "product_name": product.get("product_name", "Unknown Product"),
+                "brands": product.get("brands", ""),
+                "quantity": product.get("quantity", ""),
+                "image_url": product.get("image_url", ""),
+                "nutriments": product.get("nutriments", {}),
+                "serving_size": product.get("serving_size", ""),
+            }
+        return None
+
     @staticmethod
     def lookup_product_by_barcode(barcode: str) -> Optional[Dict[str, Any]]:
         """
@@ -19,21 +37,38 @@ class BarcodeService:
             Product data if found, None otherwise
         """
         try:
-            url = f"https://world.openfoodfacts.org/api/v0/product/{barcode}.json"
-            response = requests.get(url, timeout=10)
+            url = BarcodeService.OPEN_FOOD_FACTS_URL.format(barcode=barcode)
+            response = HttpClientPool.get_session().get(
+                url, timeout=HttpClientPool.timeout()
+            )
             
             if response.status_code == 200:
-                data = response.json()
-                if data.get("status") == 1:  # Product found
-                    product = data.get("product", {})
-                    return {
-                        "product_name": product.get("product_name", "Unknown Product"),
-                        "brands": product.get("brands", ""),
-                        "quantity": product.get("quantity", ""),
-                        "image_url": product.get("image_url", ""),
-                        "nutriments": product.get("nutriments", {}),
-                        "serving_size": product.get("serving_size", ""),
-                    }
+                return BarcodeService._parse_product(response.json())
+            return None
+        except Exception as e:
+            print(f"Error looking up barcode: {e}")
+            return None
+
+    @staticmethod
+    async def lookup_product_by_barcode_async(
+        barcode: str, client: httpx.AsyncClient
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Async variant of lookup_product_by_barcode.
+
+        Args:
+            barcode: The barcode number
+            client: Pooled async HTTP client used for the request
+
+        Returns:
+            Product data if found, None otherwise
+        """
+        try:
+            url = BarcodeService.OPEN_FOOD_FACTS_URL.format(barcode=barcode)
+            response = await client.get(url)
+
+            if response.status_code == 200:
+                return BarcodeService._parse_product(response.json())
             return None
         except Exception as e:
             print(f"Error looking up barcode: {e}")
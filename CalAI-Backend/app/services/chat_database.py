@@ -1,187 +1,144 @@
-import os
+import asyncio
 import json
-from pathlib import Path
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 
-from supabase import create_client, Client
 from datetime import datetime, timezone
 from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
-import logfire
+
+from app.config.chat_config import chat_config
+from app.config.database_config import DatabaseConfig, database_config
+from app.models.chat_models import ChatSummary
+from app.services.chat_history_cache import chat_history_cache
+from app.services.chat_message_renderer import (
+    RENDER_VERSION,
+    render_chat_message,
+    render_row_content,
+)
+from app.services.chat_storage import ChatStorage, create_chat_storage
+from app.services.chat_write_queue import ChatWriteQueue
+from app.services.history_sanitizer import HistorySanitizer
 
 
 @dataclass
 class Database:
     """
-    Database class to store and retrieve chat messages using Supabase.
+    Database class to store and retrieve chat messages.
+
+    One instance is created at application startup and shared by all
+    requests. Rows live in a ChatStorage backend, Supabase or a local SQLite
+    file, chosen by CHAT_STORAGE_BACKEND; this class adds the write-behind
+    queue, the per-user history cache and message parsing on top.
     """
 
-    supabase_url: str = field(default_factory=lambda: os.getenv("SUPABASE_URL"))
-    supabase_key: str = field(default_factory=lambda: os.getenv("SUPABASE_KEY"))
-    client: Client = field(init=False)
+    storage: ChatStorage
+    write_queue: ChatWriteQueue = field(init=False)
+    _backfills: Set[asyncio.Task] = field(init=False, default_factory=set)
 
     def __post_init__(self):
-        if not self.supabase_url or not self.supabase_key:
-            raise ValueError(
-                "Supabase URL and Key must be set in environment variables."
-            )
-        self.client = create_client(self.supabase_url, self.supabase_key)
+        self.write_queue = ChatWriteQueue(self.storage.insert_messages, chat_config)
 
     @classmethod
-    async def connect(cls, file: Path | None = None) -> "Database":
-        """Create a connection to Supabase."""
-        with logfire.span("connect to Supabase"):
-            return cls()
+    async def connect(cls, config: DatabaseConfig = database_config) -> "Database":
+        """
+        Open the configured chat storage.
+
+        Raises:
+            ValueError: If the backend is unknown, or Supabase is selected but
+                SUPABASE_URL or SUPABASE_KEY is not set
+        """
+        return cls(storage=await create_chat_storage(config))
+
+    def start(self) -> None:
+        """Start writing queued messages in the background. Called on application startup."""
+        self.write_queue.start()
+
+    async def aclose(self) -> None:
+        """Write queued messages, then close the storage. Called on application shutdown."""
+        await self.write_queue.stop()
+        if self._backfills:
+            await asyncio.gather(*self._backfills)
+        await self.storage.aclose()
+
+    async def ping(self) -> bool:
+        """Check that the storage answers a minimal query."""
+        return await self.storage.ping()
+
+    @staticmethod
+    def _build_rows(
+        user_id: str,
+        messages: bytes,
+        parsed_messages: List[ModelMessage],
+        localtime: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Rows for the chat_messages table from ModelMessages JSON, parsed once,
+        with each message rendered for the browser so reads do not convert it.
+        """
+        timestamp = (localtime or datetime.now(timezone.utc)).isoformat()
+        return [
+            {
+                "user_id": user_id,
+                "role": msg.get("role", "user"),
+                "content": msg,
+                "timestamp": timestamp,
+                "rendered": render_chat_message(message),
+                "render_version": RENDER_VERSION,
+            }
+            for msg, message in zip(json.loads(messages), parsed_messages)
+        ]
 
     async def add_messages(
-        self, user_id: str, messages: bytes, localtime: Optional[datetime] = None
+        self,
+        user_id: str,
+        messages: bytes,
+        localtime: Optional[datetime] = None,
+        parsed_messages: Optional[List[ModelMessage]] = None,
     ):
         """
-        Add messages to Supabase for a specific user.
+        Queue messages to be stored for a specific user.
+
+        The rows are written in the background by the write queue, in bulk with
+        other users' messages; the cached history is updated right away, so the
+        user's next turn sees them.
 
-        messages: bytes (Pydantic ModelMessages json), e.g.: ModelMessagesTypeAdapter.dump_json(...)
+        messages: bytes (Pydantic ModelMessages json), e.g.: result.new_messages_json()
         localtime: optional datetime (client's local time or None)
+        parsed_messages: the same messages as objects, if the caller has them,
+            so they are not parsed from the JSON again
         """
         try:
-            message_list = ModelMessagesTypeAdapter.validate_json(messages)
-
-            json_str = ModelMessagesTypeAdapter.dump_json(message_list)
-            messages_dict = json.loads(json_str)
-
-            base_time = localtime or datetime.now(timezone.utc)
-
-            messages_to_insert = []
-            for msg in messages_dict:
-                messages_to_insert.append(
-                    {
-                        "user_id": user_id,
-                        "role": msg.get("role", "user"),
-                        "content": msg,
-                        "timestamp": base_time.isoformat(),
-                    }
-                )
-
-            result = (
-                self.client.table("chat_messages").insert(messages_to_insert).execute()
-            )
-            return result
+            if parsed_messages is None:
+                parsed_messages = ModelMessagesTypeAdapter.validate_json(messages)
+            rows = self._build_rows(user_id, messages, parsed_messages, localtime)
+            await self.write_queue.enqueue(rows)
+            chat_history_cache.append(user_id, parsed_messages, len(messages))
         except Exception as e:
+            chat_history_cache.invalidate(user_id)
             print(f"Error in add_messages: {e}")
 
-    def _clean_messages(self, messages: List[ModelMessage]) -> List[ModelMessage]:
-        """Clean up messages to remove orphaned tool calls and tool returns."""
-        if not messages:
-            return messages
-
-        tool_call_map = {}
-        tool_return_map = {}
-
-        for i, msg in enumerate(messages):
-            if hasattr(msg, "parts"):
-                for part in msg.parts:
-                    if (
-                        hasattr(part, "tool_call_id")
-                        and hasattr(part, "tool_name")
-                        and not hasattr(part, "content")
-                    ):
-                        tool_call_map[part.tool_call_id] = i
-                    elif hasattr(part, "tool_call_id") and hasattr(part, "content"):
-                        tool_return_map[part.tool_call_id] = i
-
-        valid_tool_calls = set()
-        for tool_call_id in tool_call_map:
-            if (
-                tool_call_id in tool_return_map
-                and tool_call_map[tool_call_id] < tool_return_map[tool_call_id]
-            ):
-                valid_tool_calls.add(tool_call_id)
-            else:
-                print(f"Removing unpaired tool call with ID: {tool_call_id}")
-
-        cleaned_messages = []
-        for i, msg in enumerate(messages):
-            if hasattr(msg, "parts") and msg.parts:
-                valid_parts = []
-                has_valid_content = False
-
-                for part in msg.parts:
-                    if not hasattr(part, "tool_call_id"):
-                        valid_parts.append(part)
-                        has_valid_content = True
-                    elif hasattr(part, "tool_name") and not hasattr(part, "content"):
-                        if part.tool_call_id in valid_tool_calls:
-                            valid_parts.append(part)
-                            has_valid_content = True
-                        else:
-                            print(
-                                f"Removing tool call without response: {part.tool_call_id}"
-                            )
-                    elif hasattr(part, "tool_call_id") and hasattr(part, "content"):
-                        if part.tool_call_id in valid_tool_calls:
-                            valid_parts.append(part)
-                            has_valid_content = True
-                        else:
-                            print(
-                                f"Removing tool return without call: {part.tool_call_id}"
-                            )
-
-                if valid_parts and has_valid_content:
-                    msg.parts = valid_parts
-                    cleaned_messages.append(msg)
-            else:
-                cleaned_messages.append(msg)
-
-        final_messages = []
-        pending_tool_calls = set()
-
-        for msg in cleaned_messages:
-            if hasattr(msg, "parts"):
-                msg_tool_calls = set()
-                msg_tool_returns = set()
-
-                for part in msg.parts:
-                    if (
-                        hasattr(part, "tool_call_id")
-                        and hasattr(part, "tool_name")
-                        and not hasattr(part, "content")
-                    ):
-                        msg_tool_calls.add(part.tool_call_id)
-                    elif hasattr(part, "tool_call_id") and hasattr(part, "content"):
-                        msg_tool_returns.add(part.tool_call_id)
-
-                if msg_tool_calls:
-                    pending_tool_calls.update(msg_tool_calls)
-                    final_messages.append(msg)
-
-                elif msg_tool_returns:
-                    if msg_tool_returns.issubset(pending_tool_calls):
-                        pending_tool_calls -= msg_tool_returns
-                        final_messages.append(msg)
-                    else:
-                        print(
-                            f"Skipping tool return message with unmatched calls: {msg_tool_returns - pending_tool_calls}"
-                        )
-                else:
-                    final_messages.append(msg)
-            else:
-                final_messages.append(msg)
-
-        print(f"Cleaned messages: {len(messages)} -> {len(final_messages)}")
-        return final_messages
+    async def _flush_pending(self, user_id: str) -> None:
+        """Write queued messages first if the user has any, so a database read sees them."""
+        if self.write_queue.has_pending(user_id):
+            await self.write_queue.flush()
 
     async def get_messages(self, user_id: str) -> List[ModelMessage]:
-        """Get all messages for a user from Supabase"""
+        """
+        Get all messages for a user.
+
+        Served from the per-user history cache; only a miss reads, parses and
+        sanitizes the rows from storage.
+        """
+        cached = chat_history_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        await self._flush_pending(user_id)
         try:
-            result = (
-                self.client.table("chat_messages")
-                .select("content")
-                .eq("user_id", user_id)
-                .order("timestamp", desc=False)
-                .execute()
-            )
+            rows = await self.storage.select_messages(user_id)
 
             messages: List[ModelMessage] = []
-            for row in result.data:
+            for row in rows:
                 msg_data = row["content"]
                 try:
                     parsed_messages = ModelMessagesTypeAdapter.validate_python(
@@ -195,29 +152,101 @@ class Database:
                     print(f"Error parsing message: {e}")
                     continue
 
-            cleaned_messages = self._clean_messages(messages)
+            history = HistorySanitizer.sanitize(messages)
             print(
-                f"Retrieved {len(cleaned_messages)} messages, validated to {len(cleaned_messages)} messages for user {user_id}"
+                f"Retrieved {len(messages)} messages, validated to {len(history.messages)} messages for user {user_id}"
+            )
+            chat_history_cache.put(
+                user_id,
+                history,
+                len(ModelMessagesTypeAdapter.dump_json(history.messages)),
             )
-            return cleaned_messages
+            return list(history.messages)
         except Exception as e:
             print(f"Error getting messages: {e}")
             raise
 
+    async def get_message_page(
+        self,
+        user_id: str,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get one page of a user's stored message rows, oldest first.
+
+        Pages are keyed on the row id, which increases in insertion order, so
+        the filter and limit are applied by the database whatever the offset.
+        Without a cursor the latest page is returned.
+
+        Args:
+            user_id: The user whose messages to read
+            before: Only rows with a smaller id (older messages)
+            after: Only rows with a larger id (newer messages)
+            limit: Maximum number of rows
+
+        Rows stored before messages were rendered at write time, or rendered by
+        an older RENDER_VERSION, are rendered here and written back in the
+        background, so each is converted once.
+
+        Returns:
+            List[Dict[str, Any]]: Rows with "id" and the "rendered" ChatMessage
+                JSON, empty for messages the browser does not show
+        """
+        await self._flush_pending(user_id)
+        rows = await self.storage.select_message_page(user_id, before, after, limit)
+
+        stale = [row for row in rows if row.get("render_version") != RENDER_VERSION]
+        if stale:
+            contents = {
+                row["id"]: row["content"]
+                for row in await self.storage.select_message_contents(
+                    user_id, [row["id"] for row in stale]
+                )
+            }
+            for row in stale:
+                content = contents.get(row["id"])
+                row["rendered"] = render_row_content(content) if content else ""
+                row["render_version"] = RENDER_VERSION
+            self._backfill(stale)
+        return rows
+
+    def _backfill(self, rows: List[Dict[str, Any]]) -> None:
+        """Store rows rendered at read time, in the background."""
+
+        async def update() -> None:
+            try:
+                await self.storage.update_rendered(rows)
+            except Exception as e:
+                print(f"Error backfilling {len(rows)} rendered chat messages: {e}")
+
+        task = asyncio.create_task(update())
+        # Keep a reference so the task is not garbage collected mid-run
+        self._backfills.add(task)
+        task.add_done_callback(self._backfills.discard)
+
+    async def get_summary(self, user_id: str) -> Optional[ChatSummary]:
+        """Get the stored summary of a user's older messages, if any."""
+        try:
+            return await self.storage.get_summary(user_id)
+        except Exception as e:
+            print(f"Error getting summary: {e}")
+            return None
+
+    async def save_summary(self, user_id: str, summary: ChatSummary):
+        """Insert or replace the summary of a user's older messages."""
+        try:
+            await self.storage.save_summary(user_id, summary)
+        except Exception as e:
+            print(f"Error in save_summary: {e}")
+
     async def get_message_by_id(
         self, user_id: str, message_id: str
     ) -> Optional[ModelMessage]:
         """Get a specific message by ID."""
         try:
-            result = (
-                self.client.table("chat_messages")
-                .select("content")
-                .eq("user_id", user_id)
-                .eq("id", message_id)
-                .single()
-                .execute()
-            )
-            row = result.data
+            row = await self.storage.select_message(user_id, message_id)
             if row:
                 msg_data = row["content"]
                 parsed = ModelMessagesTypeAdapter.validate_python([msg_data])
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from pydantic_ai.messages import ModelMessage
+
+from app.config.chat_config import ChatConfig, chat_config
+from app.services.history_sanitizer import HistorySanitizer, SanitizedHistory
+
+
+@dataclass
+class _HistoryEntry:
+    messages: List[ModelMessage]
+    # Sanitizer state at the end of messages, so appends are checked on their own
+    pending_tool_calls: Set[str]
+    size_bytes: int
+    expires_at: float
+
+
+class ChatHistoryCache:
+    """
+    Per-user cache of parsed and sanitized chat history.
+
+    Entries are evicted least recently used first, once there are more than
+    max_users users or their serialized size exceeds max_bytes in total. New
+    messages are appended to a cached history instead of reloading it, and an
+    entry expires after ttl_seconds so writes this process did not make (another
+    worker, a manual edit) are picked up eventually. Writes made elsewhere in
+    this process should call invalidate().
+    """
+
+    def __init__(self, config: ChatConfig):
+        self.max_users = config.history_cache_max_users
+        self.max_bytes = config.history_cache_max_bytes
+        self.ttl_seconds = config.history_cache_ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size_bytes = 0
+        self._entries: "OrderedDict[str, _HistoryEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Optional[List[ModelMessage]]:
+        """
+        Return the cached history of a user, or None on a miss.
+
+        The list is a copy, so callers may extend it; the messages are shared
+        and must not be mutated.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry.expires_at < time.monotonic():
+                if entry is not None:
+                    self._drop(user_id)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return list(entry.messages)
+
+    def put(self, user_id: str, history: SanitizedHistory, size_bytes: int) -> None:
+        """Cache the full history of a user, as loaded from the database and sanitized."""
+        with self._lock:
+            if user_id in self._entries:
+                self._drop(user_id)
+            self._entries[user_id] = _HistoryEntry(
+                messages=list(history.messages),
+                pending_tool_calls=set(history.pending_tool_calls),
+                size_bytes=size_bytes,
+                expires_at=time.monotonic() + self.ttl_seconds,
+            )
+            self._size_bytes += size_bytes
+            self._evict()
+
+    def append(self, user_id: str, messages: List[ModelMessage], size_bytes: int) -> None:
+        """
+        Sanitize newly stored messages and append them to a cached history.
+
+        Only the new messages are checked, against the sanitizer state kept
+        with the entry. Does nothing if the user's history is not cached; the
+        next read loads it from the database, including these messages.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return
+            sanitized = HistorySanitizer.sanitize(messages, entry.pending_tool_calls)
+            entry.messages.extend(sanitized.messages)
+            entry.pending_tool_calls = sanitized.pending_tool_calls
+            entry.size_bytes += size_bytes
+            self._size_bytes += size_bytes
+            self._entries.move_to_end(user_id)
+            self._evict()
+
+    def invalidate(self, user_id: str) -> None:
+        """Forget a user's history, e.g. after it was changed outside add_messages."""
+        with self._lock:
+            if user_id in self._entries:
+                self._drop(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def _drop(self, user_id: str) -> None:
+        self._size_bytes -= self._entries.pop(user_id).size_bytes
+
+    def _evict(self) -> None:
+        # Keep at least the most recent entry, even if it alone exceeds the byte cap
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_users or self._size_bytes > self.max_bytes
+        ):
+            user_id = next(iter(self._entries))
+            self._drop(user_id)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache metrics for the health check."""
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+chat_history_cache = ChatHistoryCache(chat_config)
@@ -0,0 +1,238 @@
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import List, Optional, Set
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    SystemPromptPart,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from app.config.chat_config import ChatConfig, chat_config
+from app.models.chat_models import ChatSummary
+from app.services.result_cache import InMemoryLRUCache
+
+CHARS_PER_TOKEN = 4
+# Tool results are long JSON; the summary only needs their gist
+TOOL_RETURN_SUMMARY_CHARS = 500
+# Upper bound on the transcript folded into the summary in one call
+SUMMARY_INPUT_CHARS = 48_000
+
+SUMMARY_INSTRUCTIONS = """You maintain a running summary of a conversation between a user and CalAI, a nutrition assistant.
+You receive the previous summary (possibly empty) and the next part of the conversation.
+Return an updated summary of at most 200 words covering the user's meals and nutrition figures,
+stated goals, preferences, allergies, and any advice or commitments that later turns may refer to.
+Write plain prose without headings. Return only the summary."""
+
+
+@dataclass
+class WindowedHistory:
+    """History to send to the model for one turn."""
+
+    messages: List[ModelMessage]
+    # Index in the full history of the first message kept verbatim
+    cutoff: int
+
+
+def _is_turn_start(message: ModelMessage) -> bool:
+    return isinstance(message, ModelRequest) and any(
+        isinstance(part, UserPromptPart) for part in message.parts
+    )
+
+
+def _without_system_prompt(message: ModelMessage) -> ModelMessage:
+    """The message without stored system prompt parts; shared messages are never edited."""
+    if isinstance(message, ModelRequest) and any(
+        isinstance(part, SystemPromptPart) for part in message.parts
+    ):
+        parts = [part for part in message.parts if not isinstance(part, SystemPromptPart)]
+        return ModelRequest(parts=parts, instructions=message.instructions)
+    return message
+
+
+def _estimate_tokens(message: ModelMessage) -> int:
+    chars = 0
+    for part in message.parts:
+        if isinstance(part, ToolCallPart):
+            chars += len(part.tool_name) + len(part.args_as_json_str())
+        elif isinstance(part, ToolReturnPart):
+            chars += len(part.model_response_str())
+        else:
+            content = getattr(part, "content", "")
+            chars += len(content) if isinstance(content, str) else len(json.dumps(content, default=str))
+    return chars // CHARS_PER_TOKEN + 1
+
+
+def _render_transcript(messages: List[ModelMessage]) -> str:
+    """Plain-text transcript of messages for the summariser."""
+    lines = []
+    for message in messages:
+        for part in message.parts:
+            if isinstance(part, UserPromptPart) and isinstance(part.content, str):
+                lines.append(f"User: {part.content}")
+            elif isinstance(part, TextPart) and part.content:
+                lines.append(f"Assistant: {part.content}")
+            elif isinstance(part, ToolCallPart):
+                lines.append(f"Assistant called {part.tool_name}({part.args_as_json_str()})")
+            elif isinstance(part, ToolReturnPart):
+                result = part.model_response_str()[:TOOL_RETURN_SUMMARY_CHARS]
+                lines.append(f"{part.tool_name} returned: {result}")
+    return "\n".join(lines)
+
+
+class ChatHistoryWindow:
+    """
+    Bounds the chat history sent to the model on each turn.
+
+    The window keeps the most recent turns (a user prompt and everything up to
+    the next one) within the configured turn, message and token limits. Turns
+    that fall out of the window are folded into a rolling summary, stored in
+    the chat_summaries table and updated in the background after a turn, so
+    prompt size stays roughly constant however long a user has been chatting.
+
+    System prompt parts stored by older versions are dropped: the agent sends
+    its instructions, with the current profile, on every run.
+    """
+
+    def __init__(self, config: ChatConfig):
+        self.max_turns = config.history_max_turns
+        self.max_messages = config.max_messages
+        self.token_budget = config.history_token_budget
+        self.summary_enabled = config.history_summary_enabled
+
+        self._summaries = InMemoryLRUCache(
+            max_entries=config.history_cache_max_users,
+            ttl_seconds=config.history_cache_ttl_seconds,
+        )
+        self._summarizing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._agent: Optional[Agent] = None
+
+    def _cutoff(self, messages: List[ModelMessage]) -> int:
+        """Index of the first message of the oldest turn that fits the window."""
+        cutoff = len(messages)
+        turns = 0
+        tokens = 0
+        pending = 0
+        for index in range(len(messages) - 1, -1, -1):
+            pending += _estimate_tokens(messages[index])
+            if not _is_turn_start(messages[index]):
+                continue
+            # The latest turn is always kept, whatever its size
+            if turns and (
+                turns >= self.max_turns
+                or tokens + pending > self.token_budget
+                or len(messages) - index > self.max_messages
+            ):
+                break
+            tokens += pending
+            pending = 0
+            turns += 1
+            cutoff = index
+        return cutoff
+
+    def apply(
+        self, messages: List[ModelMessage], summary: Optional[ChatSummary] = None
+    ) -> WindowedHistory:
+        """
+        Cut the history down to the window, prefixed with the summary of older turns.
+
+        Args:
+            messages: The user's full, sanitized history
+            summary: The stored summary of older messages, if any
+
+        Returns:
+            WindowedHistory: Messages to pass as message_history, and where the window starts
+        """
+        cutoff = self._cutoff(messages)
+        windowed = [_without_system_prompt(message) for message in messages[cutoff:]]
+        windowed = [message for message in windowed if message.parts]
+
+        if cutoff and summary and summary["summary"]:
+            summary_part = SystemPromptPart(
+                content=f"Summary of the earlier conversation with this user:\n{summary['summary']}"
+            )
+            windowed.insert(0, ModelRequest(parts=[summary_part]))
+        return WindowedHistory(messages=windowed, cutoff=cutoff)
+
+    async def get_summary(self, database, user_id: str) -> Optional[ChatSummary]:
+        """The user's summary, from memory or the database."""
+        if not self.summary_enabled:
+            return None
+
+        cached = self._summaries.get(user_id)
+        if cached is not None:
+            return json.loads(cached)
+
+        summary = await database.get_summary(user_id) or {"summary": "", "message_count": 0}
+        self._summaries.set(user_id, json.dumps(summary))
+        return summary
+
+    def _get_agent(self) -> Agent:
+        if self._agent is None:
+            # Imported here so the window itself does not need model credentials
+            from app.services.agent_service import AgentService
+
+            self._agent = Agent(model=AgentService.model, instructions=SUMMARY_INSTRUCTIONS)
+        return self._agent
+
+    async def _summarize(
+        self,
+        database,
+        user_id: str,
+        messages: List[ModelMessage],
+        summary: ChatSummary,
+        cutoff: int,
+    ) -> None:
+        try:
+            transcript = _render_transcript(messages[summary["message_count"] : cutoff])
+            # A first summary of a long history only covers its most recent part
+            transcript = transcript[-SUMMARY_INPUT_CHARS:]
+            result = await self._get_agent().run(
+                f"Previous summary:\n{summary['summary'] or '(none)'}\n\n"
+                f"Next part of the conversation:\n{transcript}"
+            )
+            updated: ChatSummary = {"summary": result.output.strip(), "message_count": cutoff}
+            await database.save_summary(user_id, updated)
+            self._summaries.set(user_id, json.dumps(updated))
+        except Exception as e:
+            print(f"Error updating chat summary for user {user_id}: {e}")
+        finally:
+            self._summarizing.discard(user_id)
+
+    def schedule_summary(
+        self,
+        database,
+        user_id: str,
+        messages: List[ModelMessage],
+        summary: Optional[ChatSummary],
+        cutoff: int,
+    ) -> None:
+        """
+        Fold messages that left the window into the summary, in the background.
+
+        Does nothing if the summary already covers everything before cutoff or
+        an update for this user is already running.
+        """
+        if not self.summary_enabled or summary is None:
+            return
+        if cutoff <= summary["message_count"] or user_id in self._summarizing:
+            return
+
+        self._summarizing.add(user_id)
+        task = asyncio.create_task(
+            self._summarize(database, user_id, messages, summary, cutoff)
+        )
+        # Keep a reference so the task is not garbage collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+chat_history_window = ChatHistoryWindow(chat_config)
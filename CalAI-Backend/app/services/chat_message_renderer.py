@@ -0,0 +1,142 @@
+import json
+from typing import Any, Dict, Optional
+
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_core import to_jsonable_python
+
+from app.models.chat_models import ChatMessage
+
+# Stored rows rendered with an older version are re-rendered when read; bump
+# this whenever to_chat_message changes its output
+RENDER_VERSION = 1
+
+
+def to_chat_message(m: ModelMessage) -> Optional[ChatMessage]:
+    """Convert a model message to a chat message format."""
+    if isinstance(m, ModelRequest):
+        user_prompt_part_found = any(
+            isinstance(part, UserPromptPart) for part in m.parts
+        )
+        tool_return_parts = [
+            part for part in m.parts if isinstance(part, ToolReturnPart)
+        ]
+
+        if user_prompt_part_found:
+            for part in m.parts:
+                if isinstance(part, UserPromptPart):
+                    assert isinstance(part.content, str)
+                    return {
+                        "role": "user",
+                        "timestamp": part.timestamp.isoformat(),
+                        "content": part.content,
+                    }
+            return None
+
+        if tool_return_parts:
+            message = {
+                "role": "model",
+                "timestamp": tool_return_parts[0].timestamp.isoformat(),
+                "content": "",
+                "tool_returns": [],
+            }
+            for part in tool_return_parts:
+                message["tool_returns"].append(
+                    {
+                        "tool_call_id": part.tool_call_id,
+                        "content": part.content,
+                        "tool_name": getattr(part, "tool_name", "tool_return"),
+                    }
+                )
+            return message
+
+        return None
+
+    elif isinstance(m, ModelResponse):
+        content_parts = []
+        tool_calls = []
+        tool_returns = []
+
+        for part in m.parts:
+            if isinstance(part, TextPart):
+                content_parts.append(part.content)
+            elif isinstance(part, ToolCallPart):
+                tool_calls.append(
+                    {
+                        "tool_name": part.tool_name,
+                        "args": part.args,
+                        "tool_call_id": part.tool_call_id,
+                    }
+                )
+            elif isinstance(part, ToolReturnPart):
+                tool_name = part.tool_name if hasattr(part, "tool_name") else None
+                if not tool_name and hasattr(part, "content"):
+                    tool_name = (
+                        "calculate_nutrition_by_food_description"  # Our main tool
+                    )
+
+                content = part.content
+                if hasattr(content, "model_dump"):
+                    content = content.model_dump()
+
+                tool_returns.append(
+                    {
+                        "tool_call_id": part.tool_call_id,
+                        "content": content,
+                        "tool_name": tool_name,
+                    }
+                )
+
+        content = "".join(content_parts)
+
+        message = {
+            "role": "model",
+            "timestamp": m.timestamp.isoformat(),
+            "content": content,
+        }
+
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        if tool_returns:
+            message["tool_returns"] = tool_returns
+
+        return message
+
+    raise UnexpectedModelBehavior(f"Unexpected message type for chat app: {m}")
+
+
+def render_chat_message(message: ModelMessage) -> str:
+    """
+    The browser-facing JSON of a message, as stored in the rendered column.
+
+    Returns an empty string for messages the browser does not show, or that
+    cannot be converted, so they are skipped without being rendered again.
+    """
+    try:
+        chat_message = to_chat_message(message)
+    except Exception as e:
+        print(f"Error rendering chat message: {e}")
+        return ""
+    if chat_message is None:
+        return ""
+    return json.dumps(to_jsonable_python(chat_message))
+
+
+def render_row_content(content: Dict[str, Any]) -> str:
+    """render_chat_message for the stored content JSON of a row."""
+    try:
+        message = ModelMessagesTypeAdapter.validate_python([content])[0]
+    except Exception as e:
+        print(f"Error parsing chat message: {e}")
+        return ""
+    return render_chat_message(message)
+
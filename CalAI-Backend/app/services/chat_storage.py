@@ -0,0 +1,506 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import logfire
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+
+from app.config.chat_config import chat_config
+from app.config.database_config import DatabaseConfig, database_config
+from app.models.chat_models import ChatSummary
+from app.services.http_client import HttpClientPool
+
+Row = Dict[str, Any]
+
+
+class ChatStorage(ABC):
+    """
+    Storage backend for chat message rows and summaries.
+
+    Message rows have "user_id", "role", "content" (the ModelMessage as JSON
+    data), "timestamp", "rendered" (the browser-facing ChatMessage JSON, or an
+    empty string for messages not shown) and "render_version"; the backend
+    assigns each an increasing integer "id". Methods raise on storage errors;
+    Database decides how to handle them.
+    """
+
+    name: str
+
+    @abstractmethod
+    async def insert_messages(self, rows: List[Row]) -> None:
+        """Insert message rows in one bulk write."""
+
+    @abstractmethod
+    async def select_messages(self, user_id: str) -> List[Row]:
+        """All of a user's rows with their "content", oldest first."""
+
+    @abstractmethod
+    async def select_message_page(
+        self,
+        user_id: str,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 50,
+    ) -> List[Row]:
+        """
+        One page of a user's rows with "id", "rendered" and "render_version",
+        oldest first; the latest page without a cursor.
+        """
+
+    @abstractmethod
+    async def select_message_contents(self, user_id: str, ids: List[int]) -> List[Row]:
+        """The "id" and "content" of some of a user's rows."""
+
+    @abstractmethod
+    async def update_rendered(self, rows: List[Row]) -> None:
+        """Set "rendered" and "render_version" of rows, by "id"."""
+
+    @abstractmethod
+    async def select_message(self, user_id: str, message_id: str) -> Optional[Row]:
+        """One of a user's rows with its "content", or None."""
+
+    @abstractmethod
+    async def get_summary(self, user_id: str) -> Optional[ChatSummary]:
+        """The stored summary of a user's older messages, or None."""
+
+    @abstractmethod
+    async def save_summary(self, user_id: str, summary: ChatSummary) -> None:
+        """Insert or replace the summary of a user's older messages."""
+
+    @abstractmethod
+    async def ping(self) -> bool:
+        """Whether the storage answers a minimal query."""
+
+    @abstractmethod
+    async def aclose(self) -> None:
+        """Release connections. Called on application shutdown."""
+
+
+class SupabaseChatStorage(ChatStorage):
+    """
+    Chat storage in Supabase tables, through one pooled async client that is
+    shared by all requests, so queries neither block the event loop nor open
+    new connections per request.
+    """
+
+    name = "supabase"
+
+    def __init__(self, client: AsyncClient, http_client: httpx.AsyncClient):
+        self.client = client
+        self.http_client = http_client
+
+    @classmethod
+    async def connect(cls, config: DatabaseConfig) -> "SupabaseChatStorage":
+        """
+        Create the Supabase client and its connection pool.
+
+        Raises:
+            ValueError: If SUPABASE_URL or SUPABASE_KEY is not set
+        """
+        if not config.supabase_url or not config.supabase_key:
+            raise ValueError(
+                "Supabase URL and Key must be set in environment variables."
+            )
+        with logfire.span("connect to Supabase"):
+            http_client = httpx.AsyncClient(
+                http2=HttpClientPool.http2_available(),
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_connections,
+                    keepalive_expiry=config.keepalive_expiry_seconds,
+                ),
+                timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+                follow_redirects=True,
+            )
+            client = await acreate_client(
+                config.supabase_url,
+                config.supabase_key,
+                options=AsyncClientOptions(httpx_client=http_client),
+            )
+            return cls(client=client, http_client=http_client)
+
+    async def insert_messages(self, rows: List[Row]) -> None:
+        await self.client.table("chat_messages").insert(rows).execute()
+
+    async def select_messages(self, user_id: str) -> List[Row]:
+        result = await (
+            self.client.table("chat_messages")
+            .select("content")
+            .eq("user_id", user_id)
+            .order("timestamp", desc=False)
+            # Rows of one turn share a timestamp; keep them in insertion order
+            .order("id", desc=False)
+            .execute()
+        )
+        return result.data
+
+    async def select_message_page(
+        self,
+        user_id: str,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 50,
+    ) -> List[Row]:
+        query = (
+            self.client.table("chat_messages")
+            .select("id, rendered, render_version")
+            .eq("user_id", user_id)
+        )
+        if after is not None:
+            result = await query.gt("id", after).order("id").limit(limit).execute()
+            return result.data
+
+        if before is not None:
+            query = query.lt("id", before)
+        result = await query.order("id", desc=True).limit(limit).execute()
+        return list(reversed(result.data))
+
+    async def select_message_contents(self, user_id: str, ids: List[int]) -> List[Row]:
+        result = await (
+            self.client.table("chat_messages")
+            .select("id, content")
+            .eq("user_id", user_id)
+            .in_("id", ids)
+            .execute()
+        )
+        return result.data
+
+    async def update_rendered(self, rows: List[Row]) -> None:
+        # PostgREST has no bulk update of different values; the pooled client
+        # runs these concurrently, and each row is only ever backfilled once
+        await asyncio.gather(
+            *(
+                self.client.table("chat_messages")
+                .update({"rendered": row["rendered"], "render_version": row["render_version"]})
+                .eq("id", row["id"])
+                .execute()
+                for row in rows
+            )
+        )
+
+    async def select_message(self, user_id: str, message_id: str) -> Optional[Row]:
+        result = await (
+            self.client.table("chat_messages")
+            .select("content")
+            .eq("user_id", user_id)
+            .eq("id", message_id)
+            .single()
+            .execute()
+        )
+        return result.data
+
+    async def get_summary(self, user_id: str) -> Optional[ChatSummary]:
+        result = await (
+            self.client.table("chat_summaries")
+            .select("summary, message_count")
+            .eq("user_id", user_id)
+            .limit(1)
+            .execute()
+        )
+        if result.data:
+            row = result.data[0]
+            return {"summary": row["summary"], "message_count": row["message_count"]}
+        return None
+
+    async def save_summary(self, user_id: str, summary: ChatSummary) -> None:
+        await (
+            self.client.table("chat_summaries")
+            .upsert(
+                {
+                    "user_id": user_id,
+                    "summary": summary["summary"],
+                    "message_count": summary["message_count"],
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                },
+                on_conflict="user_id",
+            )
+            .execute()
+        )
+
+    async def ping(self) -> bool:
+        try:
+            await self.client.table("chat_messages").select("id").limit(1).execute()
+            return True
+        except Exception as e:
+            print(f"Supabase health check failed: {e}")
+            return False
+
+    async def aclose(self) -> None:
+        await self.http_client.aclose()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    rendered TEXT,
+    render_version INTEGER
+);
+CREATE INDEX IF NOT EXISTS chat_messages_user_timestamp ON chat_messages (user_id, timestamp);
+-- Entries sort by id within a user, which serves the id-keyed pages
+CREATE INDEX IF NOT EXISTS chat_messages_user ON chat_messages (user_id);
+CREATE TABLE IF NOT EXISTS chat_summaries (
+    user_id TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    message_count INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+"""
+
+# Columns added after the table was first created, for existing files
+SQLITE_ADDED_COLUMNS = {"rendered": "TEXT", "render_version": "INTEGER"}
+
+# Statements are constant strings, so each connection's statement cache
+# prepares them once
+INSERT_MESSAGE = (
+    "INSERT INTO chat_messages (user_id, role, content, timestamp, rendered, render_version)"
+    " VALUES (?, ?, ?, ?, ?, ?)"
+)
+SELECT_MESSAGES = (
+    "SELECT content FROM chat_messages WHERE user_id = ? ORDER BY timestamp, id"
+)
+SELECT_PAGE_AFTER = (
+    "SELECT id, rendered, render_version FROM chat_messages"
+    " WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?"
+)
+SELECT_PAGE_BEFORE = (
+    "SELECT id, rendered, render_version FROM chat_messages"
+    " WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?"
+)
+SELECT_PAGE_LATEST = (
+    "SELECT id, rendered, render_version FROM chat_messages"
+    " WHERE user_id = ? ORDER BY id DESC LIMIT ?"
+)
+SELECT_CONTENTS = (
+    "SELECT id, content FROM chat_messages"
+    " WHERE user_id = ? AND id IN (SELECT value FROM json_each(?))"
+)
+UPDATE_RENDERED = "UPDATE chat_messages SET rendered = ?, render_version = ? WHERE id = ?"
+SELECT_MESSAGE = "SELECT content FROM chat_messages WHERE user_id = ? AND id = ?"
+SELECT_SUMMARY = "SELECT summary, message_count FROM chat_summaries WHERE user_id = ?"
+UPSERT_SUMMARY = """
+INSERT INTO chat_summaries (user_id, summary, message_count, updated_at) VALUES (?, ?, ?, ?)
+ON CONFLICT (user_id) DO UPDATE SET
+    summary = excluded.summary,
+    message_count = excluded.message_count,
+    updated_at = excluded.updated_at
+"""
+
+
+def _utc_timestamp(timestamp: str) -> str:
+    """Timestamps are compared as text, so they are stored in one time zone."""
+    return datetime.fromisoformat(timestamp).astimezone(timezone.utc).isoformat()
+
+
+class SqliteChatStorage(ChatStorage):
+    """
+    Chat storage in a local SQLite file, for single-node deployments and for
+    running without Supabase.
+
+    The database runs in WAL mode, so reads proceed while a write is in
+    progress. Every write goes through a single writer thread, which avoids
+    lock contention between writers; reads run on a small pool of threads.
+    Each thread keeps its own connection, and JSON is encoded and decoded on
+    those threads rather than the event loop.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, read_threads: int = 4):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="chat-sqlite-writer"
+        )
+        self._readers = ThreadPoolExecutor(
+            max_workers=read_threads, thread_name_prefix="chat-sqlite-reader"
+        )
+
+    @classmethod
+    async def open(cls, path: str, read_threads: int = 4) -> "SqliteChatStorage":
+        """Open the database file, creating it and its tables if needed."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        storage = cls(path, read_threads)
+        await storage._write(storage._create_schema)
+        return storage
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Closed from aclose(), on another thread
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    async def _write(self, function: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._writer, function, *args)
+
+    async def _read(self, function: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._readers, function, *args)
+
+    def _create_schema(self) -> None:
+        connection = self._connection()
+        connection.executescript(SQLITE_SCHEMA)
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(chat_messages)")}
+        with connection:
+            for column, column_type in SQLITE_ADDED_COLUMNS.items():
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE chat_messages ADD COLUMN {column} {column_type}")
+
+    def _insert_messages(self, rows: List[Row]) -> None:
+        params = [
+            (
+                row["user_id"],
+                row["role"],
+                json.dumps(row["content"]),
+                _utc_timestamp(row["timestamp"]),
+                row["rendered"],
+                row["render_version"],
+            )
+            for row in rows
+        ]
+        with self._connection() as connection:
+            connection.executemany(INSERT_MESSAGE, params)
+
+    async def insert_messages(self, rows: List[Row]) -> None:
+        await self._write(self._insert_messages, rows)
+
+    def _select_messages(self, user_id: str) -> List[Row]:
+        cursor = self._connection().execute(SELECT_MESSAGES, (user_id,))
+        return [{"content": json.loads(content)} for (content,) in cursor]
+
+    async def select_messages(self, user_id: str) -> List[Row]:
+        return await self._read(self._select_messages, user_id)
+
+    def _select_message_page(
+        self, user_id: str, before: Optional[int], after: Optional[int], limit: int
+    ) -> List[Row]:
+        connection = self._connection()
+        if after is not None:
+            rows = connection.execute(SELECT_PAGE_AFTER, (user_id, after, limit)).fetchall()
+        else:
+            if before is not None:
+                rows = connection.execute(SELECT_PAGE_BEFORE, (user_id, before, limit)).fetchall()
+            else:
+                rows = connection.execute(SELECT_PAGE_LATEST, (user_id, limit)).fetchall()
+            rows.reverse()
+        return [
+            {"id": row_id, "rendered": rendered, "render_version": render_version}
+            for row_id, rendered, render_version in rows
+        ]
+
+    async def select_message_page(
+        self,
+        user_id: str,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 50,
+    ) -> List[Row]:
+        return await self._read(self._select_message_page, user_id, before, after, limit)
+
+    def _select_message_contents(self, user_id: str, ids: List[int]) -> List[Row]:
+        # One statement for any number of ids, so it is prepared once
+        cursor = self._connection().execute(SELECT_CONTENTS, (user_id, json.dumps(ids)))
+        return [{"id": row_id, "content": json.loads(content)} for row_id, content in cursor]
+
+    async def select_message_contents(self, user_id: str, ids: List[int]) -> List[Row]:
+        return await self._read(self._select_message_contents, user_id, ids)
+
+    def _update_rendered(self, rows: List[Row]) -> None:
+        params = [(row["rendered"], row["render_version"], row["id"]) for row in rows]
+        with self._connection() as connection:
+            connection.executemany(UPDATE_RENDERED, params)
+
+    async def update_rendered(self, rows: List[Row]) -> None:
+        await self._write(self._update_rendered, rows)
+
+    def _select_message(self, user_id: str, message_id: int) -> Optional[Row]:
+        row = self._connection().execute(SELECT_MESSAGE, (user_id, message_id)).fetchone()
+        return {"content": json.loads(row[0])} if row else None
+
+    async def select_message(self, user_id: str, message_id: str) -> Optional[Row]:
+        try:
+            row_id = int(message_id)
+        except ValueError:
+            return None
+        return await self._read(self._select_message, user_id, row_id)
+
+    def _get_summary(self, user_id: str) -> Optional[ChatSummary]:
+        row = self._connection().execute(SELECT_SUMMARY, (user_id,)).fetchone()
+        return {"summary": row[0], "message_count": row[1]} if row else None
+
+    async def get_summary(self, user_id: str) -> Optional[ChatSummary]:
+        return await self._read(self._get_summary, user_id)
+
+    def _save_summary(self, user_id: str, summary: ChatSummary) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                UPSERT_SUMMARY,
+                (
+                    user_id,
+                    summary["summary"],
+                    summary["message_count"],
+                    datetime.now(timezone.utc).isoformat(),
+                ),
+            )
+
+    async def save_summary(self, user_id: str, summary: ChatSummary) -> None:
+        await self._write(self._save_summary, user_id, summary)
+
+    def _ping(self) -> None:
+        self._connection().execute("SELECT 1").fetchone()
+
+    async def ping(self) -> bool:
+        try:
+            await self._read(self._ping)
+            return True
+        except Exception as e:
+            print(f"SQLite health check failed: {e}")
+            return False
+
+    def _close(self) -> None:
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self._close)
+
+
+async def create_chat_storage(
+    config: DatabaseConfig = database_config,
+    database_file: str = chat_config.database_file,
+) -> ChatStorage:
+    """
+    Create the chat storage for the configured backend.
+
+    Raises:
+        ValueError: If the backend is unknown, or Supabase is selected but not configured
+    """
+    if config.chat_storage_backend == "supabase":
+        return await SupabaseChatStorage.connect(config)
+    if config.chat_storage_backend == "sqlite":
+        return await SqliteChatStorage.open(database_file, config.sqlite_read_threads)
+    raise ValueError(f"Unknown CHAT_STORAGE_BACKEND: {config.chat_storage_backend}")
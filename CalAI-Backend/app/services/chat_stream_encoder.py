@@ -0,0 +1,90 @@
+import json
+from typing import Any, Dict, Optional
+
+from app.config.chat_config import chat_config
+
+STREAM_MODE_FULL = "full"
+STREAM_MODE_DELTA = "delta"
+STREAM_MODES = (STREAM_MODE_FULL, STREAM_MODE_DELTA)
+
+
+class ChatStreamEncoder:
+    """
+    Encodes the NDJSON lines of a streamed chat reply.
+
+    In "full" mode (the original protocol) every text delta is sent as an
+    is_partial message carrying all the text so far, so bytes and encoding work
+    grow quadratically with the length of the reply. In "delta" mode each text
+    delta is sent on its own as {"delta": ..., "is_delta": true}, and every
+    snapshot_every deltas an is_snapshot message carries the full text instead,
+    so a client that dropped or misapplied a delta can resync. Every line in
+    delta mode has a seq number, increasing by one per line, so clients can
+    detect gaps. Non-text messages (user prompt, tool calls and results, the
+    final message) are the same in both modes.
+    """
+
+    def __init__(
+        self,
+        timestamp: str,
+        mode: str = STREAM_MODE_FULL,
+        snapshot_every: Optional[int] = None,
+    ):
+        self.timestamp = timestamp
+        self.mode = mode if mode in STREAM_MODES else STREAM_MODE_FULL
+        self.snapshot_every = (
+            chat_config.stream_snapshot_every if snapshot_every is None else snapshot_every
+        )
+        self.accumulated_text = ""
+        self.seq = 0
+        self._deltas_since_snapshot = 0
+
+    @staticmethod
+    def negotiate(query_mode: Optional[str], header_mode: Optional[str]) -> str:
+        """Pick the stream mode from the ?stream= parameter or X-Chat-Stream header."""
+        requested = (query_mode or header_mode or STREAM_MODE_FULL).strip().lower()
+        return requested if requested in STREAM_MODES else STREAM_MODE_FULL
+
+    def _encode(self, message: Dict[str, Any]) -> bytes:
+        if self.mode == STREAM_MODE_DELTA:
+            self.seq += 1
+            message["seq"] = self.seq
+        return json.dumps(message).encode("utf-8") + b"\n"
+
+    def text_delta(self, delta: str) -> bytes:
+        """Line for a piece of streamed model text."""
+        self.accumulated_text += delta
+
+        if self.mode == STREAM_MODE_FULL:
+            return self._encode(
+                {
+                    "role": "model",
+                    "timestamp": self.timestamp,
+                    "content": self.accumulated_text,
+                    "is_partial": True,
+                }
+            )
+
+        self._deltas_since_snapshot += 1
+        if self.snapshot_every and self._deltas_since_snapshot >= self.snapshot_every:
+            self._deltas_since_snapshot = 0
+            return self._encode(
+                {
+                    "role": "model",
+                    "timestamp": self.timestamp,
+                    "content": self.accumulated_text,
+                    "is_partial": True,
+                    "is_snapshot": True,
+                }
+            )
+        return self._encode(
+            {
+                "role": "model",
+                "timestamp": self.timestamp,
+                "delta": delta,
+                "is_delta": True,
+            }
+        )
+
+    def message(self, message: Dict[str, Any]) -> bytes:
+        """Line for any other message, e.g. the user prompt, a tool call or the final reply."""
+        return self._encode(message)
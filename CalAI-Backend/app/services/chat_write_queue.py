@@ -0,0 +1,133 @@
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config.chat_config import ChatConfig
+from app.services.chat_history_cache import chat_history_cache
+
+Row = Dict[str, Any]
+
+
+class ChatWriteQueue:
+    """
+    Write-behind buffer for chat message rows.
+
+    Rows are buffered in memory and written by a background task in bulk
+    inserts, once batch_size rows are waiting or every flush_interval_seconds,
+    so a chat stream can close without waiting on the database. The buffer is
+    bounded: when max_buffered_rows are waiting, enqueue() flushes before it
+    returns. A failed insert puts its rows back at the front of the buffer, in
+    order, to be retried on the next flush. Rows that do not fit while the
+    database keeps failing are dropped, oldest first, and their users' cached
+    histories invalidated so they are not served rows the database lacks.
+    """
+
+    def __init__(
+        self, insert_rows: Callable[[List[Row]], Awaitable[Any]], config: ChatConfig
+    ):
+        self.insert_rows = insert_rows
+        self.batch_size = config.write_batch_size
+        self.flush_interval_seconds = config.write_flush_interval_seconds
+        self.max_buffered_rows = config.write_max_buffered_rows
+
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.failed_flushes = 0
+
+        self._buffer: List[Row] = []
+        # Buffered rows per user, so reads can tell whether they would miss writes
+        self._pending_users: Counter = Counter()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def has_pending(self, user_id: str) -> bool:
+        """Whether rows of this user are buffered and not yet in the database."""
+        return self._pending_users[user_id] > 0
+
+    async def enqueue(self, rows: List[Row]) -> None:
+        """Buffer rows for writing; flushes first if the buffer is full."""
+        if len(self._buffer) + len(rows) > self.max_buffered_rows:
+            await self.flush()
+            overflow = len(self._buffer) + len(rows) - self.max_buffered_rows
+            if overflow > 0:
+                self._drop(self._buffer[:overflow])
+                del self._buffer[:overflow]
+
+        self._buffer.extend(rows)
+        self._pending_users.update(row["user_id"] for row in rows)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        """Write every buffered row now, in batches of batch_size."""
+        async with self._flush_lock:
+            while self._buffer:
+                batch = self._buffer[: self.batch_size]
+                del self._buffer[: self.batch_size]
+                try:
+                    await self.insert_rows(batch)
+                except asyncio.CancelledError:
+                    # Shutdown interrupted the insert; stop() flushes these again
+                    self._buffer[:0] = batch
+                    raise
+                except Exception as e:
+                    self.failed_flushes += 1
+                    print(f"Error flushing {len(batch)} chat messages: {e}")
+                    self._requeue(batch)
+                    return
+                self.rows_written += len(batch)
+                self._release(batch)
+
+    def _release(self, rows: List[Row]) -> None:
+        self._pending_users.subtract(row["user_id"] for row in rows)
+        for user_id in {row["user_id"] for row in rows}:
+            if self._pending_users[user_id] <= 0:
+                del self._pending_users[user_id]
+
+    def _requeue(self, batch: List[Row]) -> None:
+        room = max(self.max_buffered_rows - len(self._buffer), 0)
+        self._buffer[:0] = batch[:room]
+        if batch[room:]:
+            self._drop(batch[room:])
+
+    def _drop(self, rows: List[Row]) -> None:
+        self.rows_dropped += len(rows)
+        self._release(rows)
+        for user_id in {row["user_id"] for row in rows}:
+            chat_history_cache.invalidate(user_id)
+        print(f"Dropped {len(rows)} chat messages that could not be written")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        """Start the background flusher. Called on application startup."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background flusher and write what is left. Called on shutdown."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        """Queue metrics for the health check."""
+        return {
+            "buffered_rows": len(self._buffer),
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "failed_flushes": self.failed_flushes,
+        }
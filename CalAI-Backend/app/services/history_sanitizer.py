@@ -0,0 +1,104 @@
+from dataclasses import dataclass, field, replace
+from typing import AbstractSet, Dict, List, Set
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    RetryPromptPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+
+# Built-in tool calls and their returns travel in the same response and are
+# left alone. Retry prompts answer a call whose arguments failed validation.
+CALL_PARTS = (ToolCallPart,)
+RETURN_PARTS = (ToolReturnPart, RetryPromptPart)
+TOOL_PARTS = CALL_PARTS + RETURN_PARTS
+
+
+@dataclass
+class SanitizedHistory:
+    """Orphan-free messages, plus the state needed to sanitize what is appended next."""
+
+    messages: List[ModelMessage]
+    # Calls answered by a later message that has not been seen yet
+    pending_tool_calls: Set[str] = field(default_factory=set)
+    removed_parts: int = 0
+
+
+class HistorySanitizer:
+    """
+    Removes tool calls without a return and tool returns without a call, which
+    the model API rejects, e.g. from a run that failed between the two.
+
+    Parts are classified by type. A history is sanitized in two linear passes,
+    and messages appended to an already sanitized history are checked on their
+    own, so a turn costs the same however long the history is. Messages are
+    never edited in place, since they are shared with the history cache.
+
+    A call and its return are expected in the same batch, as a completed agent
+    run stores them; a batch that splits them loses both.
+    """
+
+    @staticmethod
+    def sanitize(
+        messages: List[ModelMessage],
+        pending_tool_calls: AbstractSet[str] = frozenset(),
+    ) -> SanitizedHistory:
+        """
+        Sanitize messages, or a batch appended to a sanitized history.
+
+        Args:
+            messages: The messages to sanitize
+            pending_tool_calls: Calls of the preceding history still awaiting
+                their return, from the previous SanitizedHistory
+
+        Returns:
+            SanitizedHistory: The kept messages and the state for the next batch
+        """
+        call_index: Dict[str, int] = {}
+        return_index: Dict[str, int] = {}
+        for index, message in enumerate(messages):
+            for part in message.parts:
+                if isinstance(part, CALL_PARTS):
+                    call_index[part.tool_call_id] = index
+                elif isinstance(part, RETURN_PARTS):
+                    return_index[part.tool_call_id] = index
+
+        valid_calls = set(pending_tool_calls)
+        valid_calls.update(
+            tool_call_id
+            for tool_call_id, index in call_index.items()
+            if return_index.get(tool_call_id, -1) > index
+        )
+
+        kept: List[ModelMessage] = []
+        pending = set(pending_tool_calls)
+        removed_parts = 0
+        for message in messages:
+            parts = [
+                part
+                for part in message.parts
+                if not isinstance(part, TOOL_PARTS) or part.tool_call_id in valid_calls
+            ]
+            removed_parts += len(message.parts) - len(parts)
+            if message.parts and not parts:
+                continue
+
+            calls = {part.tool_call_id for part in parts if isinstance(part, CALL_PARTS)}
+            returns = {part.tool_call_id for part in parts if isinstance(part, RETURN_PARTS)}
+            if calls:
+                pending |= calls
+            elif returns:
+                # A return must follow its call
+                if not returns <= pending:
+                    removed_parts += len(parts)
+                    continue
+                pending -= returns
+
+            kept.append(message if len(parts) == len(message.parts) else replace(message, parts=parts))
+
+        if removed_parts:
+            print(f"Sanitized history: removed {removed_parts} orphaned tool parts")
+        return SanitizedHistory(
+            messages=kept, pending_tool_calls=pending, removed_parts=removed_parts
+        )
@@ -0,0 +1,204 @@
+import asyncio
+import importlib.util
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.config.http_config import HttpConfig, http_config
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+HostKey = Tuple[bytes, bytes, Optional[int]]
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that frees its per-host slot once the body is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
+
+
+class _HostLimit:
+    """Per-host semaphore, with the number of requests holding or awaiting a slot."""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class PerHostLimitTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that caps concurrent requests per host and retries
+    idempotent requests on transient statuses.
+
+    httpx only limits connections pool-wide, so the per-host cap is enforced
+    here; connection errors are retried by the wrapped transport itself. A
+    host's semaphore is dropped once no request holds or awaits it, so hosts
+    seen once (e.g. image URLs) do not accumulate.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, config: HttpConfig):
+        self._transport = transport
+        self._config = config
+        self._host_limits: Dict[HostKey, _HostLimit] = {}
+
+    async def _acquire(self, host: HostKey) -> None:
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = _HostLimit(self._config.max_connections_per_host)
+        limit.users += 1
+        try:
+            await limit.semaphore.acquire()
+        except BaseException:
+            self._drop_user(host, limit)
+            raise
+
+    def _release(self, host: HostKey) -> None:
+        limit = self._host_limits[host]
+        limit.semaphore.release()
+        self._drop_user(host, limit)
+
+    def _drop_user(self, host: HostKey, limit: _HostLimit) -> None:
+        limit.users -= 1
+        if limit.users == 0:
+            del self._host_limits[host]
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        host = (url.raw_scheme, url.raw_host, url.port)
+        retries = self._config.max_retries if request.method in IDEMPOTENT_METHODS else 0
+
+        for attempt in range(retries + 1):
+            await self._acquire(host)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except BaseException:
+                self._release(host)
+                raise
+
+            if response.status_code in self._config.retry_statuses and attempt < retries:
+                await response.aclose()
+                self._release(host)
+                await asyncio.sleep(self._config.retry_backoff_seconds * (2**attempt))
+                continue
+
+            return httpx.Response(
+                status_code=response.status_code,
+                headers=response.headers,
+                stream=_ReleasingStream(response.stream, lambda: self._release(host)),
+                extensions=response.extensions,
+            )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class HttpClientPool:
+    """
+    Shared keep-alive HTTP clients for outbound requests (image downloads,
+    Open Food Facts lookups), so repeated calls to the same host reuse
+    connections instead of paying DNS, TCP and TLS setup every time.
+
+    The sync side is a requests.Session with a pooled HTTPAdapter; the async side
+    is an httpx.AsyncClient, using HTTP/2 when the h2 package is installed.
+    """
+
+    _session: Optional[requests.Session] = None
+    _async_client: Optional[httpx.AsyncClient] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def http2_available() -> bool:
+        """Whether HTTP/2 is enabled and the optional h2 package is installed."""
+        return http_config.http2_enabled and importlib.util.find_spec("h2") is not None
+
+    @staticmethod
+    def timeout() -> Tuple[float, float]:
+        """(connect, read) timeout for sync requests."""
+        return (http_config.connect_timeout, http_config.read_timeout)
+
+    @staticmethod
+    def _build_session(config: HttpConfig) -> requests.Session:
+        retry = Retry(
+            total=config.max_retries,
+            backoff_factor=config.retry_backoff_seconds,
+            status_forcelist=config.retry_statuses,
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+        )
+        # urllib3 keeps one pool per host; pool_maxsize only caps the idle
+        # connections kept, so pool_block makes it the per-host concurrency cap
+        adapter = HTTPAdapter(
+            pool_connections=max(1, config.max_connections // config.max_connections_per_host),
+            pool_maxsize=config.max_connections_per_host,
+            pool_block=True,
+            max_retries=retry,
+        )
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @staticmethod
+    def _build_async_client(config: HttpConfig) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(
+            http2=HttpClientPool.http2_available(),
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_connections,
+                keepalive_expiry=config.keepalive_expiry_seconds,
+            ),
+            retries=config.max_retries,
+        )
+        return httpx.AsyncClient(
+            transport=PerHostLimitTransport(transport, config),
+            timeout=httpx.Timeout(config.read_timeout, connect=config.connect_timeout),
+            follow_redirects=True,
+        )
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """Get or create the shared sync session."""
+        if cls._session is None:
+            with cls._lock:
+                if cls._session is None:
+                    cls._session = cls._build_session(http_config)
+        return cls._session
+
+    @classmethod
+    def get_async_client(cls) -> httpx.AsyncClient:
+        """Get or create the shared async client."""
+        if cls._async_client is None or cls._async_client.is_closed:
+            cls._async_client = cls._build_async_client(http_config)
+        return cls._async_client
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close both clients and their pooled connections. Called on application shutdown."""
+        if cls._async_client is not None:
+            await cls._async_client.aclose()
+            cls._async_client = None
+
+        with cls._lock:
+            if cls._session is not None:
+                cls._session.close()
+                cls._session = None
@@ -1,6 +1,13 @@
 import base64
 import binascii
-from typing import Optional
+import io
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from app.services.multipart_stream import MultipartStream, check_body_size
+from app.services.perceptual_hash import dhash
 from app.exceptions import (
     ValidationException,
     ImageProcessingException,
@@ -10,6 +17,29 @@ from app.exceptions import (
 from app.models.error_models import ErrorCode, ErrorDetail
 
 
+@dataclass
+class PreparedImage:
+    """Image bytes ready to send to Gemini, with the metadata of how they were produced."""
+
+    data: bytes
+    mime_type: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    original_size_bytes: int = 0
+    reencoded: bool = False
+    phash: Optional[int] = None
+
+
+def _invalid_base64() -> ValidationException:
+    return ValidationException(
+        message="Invalid base64 encoding in image data",
+        error_code=ErrorCode.INVALID_BASE64,
+        field="imageData",
+        constraint="valid_base64",
+        suggestion="Please ensure the image is properly encoded in base64 format",
+    )
+
+
 class ImageService:
     """
     Service class for handling image-related operations with proper error handling.
@@ -17,45 +47,16 @@ class ImageService:
 
     MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10 MB
     SUPPORTED_FORMATS = ["jpeg", "jpg", "png", "webp"]
-
-    @staticmethod
-    def validate_base64_string(base64_string: str) -> None:
-        """
-        Validate if the provided string is valid base64.
-
-        Args:
-            base64_string: The base64 string to validate
-
-        Raises:
-            ValidationException: If the string is not valid base64
-        """
-        if not base64_string:
-            raise ValidationException(
-                message="Image data cannot be empty",
-                error_code=ErrorCode.MISSING_REQUIRED_FIELD,
-                field="imageData",
-                constraint="required",
-                suggestion="Please provide a valid base64 encoded image",
-            )
-
-        try:
-            decoded = base64.b64decode(base64_string, validate=True)
-            if len(decoded) == 0:
-                raise ValidationException(
-                    message="Image data is empty after decoding",
-                    error_code=ErrorCode.INVALID_BASE64,
-                    field="imageData",
-                    constraint="non_empty_after_decode",
-                    suggestion="Please ensure the base64 string contains valid image data",
-                )
-        except (ValueError, binascii.Error) as e:
-            raise ValidationException(
-                message="Invalid base64 encoding in image data",
-                error_code=ErrorCode.INVALID_BASE64,
-                field="imageData",
-                constraint="valid_base64",
-                suggestion="Please ensure the image is properly encoded in base64 format",
-            ) from e
+    MIME_TYPES = {
+        "jpeg": "image/jpeg",
+        "jpg": "image/jpeg",
+        "png": "image/png",
+        "webp": "image/webp",
+        "gif": "image/gif",
+    }
+    # Small, upright images in a supported format are sent without re-encoding
+    PASSTHROUGH_MAX_BYTES = 512 * 1024
+    EXIF_ORIENTATION_TAG = 0x0112
 
     @staticmethod
     def validate_image_size(image_bytes: bytes) -> None:
@@ -68,8 +69,10 @@ class ImageService:
         Raises:
             ImageProcessingException: If the image is too large
         """
-        image_size = len(image_bytes)
+        ImageService._check_image_size(len(image_bytes))
 
+    @staticmethod
+    def _check_image_size(image_size: int) -> None:
         if image_size > ImageService.MAX_IMAGE_SIZE:
             raise image_too_large(
                 message=f"Image size ({image_size / (1024*1024):.2f} MB) exceeds maximum allowed size ({ImageService.MAX_IMAGE_SIZE / (1024*1024):.0f} MB)",
@@ -128,11 +131,21 @@ class ImageService:
 
         return detected_format
 
+    @staticmethod
+    def estimate_decoded_size(base64_string: str) -> int:
+        """Size in bytes the base64 string decodes to, computed without decoding."""
+        padding = base64_string[-2:].count("=")
+        return len(base64_string) * 3 // 4 - padding
+
     @staticmethod
     def getImageBytes(base64Image: str) -> bytes:
         """
         Convert base64 encoded image string to bytes with comprehensive validation.
 
+        The payload is decoded exactly once: the size limit is checked from the
+        encoded length and the format from the first decoded bytes beforehand,
+        so oversized or non-image payloads are rejected without decoding them.
+
         Args:
             base64Image: Base64 encoded image string
 
@@ -143,14 +156,36 @@ class ImageService:
             ValidationException: If base64 validation fails
             ImageProcessingException: If image validation fails
         """
-        ImageService.validate_base64_string(base64Image)
+        if not base64Image:
+            raise ValidationException(
+                message="Image data cannot be empty",
+                error_code=ErrorCode.MISSING_REQUIRED_FIELD,
+                field="imageData",
+                constraint="required",
+                suggestion="Please provide a valid base64 encoded image",
+            )
 
         try:
-            image_bytes = base64.b64decode(base64Image)
+            image_size = ImageService.estimate_decoded_size(base64Image)
+            if image_size > ImageService.MAX_IMAGE_SIZE:
+                raise image_too_large(
+                    message=f"Image size ({image_size / (1024*1024):.2f} MB) exceeds maximum allowed size ({ImageService.MAX_IMAGE_SIZE / (1024*1024):.0f} MB)",
+                    image_size=image_size,
+                )
 
-            ImageService.validate_image_size(image_bytes)
+            # 16 characters decode to the 12 bytes format detection looks at
+            try:
+                header = base64.b64decode(base64Image[:16], validate=True)
+            except (ValueError, binascii.Error) as e:
+                raise _invalid_base64() from e
+            ImageService.validate_image_format(header)
 
-            detected_format = ImageService.validate_image_format(image_bytes)
+            try:
+                # a2b_base64 reads the str buffer directly; b64decode would first
+                # copy it into a bytes object, adding the encoded size to peak memory
+                image_bytes = binascii.a2b_base64(base64Image, strict_mode=True)
+            except (ValueError, binascii.Error) as e:
+                raise _invalid_base64() from e
 
             return image_bytes
 
@@ -162,6 +197,58 @@ class ImageService:
                 error_code=ErrorCode.INVALID_IMAGE_FORMAT,
             ) from e
 
+    @staticmethod
+    async def read_multipart_image(
+        body: AsyncIterator[bytes], content_type: str, field_name: str = "image"
+    ) -> Tuple[bytearray, MultipartStream]:
+        """
+        Read an image and the form fields around it from a multipart body as it
+        streams in, enforcing the size limit as the image bytes arrive.
+
+        The image is collected in memory only, never spooled to a temporary
+        file, and an oversized one is rejected as soon as it crosses the limit.
+        It is returned as the buffer it was collected in rather than a copy.
+
+        Args:
+            body: The raw request body, e.g. request.stream()
+            content_type: The request's Content-Type, carrying the boundary
+            field_name: The form field holding the image
+
+        Returns:
+            Tuple[bytearray, MultipartStream]: The validated image bytes, and
+                the parsed body for its text fields
+
+        Raises:
+            ValidationException: If the body is not multipart, or the image is missing or empty
+            ImageProcessingException: If the image is too large or not a supported format
+        """
+        stream = MultipartStream(content_type, field_name)
+        image = bytearray()
+        body_size = 0
+        async for chunk in body:
+            body_size += len(chunk)
+            check_body_size(body_size, ImageService.MAX_IMAGE_SIZE)
+            stream.write(chunk)
+            if stream.pending_bytes:
+                image += stream.take_pending()
+                ImageService._check_image_size(len(image))
+        stream.finalize()
+        image += stream.take_pending()
+        ImageService._check_image_size(len(image))
+
+        stream.require_file()
+        if not image:
+            raise ValidationException(
+                message="Uploaded image is empty",
+                error_code=ErrorCode.MISSING_REQUIRED_FIELD,
+                field=field_name,
+                constraint="required",
+                suggestion="Please attach an image file",
+            )
+
+        ImageService.validate_image_format(image)
+        return image, stream
+
     @staticmethod
     def validate_and_get_image_info(base64Image: str) -> dict:
         """
@@ -182,3 +269,143 @@ class ImageService:
             "format": image_format,
             "is_valid": True,
         }
+
+    @staticmethod
+    def detect_mime_type(image_bytes: bytes) -> str:
+        """
+        Detect the MIME type from the image bytes.
+
+        Returns:
+            str: The MIME type, falling back to image/jpeg when unknown
+        """
+        detected_format = ImageService.detect_image_format(image_bytes)
+        return ImageService.MIME_TYPES.get(detected_format, "image/jpeg")
+
+    @staticmethod
+    def _to_rgb(image: Image.Image) -> Image.Image:
+        """Convert to RGB for JPEG encoding, flattening transparency onto white rather than black."""
+        if image.mode == "RGB":
+            return image
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            return background
+        return image.convert("RGB")
+
+    @staticmethod
+    def make_thumbnail(image_bytes: bytes, max_edge: int, quality: int) -> bytes:
+        """
+        Render a JPEG thumbnail whose longest edge is at most max_edge.
+
+        Args:
+            image_bytes: The raw image bytes
+            max_edge: Maximum length in pixels of the longest edge
+            quality: JPEG quality of the thumbnail
+
+        Returns:
+            bytes: The JPEG-encoded thumbnail
+
+        Raises:
+            ImageProcessingException: If the image cannot be decoded
+        """
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+            # JPEG can decode directly at a reduced scale close to the target size
+            image.draft("RGB", (max_edge, max_edge))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        except Exception as e:
+            raise ImageProcessingException(
+                message=f"Could not decode image for thumbnail: {e}",
+                error_code=ErrorCode.INVALID_IMAGE_FORMAT,
+            ) from e
+
+        output = io.BytesIO()
+        ImageService._to_rgb(image).save(output, format="JPEG", quality=quality, optimize=True)
+        return output.getvalue()
+
+    @staticmethod
+    def prepare_for_analysis(
+        image_bytes: bytes,
+        max_edge: int,
+        quality: int,
+        compute_phash: bool = False,
+    ) -> PreparedImage:
+        """
+        Decode the image once, apply its EXIF orientation, downscale it so the
+        longest edge is at most max_edge and re-encode it as JPEG.
+
+        Small upright images in a supported format are passed through unchanged.
+        Images Pillow cannot decode are passed through with their detected MIME type.
+
+        Args:
+            image_bytes: The raw image bytes
+            max_edge: Maximum length in pixels of the longest edge
+            quality: JPEG quality used when re-encoding
+            compute_phash: Also compute the perceptual hash from the decoded image
+
+        Returns:
+            PreparedImage: The bytes to send and their real MIME type
+        """
+        original_size = len(image_bytes)
+        detected_format = ImageService.detect_image_format(image_bytes)
+        mime_type = ImageService.MIME_TYPES.get(detected_format, "image/jpeg")
+
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+            source_width, source_height = image.size
+            needs_resize = max(source_width, source_height) > max_edge
+            if needs_resize:
+                # JPEG can decode directly at a reduced scale close to the target size
+                scale = max_edge / max(source_width, source_height)
+                image.draft(
+                    "RGB", (int(source_width * scale), int(source_height * scale))
+                )
+
+            orientation = image.getexif().get(ImageService.EXIF_ORIENTATION_TAG, 1)
+            if orientation != 1:
+                image = ImageOps.exif_transpose(image)
+            image.load()
+        except Exception as e:
+            print(f"Could not decode image for preprocessing: {e}")
+            return PreparedImage(
+                data=image_bytes,
+                mime_type=mime_type,
+                original_size_bytes=original_size,
+            )
+
+        if max(image.size) > max_edge:
+            image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+        phash = dhash(image) if compute_phash else None
+
+        passthrough = (
+            not needs_resize
+            and orientation == 1
+            and detected_format in ImageService.SUPPORTED_FORMATS
+            and original_size <= ImageService.PASSTHROUGH_MAX_BYTES
+        )
+        if passthrough:
+            return PreparedImage(
+                data=image_bytes,
+                mime_type=mime_type,
+                width=image.width,
+                height=image.height,
+                original_size_bytes=original_size,
+                phash=phash,
+            )
+
+        image = ImageService._to_rgb(image)
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+
+        return PreparedImage(
+            data=output.getvalue(),
+            mime_type="image/jpeg",
+            width=image.width,
+            height=image.height,
+            original_size_bytes=original_size,
+            reencoded=True,
+            phash=phash,
+        )
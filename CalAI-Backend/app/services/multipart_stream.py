@@ -0,0 +1,185 @@
+from typing import Dict, List, Optional
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from app.exceptions import ValidationException, image_too_large
+from app.models.error_models import ErrorCode
+
+# Multipart boundaries, part headers and small form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def check_body_size(size: int, max_file_bytes: int) -> None:
+    """
+    Reject a multipart body that cannot hold a file within the limit.
+
+    Args:
+        size: Bytes of the body announced (Content-Length) or received so far
+        max_file_bytes: Largest accepted file
+
+    Raises:
+        ImageProcessingException: If size exceeds the limit plus room for the
+            multipart framing and form fields
+    """
+    if size > max_file_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise image_too_large(
+            message=f"Upload exceeds maximum allowed size ({max_file_bytes / (1024*1024):.0f} MB)",
+            image_size=size,
+        )
+
+
+def check_content_length(content_length: Optional[str], max_file_bytes: int) -> None:
+    """Reject a request whose Content-Length is over the limit, before its body is read."""
+    if content_length and content_length.isdigit():
+        check_body_size(int(content_length), max_file_bytes)
+
+
+class MultipartStream:
+    """
+    A multipart/form-data body parsed as it streams in.
+
+    The bytes of one file field are handed out as they are parsed, through
+    take_pending(), so callers can write or check them chunk by chunk; the
+    other, text fields are collected in fields. Only the first part with the
+    file field's name is taken.
+    """
+
+    def __init__(self, content_type: str, file_field: str):
+        """
+        Raises:
+            ValidationException: If content_type is not multipart/form-data with a boundary
+        """
+        media_type, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise ValidationException(
+                message="Upload must be sent as multipart/form-data",
+                field="Content-Type",
+                value=content_type,
+                constraint="multipart/form-data",
+                suggestion=f"Send the image as the '{file_field}' field of a multipart form",
+            )
+
+        self.file_field = file_field
+        self.filename: Optional[str] = None
+        self.found = False
+        # Text fields by name; repeated names, e.g. list fields, keep every value
+        self.fields: Dict[str, List[str]] = {}
+
+        self._in_file = False
+        self._text_field: Optional[str] = None
+        self._text_value = bytearray()
+        self._header_field = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        # File bytes parsed but not taken yet
+        self._pending: List[bytes] = []
+        self._pending_bytes = 0
+        self._parser = MultipartParser(boundary, self._callbacks())
+
+    def _callbacks(self) -> dict:
+        def on_part_begin() -> None:
+            self._headers = {}
+
+        def on_header_field(data: bytes, start: int, end: int) -> None:
+            self._header_field += data[start:end]
+
+        def on_header_value(data: bytes, start: int, end: int) -> None:
+            self._header_value += data[start:end]
+
+        def on_header_end() -> None:
+            self._headers[self._header_field.lower()] = self._header_value
+            self._header_field = b""
+            self._header_value = b""
+
+        def on_headers_finished() -> None:
+            _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+            name = options.get(b"name", b"").decode("utf-8", "replace")
+            self._in_file = not self.found and name == self.file_field
+            if self._in_file:
+                self.found = True
+                filename = options.get(b"filename")
+                self.filename = filename.decode("utf-8", "replace") if filename else None
+            elif b"filename" not in options:
+                self._text_field = name
+
+        def on_part_data(data: bytes, start: int, end: int) -> None:
+            if self._in_file:
+                self._pending.append(data[start:end])
+                self._pending_bytes += end - start
+            elif self._text_field is not None:
+                self._text_value += data[start:end]
+
+        def on_part_end() -> None:
+            if self._text_field is not None:
+                self.fields.setdefault(self._text_field, []).append(
+                    self._text_value.decode("utf-8", "replace")
+                )
+            self._in_file = False
+            self._text_field = None
+            self._text_value = bytearray()
+
+        return {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        }
+
+    @staticmethod
+    def _malformed(error: Exception) -> ValidationException:
+        return ValidationException(
+            message=f"Malformed multipart body: {error}",
+            field="body",
+            constraint="multipart/form-data",
+            suggestion="Send the image as a multipart form field",
+        )
+
+    def write(self, chunk: bytes) -> None:
+        """Parse the next chunk of the body."""
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise self._malformed(e)
+
+    def finalize(self) -> None:
+        """Finish parsing once the body has ended."""
+        try:
+            self._parser.finalize()
+        except MultipartParseError as e:
+            raise self._malformed(e)
+
+    @property
+    def pending_bytes(self) -> int:
+        """File bytes parsed and not taken yet."""
+        return self._pending_bytes
+
+    def take_pending(self) -> bytes:
+        """Return the file bytes parsed since the last call."""
+        data = b"".join(self._pending)
+        self._pending.clear()
+        self._pending_bytes = 0
+        return data
+
+    def field(self, name: str) -> Optional[str]:
+        """The last value of a text field, or None if it was not sent."""
+        values = self.fields.get(name)
+        return values[-1] if values else None
+
+    def require_file(self) -> None:
+        """
+        Raises:
+            ValidationException: If the body had no part for the file field
+        """
+        if not self.found:
+            raise ValidationException(
+                message="Uploaded image is missing",
+                error_code=ErrorCode.MISSING_REQUIRED_FIELD,
+                field=self.file_field,
+                constraint="required",
+                suggestion="Please attach an image file",
+            )
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import Request
+
+from app.config.nutrition_config import nutrition_config
+from app.models.nutrition_batch_payload import (
+    NutritionBatchPayload,
+    NutritionBatchSummary,
+)
+from app.models.nutrition_input_payload import NutritionInputPayload
+from app.models.service_response import NutritionServiceResponse
+from app.services.async_nutrition_service import AsyncNutritionService
+from app.exceptions import BaseCalAIException, ValidationException
+from app.utils.error_handler import ErrorHandler
+from app.models.error_models import ErrorCode
+
+
+class NutritionBatchService:
+    """
+    Runs a batch of nutrition analyses with bounded concurrency and streams
+    each result as an NDJSON line as soon as it completes.
+    """
+
+    @staticmethod
+    def validate_batch(payload: NutritionBatchPayload) -> None:
+        """
+        Reject batches over the configured size limit.
+
+        Raises:
+            ValidationException: If the batch has too many items
+        """
+        if len(payload.items) > nutrition_config.batch_max_items:
+            raise ValidationException(
+                message=f"Batch has {len(payload.items)} items; the maximum is {nutrition_config.batch_max_items}",
+                field="items",
+                value=len(payload.items),
+                constraint=f"max_items={nutrition_config.batch_max_items}",
+                suggestion="Split the items into several smaller batches",
+            )
+
+    @staticmethod
+    def _concurrency(payload: NutritionBatchPayload) -> int:
+        """Requested concurrency, capped by the server-side maximum."""
+        requested = payload.concurrency or nutrition_config.batch_default_concurrency
+        return max(1, min(requested, nutrition_config.batch_max_concurrency))
+
+    @staticmethod
+    async def _analyze_item(query: NutritionInputPayload) -> NutritionServiceResponse:
+        """
+        Route a batch item to image or description analysis.
+
+        Raises:
+            ValidationException: If the item has neither an image nor a description
+        """
+        if query.imageUrl or query.imageData:
+            return await AsyncNutritionService.get_nutrition_data(query)
+        if query.food_description:
+            return await AsyncNutritionService.log_food_nutrition_data_using_description(
+                query
+            )
+
+        raise ValidationException(
+            message="Each batch item needs an imageUrl, imageData or a food_description",
+            error_code=ErrorCode.MISSING_REQUIRED_FIELD,
+            field="imageUrl",
+            constraint="required",
+            suggestion="Provide an image or a description of the food items",
+        )
+
+    @staticmethod
+    async def _run_item(
+        index: int,
+        query: NutritionInputPayload,
+        semaphore: asyncio.Semaphore,
+        request: Optional[Request],
+    ) -> Dict[str, Any]:
+        """Analyse one item, turning any error into a per-item error line."""
+        async with semaphore:
+            start_time = time.time()
+            try:
+                response = await NutritionBatchService._analyze_item(query)
+                return {
+                    "type": "item",
+                    "index": index,
+                    "status": response.status,
+                    "result": response.to_dict(),
+                }
+
+            except BaseCalAIException as e:
+                error_response = ErrorHandler.handle_custom_exception(
+                    exception=e,
+                    request=request,
+                    execution_time=time.time() - start_time,
+                )
+
+            except Exception as e:
+                error_response = ErrorHandler.handle_unexpected_exception(
+                    exception=e,
+                    request=request,
+                    execution_time=time.time() - start_time,
+                    user_message="An unexpected error occurred while processing this batch item",
+                )
+
+            return {
+                "type": "item",
+                "index": index,
+                "status": error_response.status_code,
+                "error": error_response.to_dict(),
+            }
+
+    @staticmethod
+    def _add_to_summary(summary: NutritionBatchSummary, line: Dict[str, Any]) -> None:
+        """Fold one item's outcome and token usage into the batch summary."""
+        if line["status"] >= 400 or "error" in line:
+            summary.failed += 1
+        else:
+            summary.succeeded += 1
+
+        metadata = (line.get("result") or {}).get("metadata") or {}
+        summary.input_token_count += metadata.get("input_token_count") or 0
+        summary.output_token_count += metadata.get("output_token_count") or 0
+        summary.total_token_count += metadata.get("total_token_count") or 0
+        summary.estimated_cost += metadata.get("estimated_cost") or 0.0
+
+    @staticmethod
+    async def stream_batch(
+        payload: NutritionBatchPayload, request: Optional[Request] = None
+    ) -> AsyncIterator[str]:
+        """
+        Analyse all items and yield one NDJSON line per item in completion order,
+        followed by a summary line with aggregate token usage and cost.
+
+        Args:
+            payload: The batch of nutrition queries
+            request: FastAPI request object for error context
+
+        Yields:
+            str: A JSON document terminated by a newline
+        """
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(NutritionBatchService._concurrency(payload))
+        summary = NutritionBatchSummary(total_items=len(payload.items))
+
+        tasks = [
+            asyncio.create_task(
+                NutritionBatchService._run_item(index, query, semaphore, request)
+            )
+            for index, query in enumerate(payload.items)
+        ]
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                NutritionBatchService._add_to_summary(summary, line)
+                yield json.dumps(line, default=str) + "\n"
+        finally:
+            # Stop remaining work if the client disconnects mid-stream
+            for task in tasks:
+                task.cancel()
+
+        summary.estimated_cost = round(summary.estimated_cost, 6)
+        summary.execution_time_seconds = round(time.time() - start_time, 4)
+        yield json.dumps({"type": "summary", "summary": summary.model_dump()}) + "\n"
@@ -6,9 +6,14 @@ from typing import Optional, List, Dict, Any, Union
 from google import genai
 from dotenv import load_dotenv
 from app.models.nutrition_output_payload import NutritionResponseModel
-from app.services.image_service import ImageService
+from app.services.image_service import ImageService, PreparedImage
 from app.services.prompt_service import PromptService
 from app.services.barcode_service import BarcodeService
+from app.services.result_cache import NutritionResultCache, nutrition_result_cache
+from app.services.perceptual_hash import dhash_from_bytes, near_duplicate_index
+from app.services.single_flight import nutrition_single_flight
+from app.services.http_client import HttpClientPool
+from app.services.upload_resolver import upload_resolver
 from app.models.nutrition_input_payload import NutritionInputPayload
 from app.models.service_response import (
     NutritionServiceResponse,
@@ -33,6 +38,8 @@ from app.exceptions import (
     low_confidence_analysis,
 )
 from app.models.error_models import ErrorCode
+from app.config.model_config import ModelCode
+from app.config.nutrition_config import nutrition_config
 from google.genai import types
 
 load_dotenv()
@@ -46,6 +53,26 @@ class NutritionService:
 
     _client = None
 
+    GEMINI_MODEL = ModelCode.GEMINI_2O_FLASH.value
+
+    GENERATION_CONFIG = {
+        "response_mime_type": "application/json",
+        "response_schema": NutritionResponseModel,
+        "temperature": 0,
+    }
+
+    BARCODE_OCR_PROMPT = "Extract the barcode number from this image. Look for any numeric barcode (UPC, EAN, etc.). Return ONLY the numeric barcode value, nothing else. If you cannot find a barcode, respond with 'NO_BARCODE'."
+
+    # CalAI exceptions are re-raised as-is so the endpoint can map them to error responses
+    PROPAGATED_EXCEPTIONS = (
+        ValidationException,
+        ImageProcessingException,
+        NutritionAnalysisException,
+        ExternalServiceException,
+        ConfigurationException,
+        BusinessLogicException,
+    )
+
     @classmethod
     def _get_client(cls) -> genai.Client:
         """Get or create the Gemini client instance with proper error handling."""
@@ -71,128 +98,46 @@ class NutritionService:
     @staticmethod
     def _handle_barcode_scan(
         query: NutritionInputPayload,
-        start_time: float
+        start_time: float,
+        image_bytes: Optional[bytes] = None,
     ) -> NutritionServiceResponse:
         """
         Handle barcode scanning by using Gemini to extract barcode 
         and looking it up in product database.
         
         Args:
-            query: NutritionInputPayload containing image URL and scan mode
+            query: NutritionInputPayload containing the image and scan mode
             start_time: Start time of the request
+            image_bytes: Image bytes already read by the caller, if any
             
         Returns:
             NutritionServiceResponse with product nutrition data
         """
         try:
             client = NutritionService._get_client()
-            
-            # Download image
-            image_path = query.imageUrl
-            if '/uploads/' in image_path:
-                filename = image_path.split('/uploads/')[-1]
-                local_file_path = os.path.join('uploads', filename)
-                
-                if not os.path.exists(local_file_path):
-                    raise ImageProcessingException(
-                        message=f"Image file not found: {filename}",
-                        error_code=ErrorCode.INTERNAL_SERVER_ERROR,
-                    )
-                
-                with open(local_file_path, 'rb') as f:
-                    image_bytes = f.read()
-            else:
-                response = requests.get(image_path, timeout=10)
-                response.raise_for_status()
-                image_bytes = response.content
-            
-            image = types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg")
-            
+
+            if image_bytes is None:
+                image_bytes = NutritionService._get_image_bytes(query)
+            # Barcodes need full resolution, so only the MIME type is corrected here
+            image = types.Part.from_bytes(
+                data=image_bytes, mime_type=ImageService.detect_mime_type(image_bytes)
+            )
+
             # Use Gemini to extract barcode number
-            ocr_prompt = "Extract the barcode number from this image. Look for any numeric barcode (UPC, EAN, etc.). Return ONLY the numeric barcode value, nothing else. If you cannot find a barcode, respond with 'NO_BARCODE'."
-            
             response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[ocr_prompt, image],
+                model=NutritionService.GEMINI_MODEL,
+                contents=[NutritionService.BARCODE_OCR_PROMPT, image],
             )
-            
-            barcode_text = response.text.strip()
-            
-            if barcode_text == "NO_BARCODE":
-                raise ValidationException(
-                    message="Could not detect barcode in image. Please ensure the barcode is clearly visible and try again.",
-                    error_code=ErrorCode.MISSING_REQUIRED_FIELD,
-                    field="barcode",
-                    suggestion="Make sure the barcode is in focus and well-lit.",
-                )
-            
-            barcode = BarcodeService.extract_barcode_from_text(barcode_text)
-            
-            if not barcode:
-                raise ValidationException(
-                    message=f"Could not parse barcode from detected text: {barcode_text}. Please try again.",
-                    error_code=ErrorCode.MISSING_REQUIRED_FIELD,
-                    field="barcode",
-                    suggestion="Ensure the barcode is clearly visible in the image.",
-                )
-            
-            print(f"🔍 Detected barcode: {barcode}")
-            
+
+            barcode = NutritionService._parse_barcode_text(response.text)
+
             # Look up product in database
             product_data = BarcodeService.lookup_product_by_barcode(barcode)
-            
-            if not product_data:
-                raise ValidationException(
-                    message=f"Product with barcode {barcode} not found in the Open Food Facts database.",
-                    error_code=ErrorCode.MISSING_REQUIRED_FIELD,
-                    field="barcode",
-                    suggestion="Try scanning a different product or use regular food scanning.",
-                )
-            
-            print(f"✅ Product found: {product_data.get('product_name')}")
-            
-            # Convert Open Food Facts data to NutritionResponseModel format
-            from app.models.nutrition_output_payload import NutritionInfo, Portion
-            
-            nutriments = product_data.get("nutriments", {})
-            
-            # Create nutrition info from product data
-            nutrition_info = NutritionInfo(
-                name=product_data.get("product_name", "Unknown Product"),
-                calories=int(nutriments.get("energy-kcal_100g", 0)),
-                protein=int(nutriments.get("proteins_100g", 0)),
-                carbs=int(nutriments.get("carbohydrates_100g", 0)),
-                fat=int(nutriments.get("fat_100g", 0)),
-                fiber=int(nutriments.get("fiber_100g", 0)),
-                healthScore=75,  # Default for packaged products
-                healthComments=f"Packaged product: {product_data.get('brands', 'Unknown brand')}"
-            )
-            
-            # Create nutrition response matching your schema
-            nutrition_data = NutritionResponseModel(
-                foodName=product_data.get("product_name", "Unknown Product"),
-                portion=Portion.GRAM,
-                portionSize=100.0,  # Open Food Facts provides per 100g/100ml
-                confidenceScore=10,  # High confidence for barcode lookup
-                ingredients=[nutrition_info],
-                primaryConcerns=[],
-                suggestAlternatives=[],
-                overallHealthScore=75,
-                overallHealthComments=f"Scanned product from barcode database. Brand: {product_data.get('brands', 'Unknown')}. Nutritional values are per 100g/100ml.",
-            )
-            
-            execution_time = time.time() - start_time
-            metadata = ServiceMetadata(
-                execution_time_seconds=round(execution_time, 4)
-            )
-            
-            return NutritionServiceResponse(
-                response=nutrition_data,
-                status=200,
-                message=f"SUCCESS - Product found: {product_data.get('product_name')}",
-                metadata=metadata,
+
+            return NutritionService._build_barcode_response(
+                barcode, product_data, start_time
             )
-            
+
         except (ValidationException, ImageProcessingException) as e:
             raise e
         except Exception as e:
@@ -202,302 +147,595 @@ class NutritionService:
             ) from e
 
     @staticmethod
-    def get_nutrition_data(
-        query: NutritionInputPayload,
+    def _parse_barcode_text(barcode_text: str) -> str:
+        """
+        Turn the Gemini OCR answer into a barcode number.
+
+        Raises:
+            ValidationException: If no barcode was detected or it cannot be parsed
+        """
+        barcode_text = barcode_text.strip()
+
+        if barcode_text == "NO_BARCODE":
+            raise ValidationException(
+                message="Could not detect barcode in image. Please ensure the barcode is clearly visible and try again.",
+                error_code=ErrorCode.MISSING_REQUIRED_FIELD,
+                field="barcode",
+                suggestion="Make sure the barcode is in focus and well-lit.",
+            )
+
+        barcode = BarcodeService.extract_barcode_from_text(barcode_text)
+
+        if not barcode:
+            raise ValidationException(
+                message=f"Could not parse barcode from detected text: {barcode_text}. Please try again.",
+                error_code=ErrorCode.MISSING_REQUIRED_FIELD,
+                field="barcode",
+                suggestion="Ensure the barcode is clearly visible in the image.",
+            )
+
+        print(f"🔍 Detected barcode: {barcode}")
+        return barcode
+
+    @staticmethod
+    def _build_barcode_response(
+        barcode: str,
+        product_data: Optional[Dict[str, Any]],
+        start_time: float,
     ) -> NutritionServiceResponse:
         """
-        Analyze food image and extract nutritional information using Gemini AI 
-        or barcode lookup with comprehensive error handling.
+        Convert an Open Food Facts product into a NutritionServiceResponse.
 
-        Args:
-            query: NutritionInputPayload containing image data and user preferences
+        Raises:
+            ValidationException: If the product was not found
+        """
+        if not product_data:
+            raise ValidationException(
+                message=f"Product with barcode {barcode} not found in the Open Food Facts database.",
+                error_code=ErrorCode.MISSING_REQUIRED_FIELD,
+                field="barcode",
+                suggestion="Try scanning a different product or use regular food scanning.",
+            )
 
-        Returns:
-            Union[NutritionServiceResponse, ErrorResponse]: Structured response with nutrition data and metadata
+        print(f"✅ Product found: {product_data.get('product_name')}")
+
+        # Convert Open Food Facts data to NutritionResponseModel format
+        from app.models.nutrition_output_payload import NutritionInfo, Portion
+        
+        nutriments = product_data.get("nutriments", {})
+        
+        # Create nutrition info from product data
+        nutrition_info = NutritionInfo(
+            name=product_data.get("product_name", "Unknown Product"),
+            calories=int(nutriments.get("energy-kcal_100g", 0)),
+            protein=int(nutriments.get("proteins_100g", 0)),
+            carbs=int(nutriments.get("carbohydrates_100g", 0)),
+            fat=int(nutriments.get("fat_100g", 0)),
+            fiber=int(nutriments.get("fiber_100g", 0)),
+            healthScore=75,  # Default for packaged products
+            healthComments=f"Packaged product: {product_data.get('brands', 'Unknown brand')}"
+        )
+        
+        # Create nutrition response matching your schema
+        nutrition_data = NutritionResponseModel(
+            foodName=product_data.get("product_name", "Unknown Product"),
+            portion=Portion.GRAM,
+            portionSize=100.0,  # Open Food Facts provides per 100g/100ml
+            confidenceScore=10,  # High confidence for barcode lookup
+            ingredients=[nutrition_info],
+            primaryConcerns=[],
+            suggestAlternatives=[],
+            overallHealthScore=75,
+            overallHealthComments=f"Scanned product from barcode database. Brand: {product_data.get('brands', 'Unknown')}. Nutritional values are per 100g/100ml.",
+        )
+        
+        execution_time = time.time() - start_time
+        metadata = ServiceMetadata(
+            execution_time_seconds=round(execution_time, 4)
+        )
+        
+        return NutritionServiceResponse(
+            response=nutrition_data,
+            status=200,
+            message=f"SUCCESS - Product found: {product_data.get('product_name')}",
+            metadata=metadata,
+        )
+
+    @staticmethod
+    def _build_image_prompt(query: NutritionInputPayload) -> str:
+        """Build the image analysis prompt for the given query."""
+        try:
+            return PromptService.get_nutrition_analysis_prompt_for_image(
+                user_message=query.food_description,
+                selectedGoal=query.selectedGoals,
+                selectedDiet=query.dietaryPreferences,
+                selectedAllergy=query.allergies,
+                imageUrl=query.imageUrl,
+            )
+        except Exception as e:
+            raise BusinessLogicException(
+                message=f"Failed to generate analysis prompt: {str(e)}",
+                error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            ) from e
+
+    @staticmethod
+    def _build_description_prompt(payload: NutritionInputPayload) -> str:
+        """Build the description analysis prompt for the given payload."""
+        try:
+            return PromptService.get_nutrition_analysis_prompt_from_description(
+                user_message=payload.food_description,
+                selectedGoal=payload.selectedGoals,
+                selectedDiet=payload.dietaryPreferences,
+                selectedAllergy=payload.allergies,
+            )
+        except Exception as e:
+            raise BusinessLogicException(
+                message=f"Failed to generate analysis prompt: {str(e)}",
+                error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            ) from e
+
+    @staticmethod
+    def _local_upload_path(image_url: str) -> Optional[str]:
+        """Return the local path for an image served by our own /uploads/ route, else None."""
+        return upload_resolver.resolve(image_url)
+
+    @staticmethod
+    def _load_image_bytes(image_url: str) -> bytes:
         """
-        start_time = time.time()
+        Load image bytes from a local upload or download them from an external URL.
+
+        Raises:
+            ImageProcessingException: If the image cannot be read or downloaded
+        """
+        # Our own uploads are read directly from disk, never through the network stack
+        local_file_path = NutritionService._local_upload_path(image_url)
+        if local_file_path:
+            return upload_resolver.read_bytes(local_file_path)
 
         try:
-            # Handle barcode scanning mode
-            if query.scanMode == "barcode":
-                return NutritionService._handle_barcode_scan(query, start_time)
+            response = HttpClientPool.get_session().get(
+                image_url, timeout=HttpClientPool.timeout()
+            )
+            response.raise_for_status()
+            return response.content
+        except requests.exceptions.RequestException as e:
+            raise ImageProcessingException(
+                message=f"Failed to download image from URL: {str(e)}",
+                error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            ) from e
 
-            # Regular food image analysis
-            try:
-                prompt = PromptService.get_nutrition_analysis_prompt_for_image(
-                    user_message=query.food_description,
-                    selectedGoal=query.selectedGoals,
-                    selectedDiet=query.dietaryPreferences,
-                    selectedAllergy=query.allergies,
-                    imageUrl=query.imageUrl,
-                )
-            except Exception as e:
-                raise BusinessLogicException(
-                    message=f"Failed to generate analysis prompt: {str(e)}",
-                    error_code=ErrorCode.INTERNAL_SERVER_ERROR,
-                ) from e
+    @staticmethod
+    def _get_image_bytes(query: NutritionInputPayload) -> bytes:
+        """
+        Get the image to analyse: inline imageData when present, else imageUrl.
 
-            client = NutritionService._get_client()
+        Raises:
+            ValidationException: If imageData is not valid base64
+            ImageProcessingException: If the image is invalid or cannot be loaded
+        """
+        if query.imageData:
+            return ImageService.getImageBytes(query.imageData)
+        return NutritionService._load_image_bytes(query.imageUrl)
 
-            image_path = query.imageUrl
-            
-            # Check if this is a local upload (contains /uploads/)
-            if '/uploads/' in image_path:
-                # Extract filename from URL and read directly from filesystem
-                filename = image_path.split('/uploads/')[-1]
-                local_file_path = os.path.join('uploads', filename)
-                
-                if not os.path.exists(local_file_path):
-                    raise ImageProcessingException(
-                        message=f"Image file not found: {filename}",
-                        error_code=ErrorCode.INTERNAL_SERVER_ERROR,
-                    )
-                
-                with open(local_file_path, 'rb') as f:
-                    image_bytes = f.read()
-            else:
-                # Download from external URL
-                try:
-                    response = requests.get(image_path, timeout=10)
-                    response.raise_for_status()
-                    image_bytes = response.content
-                except requests.exceptions.RequestException as e:
-                    raise ImageProcessingException(
-                        message=f"Failed to download image from URL: {str(e)}",
-                        error_code=ErrorCode.INTERNAL_SERVER_ERROR,
-                    ) from e
+    @staticmethod
+    def _translate_gemini_error(e: Exception) -> Exception:
+        """Map a Gemini client error to the matching CalAI exception."""
+        error_message = str(e).lower()
+
+        if "rate limit" in error_message or "quota" in error_message:
+            return ExternalServiceException(
+                message="API rate limit exceeded. Please try again later.",
+                error_code=ErrorCode.API_RATE_LIMIT_EXCEEDED,
+                service_name="Gemini AI",
+                retry_after=60,
+            )
+        elif "authentication" in error_message or "api key" in error_message:
+            return api_key_invalid("Google Gemini AI")
+        elif "timeout" in error_message:
+            return ExternalServiceException(
+                message="Request to Gemini AI timed out. Please try again.",
+                error_code=ErrorCode.EXTERNAL_SERVICE_TIMEOUT,
+                service_name="Gemini AI",
+            )
+        return gemini_api_error(message=f"Gemini AI service error: {str(e)}")
 
-            image = types.Part.from_bytes(data=image_bytes, mime_type="image/jpeg")
+    @staticmethod
+    def _build_success_response(
+        response: Any, start_time: float
+    ) -> NutritionServiceResponse:
+        """
+        Parse a structured Gemini response and attach token usage metadata.
 
-            try:
-                response = client.models.generate_content(
-                    config={
-                        "response_mime_type": "application/json",
-                        "response_schema": NutritionResponseModel,
-                        "temperature": 0,
-                    },
-                    model="gemini-2.0-flash",
-                    contents=[prompt, image],
+        Raises:
+            NutritionAnalysisException: If the response has no parsable nutrition data
+        """
+        try:
+            input_token_count = response.usage_metadata.prompt_token_count  # type: ignore
+            output_token_count = response.usage_metadata.candidates_token_count  # type: ignore
+            total_token_count = response.usage_metadata.total_token_count  # type: ignore
+            total_cost = calculate_cost(input_token_count, output_token_count)
+        except Exception as e:
+            input_token_count = 0
+            output_token_count = 0
+            total_token_count = 0
+            total_cost = 0.0
+
+        try:
+            nutrition_data = response.parsed
+
+            if not nutrition_data:
+                raise NutritionAnalysisException(
+                    message="No nutrition data received from analysis service",
+                    error_code=ErrorCode.INTERNAL_SERVER_ERROR,
                 )
-            except Exception as e:
-                error_message = str(e).lower()
-
-                if "rate limit" in error_message or "quota" in error_message:
-                    raise ExternalServiceException(
-                        message="API rate limit exceeded. Please try again later.",
-                        error_code=ErrorCode.API_RATE_LIMIT_EXCEEDED,
-                        service_name="Gemini AI",
-                        retry_after=60,
-                    ) from e
-                elif "authentication" in error_message or "api key" in error_message:
-                    raise api_key_invalid("Google Gemini AI")
-                elif "timeout" in error_message:
-                    raise ExternalServiceException(
-                        message="Request to Gemini AI timed out. Please try again.",
-                        error_code=ErrorCode.EXTERNAL_SERVICE_TIMEOUT,
-                        service_name="Gemini AI",
-                    ) from e
-                else:
-                    raise gemini_api_error(
-                        message=f"Gemini AI service error: {str(e)}"
-                    ) from e
 
+            print("Parsed response from Gemini:", nutrition_data)
+
+        except NutritionAnalysisException:
+            raise
+        except Exception as e:
+            raise NutritionAnalysisException(
+                message=f"Failed to parse nutrition analysis results: {str(e)}",
+                error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            ) from e
+
+        execution_time = time.time() - start_time
+
+        metadata = ServiceMetadata(
+            input_token_count=input_token_count,
+            output_token_count=output_token_count,
+            total_token_count=total_token_count,
+            estimated_cost=total_cost,
+            execution_time_seconds=round(execution_time, 4),
+        )
+
+        return NutritionServiceResponse(
+            response=nutrition_data,
+            status=200,
+            message="SUCCESS",
+            metadata=metadata,
+        )
+
+    @staticmethod
+    def _build_internal_error_response(
+        e: Exception, start_time: float
+    ) -> ErrorResponse:
+        """Wrap an unexpected error into an ErrorResponse."""
+        execution_time = time.time() - start_time
+        metadata = ServiceMetadata(execution_time_seconds=round(execution_time, 4))
+
+        return ErrorResponse(
+            response="",
+            status=500,
+            message=f"Internal server error: {str(e)}",
+            metadata=metadata,
+        )
+
+    @staticmethod
+    def _request_key(
+        image_bytes: Optional[bytes], query: NutritionInputPayload
+    ) -> str:
+        """Key identifying an analysis by its image and prompt inputs."""
+        return NutritionResultCache.build_key(
+            image_bytes, query, NutritionService.GEMINI_MODEL
+        )
+
+    @staticmethod
+    def _build_coalesced_response(
+        result: NutritionServiceResponse,
+        shared: bool,
+        image_url: Optional[str],
+        start_time: float,
+    ) -> NutritionServiceResponse:
+        """
+        Mark how a result was obtained through the single-flight layer.
+
+        Callers that joined another request's upstream call get their own copy
+        of the shared result, carrying their own image URL and timing. Only the
+        request that made the call carries its token counts and cost, so usage
+        summed over responses counts each upstream call once.
+        """
+        if shared:
+            result = result.model_copy(deep=True)
+            if image_url is not None:
+                result.response.imageUrl = image_url
+            result.metadata.input_token_count = 0
+            result.metadata.output_token_count = 0
+            result.metadata.total_token_count = 0
+            result.metadata.estimated_cost = 0.0
+            result.metadata.execution_time_seconds = round(time.time() - start_time, 4)
+
+        result.metadata.coalesced = shared
+        result.metadata.coalesced_requests = nutrition_single_flight.coalesced
+        return result
+
+    @staticmethod
+    def _build_cached_response(
+        cached: NutritionResponseModel,
+        query: NutritionInputPayload,
+        start_time: float,
+        near_duplicate_distance: Optional[int] = None,
+    ) -> NutritionServiceResponse:
+        """Wrap a reused analysis result into a zero-token response."""
+        # The image URL is echoed in the result but is not part of the key
+        nutrition_data = cached.model_copy(update={"imageUrl": query.imageUrl})
+
+        execution_time = time.time() - start_time
+        metadata = ServiceMetadata(
+            input_token_count=0,
+            output_token_count=0,
+            total_token_count=0,
+            estimated_cost=0.0,
+            execution_time_seconds=round(execution_time, 4),
+            cache_hit=True,
+            cache_hits=nutrition_result_cache.hits,
+            cache_misses=nutrition_result_cache.misses,
+            near_duplicate_distance=near_duplicate_distance,
+        )
+
+        return NutritionServiceResponse(
+            response=nutrition_data,
+            status=200,
+            message="SUCCESS",
+            metadata=metadata,
+        )
+
+    @staticmethod
+    def _get_cached_response(
+        cache_key: Optional[str], query: NutritionInputPayload, start_time: float
+    ) -> Optional[NutritionServiceResponse]:
+        """Serve a previous analysis of the same image and inputs, if cached."""
+        if cache_key is None:
+            return None
+
+        cached = nutrition_result_cache.get(cache_key)
+        if cached is None:
+            return None
+
+        return NutritionService._build_cached_response(cached, query, start_time)
+
+    @staticmethod
+    def _near_duplicate_scope(query: NutritionInputPayload) -> Optional[str]:
+        """Scope for near-duplicate lookups: the user plus the prompt inputs."""
+        if near_duplicate_index is None or not query.userId:
+            return None
+        prompt_key = NutritionResultCache.build_key(
+            None, query, NutritionService.GEMINI_MODEL
+        )
+        return f"{query.userId}:{prompt_key}"
+
+    @staticmethod
+    def _prepare_image(
+        image_bytes: bytes, query: NutritionInputPayload
+    ) -> PreparedImage:
+        """
+        Downscale and re-encode the image for Gemini, computing its perceptual
+        hash from the same decode when near-duplicate reuse applies.
+        """
+        compute_phash = NutritionService._near_duplicate_scope(query) is not None
+
+        if nutrition_config.image_preprocessing_enabled:
+            return ImageService.prepare_for_analysis(
+                image_bytes,
+                max_edge=nutrition_config.image_max_edge,
+                quality=nutrition_config.image_jpeg_quality,
+                compute_phash=compute_phash,
+            )
+
+        prepared = PreparedImage(
+            data=image_bytes,
+            mime_type=ImageService.detect_mime_type(image_bytes),
+            original_size_bytes=len(image_bytes),
+        )
+        if compute_phash:
             try:
-                input_token_count = response.usage_metadata.prompt_token_count  # type: ignore
-                output_token_count = response.usage_metadata.candidates_token_count  # type: ignore
-                total_token_count = response.usage_metadata.total_token_count  # type: ignore
-                total_cost = calculate_cost(input_token_count, output_token_count)
+                prepared.phash = dhash_from_bytes(image_bytes)
             except Exception as e:
-                input_token_count = 0
-                output_token_count = 0
-                total_token_count = 0
-                total_cost = 0.0
+                # An undecodable image still goes to Gemini, it just is not indexed
+                print(f"Could not compute perceptual hash: {e}")
+        return prepared
 
-            try:
-                nutrition_data = response.parsed
+    @staticmethod
+    def _get_near_duplicate_response(
+        phash: Optional[int], query: NutritionInputPayload, start_time: float
+    ) -> Optional[NutritionServiceResponse]:
+        """Serve the result of a recent, nearly identical photo from the same user."""
+        if phash is None:
+            return None
+
+        match = near_duplicate_index.find(
+            NutritionService._near_duplicate_scope(query), phash
+        )
+        if match is None:
+            return None
+
+        cached, distance = match
+        return NutritionService._build_cached_response(
+            cached, query, start_time, near_duplicate_distance=distance
+        )
 
-                if not nutrition_data:
-                    raise NutritionAnalysisException(
-                        message="No nutrition data received from analysis service",
-                        error_code=ErrorCode.INTERNAL_SERVER_ERROR,
-                    )
+    @staticmethod
+    def _store_near_duplicate(
+        phash: Optional[int],
+        query: NutritionInputPayload,
+        result: NutritionServiceResponse,
+    ) -> None:
+        """Index a fresh analysis result under the image's perceptual hash."""
+        if phash is None:
+            return
+        near_duplicate_index.add(
+            NutritionService._near_duplicate_scope(query), phash, result.response
+        )
 
-                print("Parsed response from Gemini:", nutrition_data)
+    @staticmethod
+    def _record_prepared_image(
+        prepared_image: PreparedImage, result: NutritionServiceResponse
+    ) -> None:
+        """Report what was actually sent to Gemini on the response metadata."""
+        result.metadata.image_mime_type = prepared_image.mime_type
+        result.metadata.image_original_bytes = prepared_image.original_size_bytes
+        result.metadata.image_sent_bytes = len(prepared_image.data)
 
-            except NutritionAnalysisException:
-                raise
-            except Exception as e:
-                raise NutritionAnalysisException(
-                    message=f"Failed to parse nutrition analysis results: {str(e)}",
-                    error_code=ErrorCode.INTERNAL_SERVER_ERROR,
-                ) from e
+    @staticmethod
+    def _store_cached_response(
+        cache_key: Optional[str], result: NutritionServiceResponse
+    ) -> None:
+        """Store a fresh analysis result and record the miss on its metadata."""
+        if cache_key is None:
+            return
+
+        nutrition_result_cache.set(cache_key, result.response)
+        result.metadata.cache_hit = False
+        result.metadata.cache_hits = nutrition_result_cache.hits
+        result.metadata.cache_misses = nutrition_result_cache.misses
 
-            execution_time = time.time() - start_time
+    @staticmethod
+    def _analyze_image(
+        prompt: str,
+        image_bytes: bytes,
+        request_key: str,
+        query: NutritionInputPayload,
+        start_time: float,
+    ) -> NutritionServiceResponse:
+        """
+        Analyze an image, reusing cached or near-duplicate results when possible.
 
-            metadata = ServiceMetadata(
-                input_token_count=input_token_count,
-                output_token_count=output_token_count,
-                total_token_count=total_token_count,
-                estimated_cost=total_cost,
-                execution_time_seconds=round(execution_time, 4),
-            )
+        Raises:
+            CalAI exceptions from preprocessing, the Gemini call or response parsing
+        """
+        cache_key = request_key if nutrition_result_cache.enabled else None
+        cached_response = NutritionService._get_cached_response(
+            cache_key, query, start_time
+        )
+        if cached_response:
+            return cached_response
+
+        prepared_image = NutritionService._prepare_image(image_bytes, query)
+        phash = prepared_image.phash
+        near_duplicate_response = NutritionService._get_near_duplicate_response(
+            phash, query, start_time
+        )
+        if near_duplicate_response:
+            return near_duplicate_response
+
+        client = NutritionService._get_client()
+        image = types.Part.from_bytes(
+            data=prepared_image.data, mime_type=prepared_image.mime_type
+        )
 
-            return NutritionServiceResponse(
-                response=nutrition_data,
-                status=200,
-                message="SUCCESS",
-                metadata=metadata,
+        try:
+            response = client.models.generate_content(
+                config=NutritionService.GENERATION_CONFIG,
+                model=NutritionService.GEMINI_MODEL,
+                contents=[prompt, image],
             )
+        except Exception as e:
+            raise NutritionService._translate_gemini_error(e) from e
 
-        except (
-            ValidationException,
-            ImageProcessingException,
-            NutritionAnalysisException,
-            ExternalServiceException,
-            ConfigurationException,
-            BusinessLogicException,
-        ) as e:
-            raise e
+        result = NutritionService._build_success_response(response, start_time)
+        NutritionService._record_prepared_image(prepared_image, result)
+        NutritionService._store_cached_response(cache_key, result)
+        NutritionService._store_near_duplicate(phash, query, result)
+        return result
 
-        except Exception as e:
-            execution_time = time.time() - start_time
-            metadata = ServiceMetadata(execution_time_seconds=round(execution_time, 4))
-
-            return ErrorResponse(
-                response="",
-                status=500,
-                message=f"Internal server error: {str(e)}",
-                metadata=metadata,
+    @staticmethod
+    def _analyze_description(
+        prompt: str, start_time: float
+    ) -> NutritionServiceResponse:
+        """Analyze a food description with Gemini."""
+        client = NutritionService._get_client()
+
+        try:
+            response = client.models.generate_content(
+                config=NutritionService.GENERATION_CONFIG,
+                model=NutritionService.GEMINI_MODEL,
+                contents=prompt,
             )
+        except Exception as e:
+            raise NutritionService._translate_gemini_error(e) from e
+
+        return NutritionService._build_success_response(response, start_time)
 
     @staticmethod
-    def log_food_nutrition_data_using_description(
-        payload: NutritionInputPayload,
+    def get_nutrition_data(
+        query: NutritionInputPayload,
+        image_bytes: Optional[bytes] = None,
     ) -> NutritionServiceResponse:
         """
-        Log food nutrition data using a description with proper error handling.
-        This function is a placeholder for future implementation.
+        Analyze food image and extract nutritional information using Gemini AI 
+        or barcode lookup with comprehensive error handling.
 
         Args:
-            payload: NutritionInputPayload containing image data and metadata
+            query: NutritionInputPayload containing image data and user preferences
+            image_bytes: Image bytes already read by the caller (e.g. a multipart
+                upload); otherwise imageData or imageUrl from the query is used
 
         Returns:
-            LogNutritionResponse: Response indicating success/failure of logging operation
+            Union[NutritionServiceResponse, ErrorResponse]: Structured response with nutrition data and metadata
         """
         start_time = time.time()
 
         try:
-
-            try:
-                prompt = PromptService.get_nutrition_analysis_prompt_from_description(
-                    user_message=payload.food_description,
-                    selectedGoal=payload.selectedGoals,
-                    selectedDiet=payload.dietaryPreferences,
-                    selectedAllergy=payload.allergies,
+            # Handle barcode scanning mode
+            if query.scanMode == "barcode":
+                return NutritionService._handle_barcode_scan(
+                    query, start_time, image_bytes
                 )
-            except Exception as e:
-                raise BusinessLogicException(
-                    message=f"Failed to generate analysis prompt: {str(e)}",
-                    error_code=ErrorCode.INTERNAL_SERVER_ERROR,
-                ) from e
 
-            client = NutritionService._get_client()
+            # Regular food image analysis
+            prompt = NutritionService._build_image_prompt(query)
+
+            if image_bytes is None:
+                image_bytes = NutritionService._get_image_bytes(query)
+
+            # Identical requests already in flight (e.g. client retries) share one call
+            request_key = NutritionService._request_key(image_bytes, query)
+            result, shared = nutrition_single_flight.do(
+                f"image:{request_key}",
+                lambda: NutritionService._analyze_image(
+                    prompt, image_bytes, request_key, query, start_time
+                ),
+            )
+            return NutritionService._build_coalesced_response(
+                result, shared, query.imageUrl, start_time
+            )
 
-            try:
-                response = client.models.generate_content(
-                    config={
-                        "response_mime_type": "application/json",
-                        "response_schema": NutritionResponseModel,
-                        "temperature": 0,
-                    },
-                    model="gemini-2.0-flash",
-                    contents=prompt,
-                )
-            except Exception as e:
-                error_message = str(e).lower()
-
-                if "rate limit" in error_message or "quota" in error_message:
-                    raise ExternalServiceException(
-                        message="API rate limit exceeded. Please try again later.",
-                        error_code=ErrorCode.API_RATE_LIMIT_EXCEEDED,
-                        service_name="Gemini AI",
-                        retry_after=60,
-                    ) from e
-                elif "authentication" in error_message or "api key" in error_message:
-                    raise api_key_invalid("Google Gemini AI")
-                elif "timeout" in error_message:
-                    raise ExternalServiceException(
-                        message="Request to Gemini AI timed out. Please try again.",
-                        error_code=ErrorCode.EXTERNAL_SERVICE_TIMEOUT,
-                        service_name="Gemini AI",
-                    ) from e
-                else:
-                    raise gemini_api_error(
-                        message=f"Gemini AI service error: {str(e)}"
-                    ) from e
+        except NutritionService.PROPAGATED_EXCEPTIONS as e:
+            raise e
 
-            try:
-                input_token_count = response.usage_metadata.prompt_token_count  # type: ignore
-                output_token_count = response.usage_metadata.candidates_token_count  # type: ignore
-                total_token_count = response.usage_metadata.total_token_count  # type: ignore
-                total_cost = calculate_cost(input_token_count, output_token_count)
-            except Exception as e:
-                input_token_count = 0
-                output_token_count = 0
-                total_token_count = 0
-                total_cost = 0.0
+        except Exception as e:
+            return NutritionService._build_internal_error_response(e, start_time)
 
-            try:
-                nutrition_data = response.parsed
+    @staticmethod
+    def log_food_nutrition_data_using_description(
+        payload: NutritionInputPayload,
+    ) -> NutritionServiceResponse:
+        """
+        Log food nutrition data using a description with proper error handling.
+        This function is a placeholder for future implementation.
 
-                if not nutrition_data:
-                    raise NutritionAnalysisException(
-                        message="No nutrition data received from analysis service",
-                        error_code=ErrorCode.INTERNAL_SERVER_ERROR,
-                    )
+        Args:
+            payload: NutritionInputPayload containing image data and metadata
 
-            except NutritionAnalysisException:
-                raise
-            except Exception as e:
-                raise NutritionAnalysisException(
-                    message=f"Failed to parse nutrition analysis results: {str(e)}",
-                    error_code=ErrorCode.INTERNAL_SERVER_ERROR,
-                ) from e
+        Returns:
+            LogNutritionResponse: Response indicating success/failure of logging operation
+        """
+        start_time = time.time()
 
-            execution_time = time.time() - start_time
+        try:
+            prompt = NutritionService._build_description_prompt(payload)
 
-            metadata = ServiceMetadata(
-                input_token_count=input_token_count,
-                output_token_count=output_token_count,
-                total_token_count=total_token_count,
-                estimated_cost=total_cost,
-                execution_time_seconds=round(execution_time, 4),
+            request_key = NutritionService._request_key(None, payload)
+            result, shared = nutrition_single_flight.do(
+                f"description:{request_key}",
+                lambda: NutritionService._analyze_description(prompt, start_time),
             )
-
-            return NutritionServiceResponse(
-                response=nutrition_data,
-                status=200,
-                message="SUCCESS",
-                metadata=metadata,
+            return NutritionService._build_coalesced_response(
+                result, shared, None, start_time
             )
 
-        except (
-            ValidationException,
-            ImageProcessingException,
-            NutritionAnalysisException,
-            ExternalServiceException,
-            ConfigurationException,
-            BusinessLogicException,
-        ) as e:
+        except NutritionService.PROPAGATED_EXCEPTIONS as e:
             raise e
 
         except Exception as e:
-            execution_time = time.time() - start_time
-            metadata = ServiceMetadata(execution_time_seconds=round(execution_time, 4))
-
-            return ErrorResponse(
-                response="",
-                status=500,
-                message=f"Internal server error: {str(e)}",
-                metadata=metadata,
-            )
\ No newline at end of file
+            return NutritionService._build_internal_error_response(e, start_time)
@@ -0,0 +1,139 @@
+import io
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Optional, Tuple
+
+from PIL import Image
+
+from app.config.nutrition_config import NutritionConfig, nutrition_config
+from app.models.nutrition_output_payload import NutritionResponseModel
+
+DHASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash
+
+
+def dhash(image: Image.Image, hash_size: int = DHASH_SIZE) -> int:
+    """
+    Compute the difference hash of an image.
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale thumbnail and
+    each bit records whether a pixel is brighter than its right neighbour. Small
+    changes in framing, exposure or compression flip only a few bits.
+    """
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def dhash_from_bytes(image_bytes: bytes, hash_size: int = DHASH_SIZE) -> int:
+    """Decode image bytes and compute their difference hash."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # JPEG can decode straight to a reduced scale, which is all dHash needs
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        return dhash(image, hash_size)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
+
+
+class PerceptualHashIndex:
+    """
+    Per-scope index of recently analysed images keyed by perceptual hash.
+
+    A scope is one user plus the inputs that change the prompt, so a near match
+    is only reused for the same person asking the same question. Each scope
+    keeps its most recent entries; the least recently used scopes are dropped
+    once max_scopes is reached.
+    """
+
+    def __init__(
+        self,
+        max_distance: int = 6,
+        max_entries_per_scope: int = 50,
+        max_scopes: int = 10_000,
+        ttl_seconds: int = 24 * 60 * 60,
+    ):
+        self.max_distance = max_distance
+        self.max_entries_per_scope = max_entries_per_scope
+        self.max_scopes = max_scopes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._scopes: "OrderedDict[str, Deque[Tuple[int, float, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def find(
+        self, scope: str, phash: int
+    ) -> Optional[Tuple[NutritionResponseModel, int]]:
+        """
+        Return the closest cached result within max_distance and its distance.
+        """
+        now = time.monotonic()
+        best: Optional[Tuple[int, str]] = None
+
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries:
+                self._scopes.move_to_end(scope)
+                for entry_hash, expires_at, value in entries:
+                    if expires_at < now:
+                        continue
+                    distance = hamming_distance(phash, entry_hash)
+                    if distance <= self.max_distance and (
+                        best is None or distance < best[0]
+                    ):
+                        best = (distance, value)
+                        if distance == 0:
+                            break
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        distance, value = best
+        return NutritionResponseModel.model_validate_json(value), distance
+
+    def add(self, scope: str, phash: int, result: NutritionResponseModel) -> None:
+        """Record an analysed image under scope."""
+        entry = (phash, time.monotonic() + self.ttl_seconds, result.model_dump_json())
+
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries is None:
+                entries = deque(maxlen=self.max_entries_per_scope)
+                self._scopes[scope] = entries
+            self._scopes.move_to_end(scope)
+            entries.append(entry)
+
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._scopes.clear()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._scopes.values())
+
+
+def create_phash_index(config: NutritionConfig) -> Optional[PerceptualHashIndex]:
+    """Create the near-duplicate index, or None when disabled."""
+    if not config.near_duplicate_enabled:
+        return None
+    return PerceptualHashIndex(
+        max_distance=config.near_duplicate_max_distance,
+        max_entries_per_scope=config.near_duplicate_max_images_per_user,
+        ttl_seconds=config.result_cache_ttl_seconds,
+    )
+
+
+near_duplicate_index = create_phash_index(nutrition_config)
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config.nutrition_config import NutritionConfig, nutrition_config
+from app.models.nutrition_input_payload import NutritionInputPayload
+from app.models.nutrition_output_payload import NutritionResponseModel
+
+
+class CacheBackend(ABC):
+    """Storage backend for serialized nutrition results."""
+
+    # Whether get/set do blocking I/O, and so must not run on the event loop
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the stored value for key, or None if missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: str) -> None:
+        """Store value under key."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry."""
+
+
+class InMemoryLRUCache(CacheBackend):
+    """
+    Thread-safe in-process LRU cache with a per-entry TTL.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: int = 24 * 60 * 60):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache(CacheBackend):
+    """
+    On-disk cache that stores one JSON file per key, sharded by key prefix.
+    Survives restarts and is shared by every worker process on the host.
+    Expiry is based on the file modification time.
+    """
+
+    blocking = True
+
+    def __init__(self, directory: str, ttl_seconds: int = 24 * 60 * 60):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            if os.path.getmtime(path) + self.ttl_seconds < time.time():
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear(self) -> None:
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    os.remove(os.path.join(root, name))
+
+
+class NutritionResultCache:
+    """
+    Content-addressed cache of nutrition analysis results.
+
+    Keys combine a hash of the image bytes with every input that changes the
+    prompt, so a rescan of the same photo with the same preferences is served
+    without calling Gemini.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend]):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @property
+    def blocking(self) -> bool:
+        """Whether get/set do file I/O; async callers run them in a worker thread."""
+        return self.backend is not None and self.backend.blocking
+
+    @staticmethod
+    def build_key(
+        image_bytes: Optional[bytes], query: NutritionInputPayload, model: str
+    ) -> str:
+        """Build the cache key for an analysis request."""
+        image_digest = hashlib.sha256(image_bytes).hexdigest() if image_bytes else ""
+        prompt_inputs = json.dumps(
+            [
+                query.food_description,
+                query.selectedGoals,
+                query.dietaryPreferences,
+                query.allergies,
+                query.scanMode,
+                model,
+            ],
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(
+            f"{image_digest}:{prompt_inputs}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[NutritionResponseModel]:
+        """Return the cached result for key and update the hit/miss counters."""
+        if not self.enabled:
+            return None
+
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return NutritionResponseModel.model_validate_json(value)
+
+    def set(self, key: str, result: NutritionResponseModel) -> None:
+        """Store a successful analysis result."""
+        if not self.enabled:
+            return
+        self.backend.set(key, result.model_dump_json())
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_result_cache(config: NutritionConfig) -> NutritionResultCache:
+    """Create the result cache for the configured backend."""
+    if config.result_cache_backend == "disk":
+        backend = DiskCache(config.result_cache_dir, config.result_cache_ttl_seconds)
+    elif config.result_cache_backend == "memory":
+        backend = InMemoryLRUCache(
+            config.result_cache_max_entries, config.result_cache_ttl_seconds
+        )
+    else:
+        backend = None
+    return NutritionResultCache(backend)
+
+
+nutrition_result_cache = create_result_cache(nutrition_config)
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _LeaderCancelled(Exception):
+    """Set on a shared call whose leader was cancelled, so a waiter takes over."""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the work; callers arriving while it is in
+    flight wait for the same result or exception instead of repeating it. Sync
+    callers (threads) and async callers (event loop) share one table, so a
+    retry arriving on either path joins the call already running.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join_or_lead(self, key: str) -> Tuple[Future, bool]:
+        """Return the in-flight future for key and whether the caller must run the work."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+
+            future = Future()
+            # A running future cannot be cancelled by a waiter going away
+            future.set_running_or_notify_cancel()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent sync callers with the same key.
+
+        Returns:
+            Tuple of the result and whether it was shared from another caller
+        """
+        while True:
+            future, leader = self._join_or_lead(key)
+            if not leader:
+                try:
+                    return future.result(), True
+                except _LeaderCancelled:
+                    # The leading call was cancelled; take over instead of failing
+                    continue
+
+            try:
+                result = fn()
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                self._finish(key, future)
+
+    async def do_async(
+        self, key: str, fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Await fn once for all concurrent callers with the same key.
+
+        Returns:
+            Tuple of the result and whether it was shared from another caller
+        """
+        while True:
+            future, leader = self._join_or_lead(key)
+            if not leader:
+                try:
+                    # Shield so a waiter being cancelled leaves the shared call alone
+                    return await asyncio.shield(asyncio.wrap_future(future)), True
+                except _LeaderCancelled:
+                    # The leading call was cancelled; take over instead of failing
+                    continue
+
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                future.set_exception(_LeaderCancelled())
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                self._finish(key, future)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+nutrition_single_flight = SingleFlight()
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config.upload_config import UploadConfig, upload_config
+from app.services.upload_resolver import UploadResolver, upload_resolver
+from app.services.upload_store import TEMP_DIR, TEMP_SUFFIXES, temp_file
+
+# Append-only log of "<pinned at>\t<name>" lines; the last line for a name wins
+PINNED_LOG = ".pinned.log"
+# The whole pinned set, as written by earlier versions; migrated into the log
+LEGACY_PINNED_FILE = ".pinned.json"
+# Pinning an image again only appends to the log once its pin is this old
+PIN_REFRESH_SECONDS = 24 * 60 * 60
+# Temporary files from interrupted uploads are removed once this old
+STALE_PART_SECONDS = 60 * 60
+
+
+@dataclass
+class _StoredFile:
+    name: str
+    path: str
+    size: int
+    modified: float
+    accessed: float
+
+
+class UploadJanitor:
+    """
+    Background eviction for the uploads directory.
+
+    Each sweep removes files older than the maximum age, then removes the least
+    recently accessed files until the directory fits the total size limit.
+    Pinned files (images sent in chat) are never removed. A pin lasts
+    pin_ttl_seconds from the last time the image was sent, so images of
+    abandoned chats become evictable again. Pins are appended to a log in the
+    uploads directory, so pinning costs one short write and survives restarts;
+    sweeps drop expired pins and compact the log.
+    """
+
+    def __init__(self, config: UploadConfig, resolver: UploadResolver):
+        self.upload_dir = config.upload_dir
+        self.max_age_seconds = config.max_age_seconds
+        self.max_total_bytes = config.max_total_bytes
+        self.sweep_interval_seconds = config.sweep_interval_seconds
+        self.pin_ttl_seconds = config.pin_ttl_seconds
+        self.resolver = resolver
+
+        self.sweeps = 0
+        self.files_removed = 0
+        self.bytes_reclaimed = 0
+        self.stored_files = 0
+        self.stored_bytes = 0
+        self.last_sweep_at: Optional[float] = None
+        self.last_sweep_seconds: Optional[float] = None
+
+        self._lock = threading.Lock()
+        # Name -> when it was last pinned
+        self._pinned: Optional[Dict[str, float]] = None
+        self._log_lines = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def _pinned_log_path(self) -> str:
+        return os.path.join(self.upload_dir, PINNED_LOG)
+
+    def _expired(self, pinned_at: float, now: float) -> bool:
+        return self.pin_ttl_seconds > 0 and now - pinned_at > self.pin_ttl_seconds
+
+    def _load_pinned(self) -> Dict[str, float]:
+        """Pinned names and when they were pinned, loaded from disk on first use."""
+        if self._pinned is not None:
+            return self._pinned
+
+        self._pinned = {}
+        self._log_lines = 0
+        try:
+            with open(self._pinned_log_path) as f:
+                for line in f:
+                    pinned_at, _, name = line.rstrip("\n").partition("\t")
+                    try:
+                        self._pinned[name] = float(pinned_at)
+                    except ValueError:
+                        continue
+                    self._log_lines += 1
+        except OSError:
+            pass
+        # Unpinned names are logged with time 0
+        self._pinned = {name: at for name, at in self._pinned.items() if at > 0}
+
+        legacy_path = os.path.join(self.upload_dir, LEGACY_PINNED_FILE)
+        try:
+            with open(legacy_path) as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            legacy = []
+        if legacy:
+            now = time.time()
+            self._append_pins([(name, now) for name in legacy if name not in self._pinned])
+            os.unlink(legacy_path)
+        return self._pinned
+
+    def _append_pins(self, pins: List[Tuple[str, float]]) -> None:
+        """Record pins in memory and append them to the log. Called with the lock held."""
+        if not pins:
+            return
+        with open(self._pinned_log_path, "a") as f:
+            f.writelines(f"{pinned_at}\t{name}\n" for name, pinned_at in pins)
+        self._log_lines += len(pins)
+        for name, pinned_at in pins:
+            if pinned_at > 0:
+                self._pinned[name] = pinned_at
+            else:
+                self._pinned.pop(name, None)
+
+    def _compact_pins(self, now: float) -> List[str]:
+        """
+        Drop expired pins, rewriting the log once it is mostly stale lines.
+        Called with the lock held.
+
+        Returns:
+            List[str]: The names still pinned
+        """
+        pinned = self._load_pinned()
+        for name in [name for name, at in pinned.items() if self._expired(at, now)]:
+            del pinned[name]
+
+        if self._log_lines > 2 * len(pinned) + 100:
+            fd, temp_path = temp_file(self.upload_dir, ".pinned")
+            with os.fdopen(fd, "w") as f:
+                f.writelines(f"{at}\t{name}\n" for name, at in pinned.items())
+            os.replace(temp_path, self._pinned_log_path)
+            self._log_lines = len(pinned)
+        return list(pinned)
+
+    def pin(self, name: str) -> None:
+        """Protect an upload from eviction for pin_ttl_seconds. Blocking; appends to the pin log."""
+        now = time.time()
+        with self._lock:
+            pinned_at = self._load_pinned().get(name)
+            if pinned_at is None or now - pinned_at > PIN_REFRESH_SECONDS:
+                self._append_pins([(name, now)])
+
+    def unpin(self, name: str) -> None:
+        """Make an upload eligible for eviction again."""
+        with self._lock:
+            if name in self._load_pinned():
+                self._append_pins([(name, 0)])
+
+    def pin_url(self, image_url: str) -> None:
+        """
+        Pin the upload behind an image URL, if the URL points at our uploads.
+        Blocking; call it from a worker thread.
+        """
+        name = self.resolver.upload_name(image_url)
+        if name and self.resolver.store.path_for(name):
+            self.pin(name)
+
+    def _scan(self) -> List[_StoredFile]:
+        """All stored files; stale temporary files are removed on the way."""
+        files = []
+        now = time.time()
+        temp_dir = os.path.join(self.upload_dir, TEMP_DIR)
+        for root, _, filenames in os.walk(self.upload_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+                # Earlier versions wrote temporary files next to the uploads
+                if root == temp_dir or filename.endswith(TEMP_SUFFIXES):
+                    if now - stat.st_mtime > STALE_PART_SECONDS:
+                        # Unlinked directly: the temporary directory itself stays
+                        try:
+                            os.unlink(path)
+                        except FileNotFoundError:
+                            pass
+                    continue
+                if filename in (PINNED_LOG, LEGACY_PINNED_FILE):
+                    continue
+
+                name = os.path.relpath(path, self.upload_dir).replace(os.sep, "/")
+                files.append(
+                    _StoredFile(name, path, stat.st_size, stat.st_mtime, stat.st_atime)
+                )
+        return files
+
+    def _remove(self, path: str) -> int:
+        """Delete a file and its emptied shard directories; return the bytes freed."""
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            return 0
+
+        directory = os.path.dirname(path)
+        while os.path.abspath(directory) != os.path.abspath(self.upload_dir):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+        return size
+
+    def sweep(self) -> Dict[str, int]:
+        """
+        Run one eviction pass. Blocking; called from a worker thread.
+
+        Returns:
+            dict: Files removed and bytes reclaimed by this pass
+        """
+        start = time.time()
+        with self._lock:
+            pinned = set(self._compact_pins(start))
+
+        files = self._scan()
+        removed = 0
+        reclaimed = 0
+        kept = []
+
+        for stored in files:
+            expired = (
+                self.max_age_seconds > 0
+                and start - stored.modified > self.max_age_seconds
+                and stored.name not in pinned
+            )
+            if expired:
+                reclaimed += self._remove(stored.path)
+                removed += 1
+            else:
+                kept.append(stored)
+
+        total = sum(stored.size for stored in kept)
+        count = len(kept)
+        if self.max_total_bytes > 0 and total > self.max_total_bytes:
+            # Least recently accessed first
+            candidates = sorted(
+                (stored for stored in kept if stored.name not in pinned),
+                key=lambda stored: max(stored.accessed, stored.modified),
+            )
+            for stored in candidates:
+                if total <= self.max_total_bytes:
+                    break
+                reclaimed += self._remove(stored.path)
+                total -= stored.size
+                count -= 1
+                removed += 1
+
+        self.sweeps += 1
+        self.files_removed += removed
+        self.bytes_reclaimed += reclaimed
+        self.stored_files = count
+        self.stored_bytes = total
+        self.last_sweep_at = start
+        self.last_sweep_seconds = round(time.time() - start, 4)
+
+        if removed:
+            print(f"🧹 Upload janitor removed {removed} files ({reclaimed} bytes)")
+        return {"files_removed": removed, "bytes_reclaimed": reclaimed}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                print(f"Upload janitor sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval_seconds)
+
+    def start(self) -> None:
+        """Start sweeping in the background. Called on application startup."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background sweeps. Called on application shutdown."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Eviction metrics for the health check."""
+        # Not loaded from disk here: the health check runs on the event loop
+        with self._lock:
+            pinned = len(self._pinned) if self._pinned is not None else None
+        return {
+            "sweeps": self.sweeps,
+            "files_removed": self.files_removed,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "stored_files": self.stored_files,
+            "stored_bytes": self.stored_bytes,
+            "pinned_files": pinned,
+            "pin_ttl_seconds": self.pin_ttl_seconds,
+            "max_total_bytes": self.max_total_bytes,
+            "max_age_seconds": self.max_age_seconds,
+            "last_sweep_at": self.last_sweep_at,
+            "last_sweep_seconds": self.last_sweep_seconds,
+        }
+
+
+upload_janitor = UploadJanitor(upload_config, upload_resolver)
@@ -0,0 +1,103 @@
+import os
+from typing import List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from app.config.upload_config import UploadConfig, upload_config
+from app.services.upload_store import UploadStore, upload_store
+from app.exceptions import ImageProcessingException
+from app.models.error_models import ErrorCode
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class UploadResolver:
+    """
+    Maps image URLs that point back at this server's /uploads/ route to files
+    in the uploads store, so the pipeline reads them from disk instead of
+    downloading them from itself.
+    """
+
+    def __init__(self, config: UploadConfig, store: UploadStore):
+        self.store = store
+        self._origins = [
+            self._parse_origin(url) for url in [config.base_url, *config.url_aliases]
+        ]
+
+    @staticmethod
+    def _parse_origin(url: str) -> Tuple[str, Optional[int], str]:
+        """Split a base URL into (host, port, uploads path prefix)."""
+        parts = urlsplit(url)
+        port = parts.port or DEFAULT_PORTS.get(parts.scheme)
+        return (parts.hostname or "").lower(), port, parts.path.rstrip("/") + "/uploads/"
+
+    def upload_name(self, image_url: str) -> Optional[str]:
+        """Return the file name under /uploads/ if the URL is one of ours, else None."""
+        parts = urlsplit(image_url)
+
+        if not parts.netloc:
+            # Relative URL such as /uploads/<name>
+            prefixes: List[str] = [origin[2] for origin in self._origins]
+        else:
+            host = (parts.hostname or "").lower()
+            port = parts.port or DEFAULT_PORTS.get(parts.scheme)
+            prefixes = [
+                prefix
+                for origin_host, origin_port, prefix in self._origins
+                if origin_host == host and origin_port == port
+            ]
+
+        for prefix in prefixes:
+            if parts.path.startswith(prefix):
+                return unquote(parts.path[len(prefix):])
+        return None
+
+    def resolve(self, image_url: str) -> Optional[str]:
+        """
+        Resolve an image URL to a local upload path.
+
+        Args:
+            image_url: The image URL from the request
+
+        Returns:
+            str: The local file path, or None if the URL is not served by this server
+
+        Raises:
+            ImageProcessingException: If the URL is ours but the file is missing or invalid
+        """
+        name = self.upload_name(image_url)
+        if name is None:
+            return None
+
+        # Only names the store issues are accepted, so nothing can escape the uploads directory
+        local_file_path = self.store.path_for(name)
+        if local_file_path is None:
+            raise ImageProcessingException(
+                message=f"Invalid upload path: {name}",
+                error_code=ErrorCode.INVALID_INPUT,
+            )
+
+        if not os.path.isfile(local_file_path):
+            raise ImageProcessingException(
+                message=f"Image file not found: {name}",
+                error_code=ErrorCode.INTERNAL_SERVER_ERROR,
+            )
+
+        self.store.record_access(local_file_path)
+        return local_file_path
+
+    @staticmethod
+    def read_bytes(local_file_path: str) -> bytes:
+        """
+        Read an upload with one unbuffered read into a buffer sized from fstat,
+        avoiding the intermediate copies of a buffered read.
+        """
+        with open(local_file_path, "rb", buffering=0) as f:
+            size = os.fstat(f.fileno()).st_size
+            data = f.read(size)
+            if len(data) < size:
+                # Short read (e.g. the file is still being written): fetch the rest
+                data += f.readall()
+            return data
+
+
+upload_resolver = UploadResolver(upload_config, upload_store)
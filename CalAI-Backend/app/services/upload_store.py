@@ -0,0 +1,374 @@
+import asyncio
+import glob
+import hashlib
+import os
+import re
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Tuple
+
+from app.config.upload_config import UploadConfig, upload_config
+from app.services.image_service import ImageService
+from app.services.multipart_stream import (
+    MultipartStream,
+    check_body_size,
+    check_content_length,
+)
+from app.services.single_flight import SingleFlight
+from app.exceptions import ValidationException, image_too_large
+from app.models.error_models import ErrorCode
+
+SAFE_EXTENSION = re.compile(r"^[A-Za-z0-9]{1,8}$")
+SHA256_HEX = re.compile(r"^[0-9a-f]{64}$")
+# Content-addressed names: two shard levels from the hash, then <sha256>.<ext>
+STORED_NAME = re.compile(r"^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})\.[A-Za-z0-9]{1,8}$")
+# Files written before the store was content-addressed: flat <uuid4>.<ext>
+LEGACY_NAME = re.compile(r"^[A-Za-z0-9_-]+\.[A-Za-z0-9]{1,8}$")
+# Rendered thumbnails: <upload_dir>/.thumbnails/<size>/<name without extension>.jpg
+THUMBNAIL_DIR = ".thumbnails"
+# Files being written: <upload_dir>/.tmp/<random>.part, outside every servable name
+TEMP_DIR = ".tmp"
+# Suffixes of temporary files, never served even if found outside TEMP_DIR
+TEMP_SUFFIXES = (".part", ".pinned")
+
+
+def temp_file(upload_dir: str, suffix: str) -> Tuple[int, str]:
+    """
+    Create a temporary file in the store's temporary directory.
+
+    It is on the same filesystem as the store, so the finished file can be
+    moved into place with os.replace.
+
+    Returns:
+        Tuple[int, str]: An open file descriptor and the file's path
+    """
+    temp_dir = os.path.join(upload_dir, TEMP_DIR)
+    os.makedirs(temp_dir, exist_ok=True)
+    return tempfile.mkstemp(dir=temp_dir, suffix=suffix)
+
+
+@dataclass
+class StoredUpload:
+    """An upload written to the uploads store."""
+
+    filename: str
+    path: str
+    size_bytes: int
+    sha256: str
+    deduplicated: bool = False
+
+
+class _UploadWriter:
+    """
+    Blocking chunked writer of one upload into the store; every method runs in
+    a worker thread. The size limit is enforced and the hash computed as the
+    bytes arrive, into a temporary name so a rejected or failed upload never
+    appears under /uploads.
+    """
+
+    def __init__(self, store: "UploadStore"):
+        self.store = store
+        self.digest = hashlib.sha256()
+        self.header = b""
+        self.size = 0
+        fd, self.temp_path = temp_file(store.upload_dir, ".part")
+        self.target = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.store.max_bytes:
+            raise image_too_large(
+                message=f"Upload exceeds maximum allowed size ({self.store.max_bytes / (1024*1024):.0f} MB)",
+                image_size=self.size,
+            )
+        if len(self.header) < 16:
+            self.header += chunk[: 16 - len(self.header)]
+        self.digest.update(chunk)
+        self.target.write(chunk)
+
+    def abort(self) -> None:
+        self.target.close()
+        if os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+
+    def finish(
+        self, client_filename: Optional[str], expected_sha256: Optional[str]
+    ) -> StoredUpload:
+        """Move the written file to its content-addressed name, or drop it if already stored."""
+        self.target.close()
+        size = self.size
+        if size == 0:
+            raise ValidationException(
+                message="Uploaded image is empty",
+                error_code=ErrorCode.MISSING_REQUIRED_FIELD,
+                field="image",
+                constraint="required",
+                suggestion="Please attach an image file",
+            )
+
+        sha256 = self.digest.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise ValidationException(
+                message="Uploaded content does not match the provided SHA-256",
+                field="X-Content-SHA256",
+                value=expected_sha256,
+                constraint="sha256_match",
+                suggestion="Send the hex SHA-256 of the exact file bytes, or omit the header",
+            )
+
+        name = self.store.stored_name(sha256, self.store._extension(self.header, client_filename))
+        path = os.path.join(self.store.upload_dir, *name.split("/"))
+
+        if os.path.exists(path):
+            os.unlink(self.temp_path)
+            self.store._refresh(path)
+            return StoredUpload(
+                filename=name, path=path, size_bytes=size, sha256=sha256, deduplicated=True
+            )
+
+        # Concurrent uploads of the same content replace each other with identical bytes
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.temp_path, path)
+        except FileNotFoundError:
+            # The janitor removed the shard directory after it was emptied; recreate it
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.temp_path, path)
+        return StoredUpload(filename=name, path=path, size_bytes=size, sha256=sha256)
+
+
+class UploadStore:
+    """
+    Content-addressed store for uploaded images.
+
+    Files are named by their SHA-256 and sharded as ab/cd/<sha256>.<ext>, so
+    identical images are stored once and no directory grows without bound.
+    Uploads are parsed from the request body as it streams in and written in
+    fixed-size chunks from a worker thread, so a large upload neither sits in
+    memory as a whole nor blocks the event loop. The size limit is enforced and
+    the hash computed while the bytes stream through.
+    """
+
+    def __init__(self, config: UploadConfig):
+        self.upload_dir = config.upload_dir
+        self.max_bytes = config.max_upload_bytes
+        self.chunk_size = config.chunk_size_bytes
+        self.thumbnail_quality = config.thumbnail_quality
+        self._thumbnail_renders = SingleFlight()
+
+    @staticmethod
+    def _extension(header: bytes, filename: Optional[str]) -> str:
+        """Extension from the detected image format, else the client's filename, else jpg."""
+        detected_format = ImageService.detect_image_format(header)
+        if detected_format:
+            return "jpg" if detected_format == "jpeg" else detected_format
+
+        if filename and "." in filename:
+            extension = filename.rsplit(".", 1)[-1].lower()
+            if SAFE_EXTENSION.match(extension):
+                return extension
+        return "jpg"
+
+    @staticmethod
+    def stored_name(sha256: str, extension: str) -> str:
+        """Relative name of a stored file, also used as its /uploads/ URL path."""
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}"
+
+    def path_for(self, name: str) -> Optional[str]:
+        """
+        Local path for a name under /uploads/, or None if the name is not valid.
+
+        Accepts content-addressed names and legacy flat names; anything else,
+        including temporary files and path traversal attempts, is rejected.
+        """
+        if not (STORED_NAME.match(name) or LEGACY_NAME.match(name)):
+            return None
+        if name.endswith(TEMP_SUFFIXES):
+            return None
+        return os.path.join(self.upload_dir, *name.split("/"))
+
+    @staticmethod
+    def etag(name: str, stat_result: os.stat_result) -> str:
+        """
+        Strong entity tag for a stored file.
+
+        Content-addressed names carry their SHA-256; legacy files are never
+        rewritten, so their modification time and size identify the content.
+        """
+        match = STORED_NAME.match(name)
+        if match:
+            return match.group(3)
+        return f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+
+    def thumbnail_path(self, name: str, size: int) -> str:
+        """Local path of the thumbnail of a stored file at the given size."""
+        stem = name.rsplit(".", 1)[0]
+        return os.path.join(self.upload_dir, THUMBNAIL_DIR, str(size), *stem.split("/")) + ".jpg"
+
+    def _render_thumbnail(self, path: str, thumbnail_path: str, size: int) -> str:
+        """Blocking render of a thumbnail into the cache; runs in a worker thread."""
+        with open(path, "rb") as f:
+            thumbnail = ImageService.make_thumbnail(f.read(), size, self.thumbnail_quality)
+
+        fd, temp_path = temp_file(self.upload_dir, ".part")
+        try:
+            with os.fdopen(fd, "wb") as target:
+                target.write(thumbnail)
+            os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+            os.replace(temp_path, thumbnail_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return thumbnail_path
+
+    async def thumbnail(self, name: str, path: str, size: int) -> str:
+        """
+        Path of the cached thumbnail of a stored file, rendering it on first use.
+
+        Concurrent requests for the same missing thumbnail share one render.
+
+        Args:
+            name: Name of the stored file under /uploads/
+            path: Local path of the stored file
+            size: Maximum edge of the thumbnail in pixels
+
+        Returns:
+            str: Local path of the JPEG thumbnail
+
+        Raises:
+            ImageProcessingException: If the stored file is not a readable image
+        """
+        thumbnail_path = self.thumbnail_path(name, size)
+        if os.path.exists(thumbnail_path):
+            return thumbnail_path
+
+        result, _ = await self._thumbnail_renders.do_async(
+            thumbnail_path,
+            lambda: asyncio.to_thread(self._render_thumbnail, path, thumbnail_path, size),
+        )
+        return result
+
+    @staticmethod
+    def record_access(path: str) -> None:
+        """
+        Stamp the file's access time, which orders eviction by last access.
+
+        Explicit utime works even on noatime/relatime mounts, where reads alone
+        would not update it.
+        """
+        try:
+            os.utime(path, (time.time(), os.stat(path).st_mtime))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _refresh(path: str) -> None:
+        """Restart the age of content that was uploaded again."""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def find(self, sha256: str) -> Optional[StoredUpload]:
+        """Return the stored upload with this hash, if any."""
+        sha256 = sha256.lower()
+        if not SHA256_HEX.match(sha256):
+            return None
+
+        shard_dir = os.path.join(self.upload_dir, sha256[:2], sha256[2:4])
+        for path in glob.glob(os.path.join(shard_dir, f"{sha256}.*")):
+            if path.endswith(TEMP_SUFFIXES):
+                continue
+            self._refresh(path)
+            return StoredUpload(
+                filename=os.path.relpath(path, self.upload_dir).replace(os.sep, "/"),
+                path=path,
+                size_bytes=os.path.getsize(path),
+                sha256=sha256,
+                deduplicated=True,
+            )
+        return None
+
+    def check_content_length(self, content_length: Optional[str]) -> None:
+        """
+        Reject a request whose announced body cannot hold an upload within the limit.
+
+        Raises:
+            ImageProcessingException: If Content-Length exceeds the size limit
+                plus room for the multipart framing
+        """
+        check_content_length(content_length, self.max_bytes)
+
+    async def _write_pending(
+        self, writer: Optional[_UploadWriter], stream: MultipartStream
+    ) -> Optional[_UploadWriter]:
+        """Write the parsed file bytes, opening the temporary file on the first ones."""
+        if not stream.pending_bytes:
+            return writer
+        if writer is None:
+            writer = await asyncio.to_thread(_UploadWriter, self)
+        await asyncio.to_thread(writer.write, stream.take_pending())
+        return writer
+
+    async def save_multipart(
+        self,
+        body: AsyncIterator[bytes],
+        content_type: str,
+        field_name: str = "image",
+        expected_sha256: Optional[str] = None,
+    ) -> StoredUpload:
+        """
+        Store the file field of a multipart/form-data body as it streams in.
+
+        The body is parsed chunk by chunk and the file bytes are written to disk
+        as they arrive, so an oversize upload is rejected as soon as it crosses
+        the limit, without the rest of the body being read or written anywhere.
+
+        Args:
+            body: The raw request body, e.g. request.stream()
+            content_type: The request's Content-Type, carrying the boundary
+            field_name: The form field holding the file
+            expected_sha256: Hash announced by the client; when that content is
+                already stored the body is not read at all
+
+        Returns:
+            StoredUpload: Where the content is stored, its size and SHA-256
+
+        Raises:
+            ValidationException: If the body is not multipart, has no file field,
+                is empty or does not match expected_sha256
+            ImageProcessingException: If the upload exceeds the size limit
+        """
+        if expected_sha256:
+            existing = await asyncio.to_thread(self.find, expected_sha256)
+            if existing:
+                return existing
+
+        stream = MultipartStream(content_type, field_name)
+        writer: Optional[_UploadWriter] = None
+        body_size = 0
+        try:
+            async for chunk in body:
+                body_size += len(chunk)
+                check_body_size(body_size, self.max_bytes)
+                stream.write(chunk)
+                # Hand file bytes to the disk thread once chunk_size have been parsed
+                if stream.pending_bytes >= self.chunk_size:
+                    writer = await self._write_pending(writer, stream)
+            stream.finalize()
+            writer = await self._write_pending(writer, stream)
+
+            stream.require_file()
+            if writer is None:
+                # The part was present but empty; finish() reports it
+                writer = await asyncio.to_thread(_UploadWriter, self)
+            return await asyncio.to_thread(writer.finish, stream.filename, expected_sha256)
+        except BaseException:
+            if writer is not None:
+                await asyncio.to_thread(writer.abort)
+            raise
+
+
+upload_store = UploadStore(upload_config)
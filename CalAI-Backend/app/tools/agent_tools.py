@@ -1,15 +1,22 @@
 from pydantic_ai import Agent, RunContext
 from app.models.nutrition_input_payload import NutritionInputPayload
 from app.models.service_response import NutritionServiceResponse
-from app.services.nutrition_service import NutritionService
+from app.models.user_context import UserContext
+from app.services.async_nutrition_service import AsyncNutritionService
 
 
-def create_agent_tools(agent: Agent, user_context=None):
-    """Create and register tools with the provided agent."""
+def create_agent_tools(agent: Agent):
+    """
+    Create and register tools with the provided agent; they read the user's profile from ctx.deps.
+
+    The tools are async, so analysis runs on the event loop without blocking
+    other requests, and several tool calls from one model response run
+    concurrently, up to the run's tool_semaphore.
+    """
 
     @agent.tool
-    def calculate_nutrition_by_food_description(
-        ctx: RunContext,
+    async def calculate_nutrition_by_food_description(
+        ctx: RunContext[UserContext],
         food_description: str,
         dietary_preferences: list[str] = None,
         allergies: list[str] = None,
@@ -24,13 +31,10 @@ def create_agent_tools(agent: Agent, user_context=None):
             allergies: List of known allergies (e.g., ["nuts", "dairy"])
             health_goals: List of health goals (e.g., ["weight_loss", "muscle_gain"])
         """
-        # Use user context if available and tool parameters are not provided
-        if user_context:
-            dietary_preferences = (
-                dietary_preferences or user_context.dietary_preferences
-            )
-            allergies = allergies or user_context.allergies
-            health_goals = health_goals or user_context.selected_goals
+        # Fall back to the profile of the user being served
+        dietary_preferences = dietary_preferences or ctx.deps.dietary_preferences
+        allergies = allergies or ctx.deps.allergies
+        health_goals = health_goals or ctx.deps.selected_goals
 
         nutrition_data = NutritionInputPayload(
             food_description=food_description,
@@ -40,14 +44,14 @@ def create_agent_tools(agent: Agent, user_context=None):
             imageData=None,  # No image data from chat
         )
 
-        result = NutritionService.log_food_nutrition_data_using_description(
-            nutrition_data
-        )
-        return result
+        async with ctx.deps.tool_semaphore:
+            return await AsyncNutritionService.log_food_nutrition_data_using_description(
+                nutrition_data
+            )
 
     @agent.tool
-    def calculate_nutrition_by_image(
-        ctx: RunContext,
+    async def calculate_nutrition_by_image(
+        ctx: RunContext[UserContext],
         query: NutritionInputPayload,
     ) -> NutritionServiceResponse:
         """
@@ -56,9 +60,18 @@ def create_agent_tools(agent: Agent, user_context=None):
         Args:
             query: NutritionInputPayload containing image URL and other parameters
         """
+        query = query.model_copy(
+            update={
+                # The user being served, never one the model made up
+                "userId": ctx.deps.user_id,
+                "dietaryPreferences": query.dietaryPreferences or ctx.deps.dietary_preferences,
+                "allergies": query.allergies or ctx.deps.allergies,
+                "selectedGoals": query.selectedGoals or ctx.deps.selected_goals,
+            }
+        )
 
-        result = NutritionService.get_nutrition_data(query=query)
-        return result
+        async with ctx.deps.tool_semaphore:
+            return await AsyncNutritionService.get_nutrition_data(query=query)
 
     return [
         calculate_nutrition_by_food_description,
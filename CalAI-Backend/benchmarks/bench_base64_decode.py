@@ -0,0 +1,188 @@
+"""
+Compare base64 image decoding throughput and peak memory: the previous
+validate-then-decode path, the single-pass ImageService.getImageBytes and an
+incremental decoder fed the payload in chunks, as a streamed body would be.
+
+Each variant runs in its own subprocess so ru_maxrss reflects only that
+variant. Because loading the payload itself sets a high-water mark, the memory
+held while decoding is also reported as the tracemalloc peak of one decode,
+measured in a separate pass so tracing does not skew the timings.
+
+Usage (from CalAI-Backend/):
+    python -m benchmarks.bench_base64_decode [--size-mb 8] [--runs 10]
+"""
+
+import argparse
+import base64
+import binascii
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Optional, Union
+
+from app.services.image_service import ImageService
+
+VARIANTS = ("legacy", "single_pass", "stream")
+STREAM_CHUNK_CHARS = 64 * 1024
+
+
+def _legacy_get_image_bytes(base64_image: str) -> bytes:
+    """ImageService.getImageBytes as it was: a validating decode, then a second decode."""
+    try:
+        if len(base64.b64decode(base64_image, validate=True)) == 0:
+            raise ValueError("empty")
+    except (ValueError, binascii.Error) as e:
+        raise ValueError("invalid base64") from e
+
+    image_bytes = base64.b64decode(base64_image)
+    ImageService.validate_image_size(image_bytes)
+    ImageService.validate_image_format(image_bytes)
+    return image_bytes
+
+
+class Base64StreamDecoder:
+    """
+    Incrementally decodes base64 that arrives in chunks, validating each whole
+    4-character group as it goes.
+
+    Usage:
+        decoder = Base64StreamDecoder()
+        for chunk in chunks:
+            output.write(decoder.feed(chunk))
+        output.write(decoder.finish())
+    """
+
+    WHITESPACE = b" \t\r\n"
+
+    def __init__(self, max_decoded_bytes: Optional[int] = None):
+        self.max_decoded_bytes = max_decoded_bytes
+        self.decoded_bytes = 0
+        self._pending = b""
+        self._padded = False
+
+    def feed(self, chunk: Union[str, bytes]) -> bytes:
+        """Decode as much of the accumulated input as forms whole 4-character groups."""
+        if isinstance(chunk, str):
+            chunk = chunk.encode("ascii", errors="replace")
+        chunk = chunk.translate(None, self.WHITESPACE)
+        if not chunk:
+            return b""
+        if self._padded:
+            # Padding may only appear at the very end of the input
+            raise ValueError("invalid base64")
+
+        data = self._pending + chunk
+        usable = len(data) - len(data) % 4
+        self._pending = data[usable:]
+        return self._decode(data[:usable])
+
+    def finish(self) -> bytes:
+        """Check that the input ended on a whole group and was not empty."""
+        if self._pending or self.decoded_bytes == 0:
+            raise ValueError("invalid base64")
+        return b""
+
+    def _decode(self, data: bytes) -> bytes:
+        if not data:
+            return b""
+        try:
+            decoded = binascii.a2b_base64(data, strict_mode=True)
+        except binascii.Error as e:
+            raise ValueError("invalid base64") from e
+
+        self._padded = data.endswith(b"=")
+        self.decoded_bytes += len(decoded)
+        if self.max_decoded_bytes is not None and self.decoded_bytes > self.max_decoded_bytes:
+            raise ValueError("image too large")
+        return decoded
+
+
+def _stream_decode(base64_image: str) -> bytes:
+    decoder = Base64StreamDecoder(max_decoded_bytes=ImageService.MAX_IMAGE_SIZE)
+    output = bytearray()
+    for start in range(0, len(base64_image), STREAM_CHUNK_CHARS):
+        output += decoder.feed(base64_image[start : start + STREAM_CHUNK_CHARS])
+    output += decoder.finish()
+    image_bytes = bytes(output)
+    ImageService.validate_image_format(image_bytes)
+    return image_bytes
+
+
+def _max_rss_bytes() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _run_variant(variant: str, payload_path: str, runs: int) -> None:
+    """Child process: decode the payload runs times and print MB/s and RSS growth."""
+    with open(payload_path) as f:
+        payload = f.read()
+
+    decode = {
+        "legacy": _legacy_get_image_bytes,
+        "single_pass": ImageService.getImageBytes,
+        "stream": _stream_decode,
+    }[variant]
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        image_bytes = decode(payload)
+        del image_bytes
+    elapsed = time.perf_counter() - start
+    max_rss = _max_rss_bytes()
+
+    tracemalloc.start()
+    image_bytes = decode(payload)
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    throughput = len(payload) * runs / elapsed / 1e6
+    print(f"{throughput:.1f} {peak_alloc / 1e6:.1f} {max_rss / 1e6:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=float, default=8.0)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument("--payload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        _run_variant(args.variant, args.payload, args.runs)
+        return
+
+    # Random bytes behind a JPEG signature pass the format check and do not compress
+    image_bytes = b"\xff\xd8\xff\xe0" + os.urandom(int(args.size_mb * 1024 * 1024) - 4)
+    with tempfile.NamedTemporaryFile("w", suffix=".b64", delete=False) as f:
+        f.write(base64.b64encode(image_bytes).decode("ascii"))
+        payload_path = f.name
+
+    print(f"image={args.size_mb} MB runs={args.runs}")
+    print(f"{'variant':<12} {'MB/s (encoded)':>15} {'decode peak MB':>15} {'max RSS MB':>11}")
+    try:
+        for variant in VARIANTS:
+            output = subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.bench_base64_decode",
+                    "--variant", variant,
+                    "--payload", payload_path,
+                    "--runs", str(args.runs),
+                ],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.split()
+            throughput, peak_alloc, max_rss = (float(value) for value in output)
+            print(f"{variant:<12} {throughput:>15.1f} {peak_alloc:>15.1f} {max_rss:>11.1f}")
+    finally:
+        os.unlink(payload_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compare bytes on the wire and encoding CPU per streamed chat reply for the
+full and delta streaming modes of ChatStreamEncoder.
+
+A reply of --chars characters is fed to the encoder in --delta-chars pieces,
+roughly what Gemini emits per TextPartDelta. In full mode every line repeats
+the text so far; in delta mode lines carry only the new piece, plus a full
+snapshot every --snapshot-every deltas.
+
+Usage (from CalAI-Backend/):
+    python -m benchmarks.bench_chat_stream [--chars 1000 4000 16000] [--delta-chars 16]
+"""
+
+import argparse
+import random
+import string
+import time
+
+from app.services.chat_stream_encoder import (
+    STREAM_MODE_DELTA,
+    STREAM_MODE_FULL,
+    ChatStreamEncoder,
+)
+
+TIMESTAMP = "2025-01-01T12:00:00+00:00"
+
+
+def _reply_deltas(chars: int, delta_chars: int) -> list:
+    rng = random.Random(chars)
+    text = "".join(rng.choice(string.ascii_letters + "     ") for _ in range(chars))
+    return [text[start : start + delta_chars] for start in range(0, chars, delta_chars)]
+
+
+def _encode_reply(deltas: list, mode: str, snapshot_every: int) -> int:
+    encoder = ChatStreamEncoder(TIMESTAMP, mode=mode, snapshot_every=snapshot_every)
+    sent = 0
+    for delta in deltas:
+        sent += len(encoder.text_delta(delta))
+    sent += len(
+        encoder.message(
+            {
+                "role": "model",
+                "timestamp": TIMESTAMP,
+                "content": encoder.accumulated_text,
+                "is_final": True,
+            }
+        )
+    )
+    return sent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chars", type=int, nargs="+", default=[1000, 4000, 16000])
+    parser.add_argument("--delta-chars", type=int, default=16)
+    parser.add_argument("--snapshot-every", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"delta={args.delta_chars} chars snapshot_every={args.snapshot_every} runs={args.runs}")
+    print(f"{'reply chars':>11} {'mode':<6} {'KB sent':>10} {'CPU ms':>10}")
+    for chars in args.chars:
+        deltas = _reply_deltas(chars, args.delta_chars)
+        for mode in (STREAM_MODE_FULL, STREAM_MODE_DELTA):
+            start = time.process_time()
+            for _ in range(args.runs):
+                sent = _encode_reply(deltas, mode, args.snapshot_every)
+            cpu = (time.process_time() - start) / args.runs
+            print(f"{chars:>11} {mode:<6} {sent / 1024:>10.1f} {cpu * 1e3:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
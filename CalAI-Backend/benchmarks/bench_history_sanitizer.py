@@ -0,0 +1,217 @@
+"""
+Compare the cost of sanitizing chat history per turn: the previous
+Database._clean_messages, which re-checked the whole history on every turn,
+against HistorySanitizer, which checks a history once when it is loaded and
+then only each appended turn, through ChatHistoryCache.append.
+
+Synthetic histories are made of four-message turns (prompt, tool call, tool
+return, reply); every --orphan-every turns the tool return is missing, as
+after a run that failed midway.
+
+Usage (from CalAI-Backend/):
+    python -m benchmarks.bench_history_sanitizer [--messages 1000 5000 10000] [--runs 5]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from typing import List
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+
+from app.config.chat_config import chat_config
+from app.services.chat_history_cache import ChatHistoryCache
+from app.services.history_sanitizer import HistorySanitizer
+
+TURN_MESSAGES = 4
+
+
+def _turn(number: int, orphan: bool = False) -> List[ModelMessage]:
+    tool_call_id = f"call_{number}"
+    messages: List[ModelMessage] = [
+        ModelRequest(parts=[UserPromptPart(content=f"I ate {number} grams of rice")]),
+        ModelResponse(
+            parts=[
+                ToolCallPart(
+                    tool_name="get_nutrition_info",
+                    args={"food_name": "rice", "grams": number},
+                    tool_call_id=tool_call_id,
+                )
+            ]
+        ),
+    ]
+    if not orphan:
+        messages.append(
+            ModelRequest(
+                parts=[
+                    ToolReturnPart(
+                        tool_name="get_nutrition_info",
+                        content={"calories": number * 1.3},
+                        tool_call_id=tool_call_id,
+                    )
+                ]
+            )
+        )
+    messages.append(ModelResponse(parts=[TextPart(content=f"That is {number * 1.3:.0f} kcal.")]))
+    return messages
+
+
+def _history(message_count: int, orphan_every: int) -> List[ModelMessage]:
+    messages: List[ModelMessage] = []
+    for number in range(message_count // TURN_MESSAGES):
+        messages.extend(_turn(number, orphan=orphan_every and number % orphan_every == 1))
+    return messages
+
+
+def _legacy_clean_messages(messages: List[ModelMessage]) -> List[ModelMessage]:
+    """Database._clean_messages as it was: attribute probing, three passes, a print per part."""
+    if not messages:
+        return messages
+
+    tool_call_map = {}
+    tool_return_map = {}
+
+    for i, msg in enumerate(messages):
+        if hasattr(msg, "parts"):
+            for part in msg.parts:
+                if (
+                    hasattr(part, "tool_call_id")
+                    and hasattr(part, "tool_name")
+                    and not hasattr(part, "content")
+                ):
+                    tool_call_map[part.tool_call_id] = i
+                elif hasattr(part, "tool_call_id") and hasattr(part, "content"):
+                    tool_return_map[part.tool_call_id] = i
+
+    valid_tool_calls = set()
+    for tool_call_id in tool_call_map:
+        if (
+            tool_call_id in tool_return_map
+            and tool_call_map[tool_call_id] < tool_return_map[tool_call_id]
+        ):
+            valid_tool_calls.add(tool_call_id)
+        else:
+            print(f"Removing unpaired tool call with ID: {tool_call_id}")
+
+    cleaned_messages = []
+    for i, msg in enumerate(messages):
+        if hasattr(msg, "parts") and msg.parts:
+            valid_parts = []
+            has_valid_content = False
+
+            for part in msg.parts:
+                if not hasattr(part, "tool_call_id"):
+                    valid_parts.append(part)
+                    has_valid_content = True
+                elif hasattr(part, "tool_name") and not hasattr(part, "content"):
+                    if part.tool_call_id in valid_tool_calls:
+                        valid_parts.append(part)
+                        has_valid_content = True
+                    else:
+                        print(f"Removing tool call without response: {part.tool_call_id}")
+                elif hasattr(part, "tool_call_id") and hasattr(part, "content"):
+                    if part.tool_call_id in valid_tool_calls:
+                        valid_parts.append(part)
+                        has_valid_content = True
+                    else:
+                        print(f"Removing tool return without call: {part.tool_call_id}")
+
+            if valid_parts and has_valid_content:
+                msg.parts = valid_parts
+                cleaned_messages.append(msg)
+        else:
+            cleaned_messages.append(msg)
+
+    final_messages = []
+    pending_tool_calls = set()
+
+    for msg in cleaned_messages:
+        if hasattr(msg, "parts"):
+            msg_tool_calls = set()
+            msg_tool_returns = set()
+
+            for part in msg.parts:
+                if (
+                    hasattr(part, "tool_call_id")
+                    and hasattr(part, "tool_name")
+                    and not hasattr(part, "content")
+                ):
+                    msg_tool_calls.add(part.tool_call_id)
+                elif hasattr(part, "tool_call_id") and hasattr(part, "content"):
+                    msg_tool_returns.add(part.tool_call_id)
+
+            if msg_tool_calls:
+                pending_tool_calls.update(msg_tool_calls)
+                final_messages.append(msg)
+            elif msg_tool_returns:
+                if msg_tool_returns.issubset(pending_tool_calls):
+                    pending_tool_calls -= msg_tool_returns
+                    final_messages.append(msg)
+                else:
+                    print(
+                        f"Skipping tool return message with unmatched calls: {msg_tool_returns - pending_tool_calls}"
+                    )
+            else:
+                final_messages.append(msg)
+        else:
+            final_messages.append(msg)
+
+    print(f"Cleaned messages: {len(messages)} -> {len(final_messages)}")
+    return final_messages
+
+
+def _time_ms(function, runs: int) -> float:
+    total = 0.0
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        total += time.perf_counter() - start
+    return total / runs * 1e3
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--orphan-every", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"orphan every {args.orphan_every} turns, runs={args.runs}")
+    print(f"{'messages':>9} {'load legacy ms':>15} {'load new ms':>12} {'turn legacy ms':>15} {'turn new ms':>12}")
+    for message_count in args.messages:
+        history = _history(message_count, args.orphan_every)
+        turn = _turn(message_count)
+
+        # The legacy clean trims parts in place, so it gets a fresh history every run
+        legacy_load = 0.0
+        legacy_turn = 0.0
+        for _ in range(args.runs):
+            fresh = _history(message_count, args.orphan_every)
+            stored = _history(message_count, args.orphan_every) + _turn(message_count)
+            with contextlib.redirect_stdout(io.StringIO()):
+                legacy_load += _time_ms(lambda: _legacy_clean_messages(fresh), 1)
+                legacy_turn += _time_ms(lambda: _legacy_clean_messages(stored), 1)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            new_load = _time_ms(lambda: HistorySanitizer.sanitize(history), args.runs)
+            cache = ChatHistoryCache(chat_config)
+            cache.put("bench", HistorySanitizer.sanitize(history), 0)
+            new_turn = _time_ms(lambda: cache.append("bench", turn, 0), args.runs)
+
+        print(
+            f"{message_count:>9} {legacy_load / args.runs:>15.2f} {new_load:>12.2f} "
+            f"{legacy_turn / args.runs:>15.2f} {new_turn:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Compare per-request connections against the pooled HttpClientPool clients.
+
+A local HTTP/1.1 server stands in for the image host and Open Food Facts. It
+counts the connections it accepts and sleeps --handshake-ms on each new one to
+emulate the DNS, TCP and TLS round trips a fresh connection costs on the
+internet; requests on a kept-alive connection skip that delay.
+
+Usage (from CalAI-Backend/):
+    python -m benchmarks.bench_http_pool [--requests 200] [--handshake-ms 30]
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import requests
+
+from app.services.http_client import HttpClientPool
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    handshake_seconds = 0.0
+    body = b""
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _StandInHandler.lock:
+            _StandInHandler.connections += 1
+        time.sleep(self.handshake_seconds)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _start_server(handshake_ms: float, body_bytes: int) -> ThreadingHTTPServer:
+    _StandInHandler.handshake_seconds = handshake_ms / 1000
+    _StandInHandler.body = b"x" * body_bytes
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _bench_sync(url: str, count: int, pooled: bool) -> float:
+    session = HttpClientPool.get_session() if pooled else None
+    start = time.perf_counter()
+    for _ in range(count):
+        if pooled:
+            session.get(url, timeout=HttpClientPool.timeout()).content
+        else:
+            requests.get(url, timeout=10).content
+    return time.perf_counter() - start
+
+
+async def _bench_async(url: str, count: int, concurrency: int, pooled: bool) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch() -> None:
+        async with semaphore:
+            if pooled:
+                await HttpClientPool.get_async_client().get(url)
+            else:
+                async with httpx.AsyncClient(timeout=10) as client:
+                    await client.get(url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(fetch() for _ in range(count)))
+    elapsed = time.perf_counter() - start
+    await HttpClientPool.aclose()
+    return elapsed
+
+
+def _report(label: str, count: int, elapsed: float, connections: int) -> None:
+    print(
+        f"{label:<24} {elapsed:>8.2f} {elapsed / count * 1e3:>10.2f} "
+        f"{count / elapsed:>10.1f} {connections:>12}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=30.0)
+    parser.add_argument("--body-bytes", type=int, default=200_000)
+    args = parser.parse_args()
+
+    server = _start_server(args.handshake_ms, args.body_bytes)
+    url = f"http://127.0.0.1:{server.server_address[1]}/image.jpg"
+
+    print(
+        f"requests={args.requests} concurrency={args.concurrency} "
+        f"handshake={args.handshake_ms} ms body={args.body_bytes} bytes"
+    )
+    print(f"{'client':<24} {'total s':>8} {'ms/req':>10} {'req/s':>10} {'connections':>12}")
+
+    scenarios = [
+        ("sync requests.get", lambda: _bench_sync(url, args.requests, pooled=False)),
+        ("sync pooled session", lambda: _bench_sync(url, args.requests, pooled=True)),
+        (
+            "async client per call",
+            lambda: asyncio.run(
+                _bench_async(url, args.requests, args.concurrency, pooled=False)
+            ),
+        ),
+        (
+            "async pooled client",
+            lambda: asyncio.run(
+                _bench_async(url, args.requests, args.concurrency, pooled=True)
+            ),
+        ),
+    ]
+    for label, run in scenarios:
+        _StandInHandler.connections = 0
+        elapsed = run()
+        _report(label, args.requests, elapsed, _StandInHandler.connections)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
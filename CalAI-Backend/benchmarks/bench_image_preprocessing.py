@@ -0,0 +1,88 @@
+"""
+Compare the bytes, upload time and image tokens sent to Gemini before and after
+ImageService.prepare_for_analysis.
+
+Test images are synthetic photo-like JPEGs at common phone resolutions. Upload
+time is estimated from the --uplink-mbps bandwidth. Image tokens follow Gemini's
+tiling rule: images up to 384px on both sides cost 258 tokens, larger ones are
+split into 768x768 tiles of 258 tokens each.
+
+Usage (from CalAI-Backend/):
+    python -m benchmarks.bench_image_preprocessing [--uplink-mbps 20]
+"""
+
+import argparse
+import io
+import math
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.config.nutrition_config import nutrition_config
+from app.services.image_service import ImageService
+
+TOKENS_PER_TILE = 258
+
+
+def _estimate_image_tokens(width: int, height: int) -> int:
+    if width <= 384 and height <= 384:
+        return TOKENS_PER_TILE
+    return math.ceil(width / 768) * math.ceil(height / 768) * TOKENS_PER_TILE
+
+
+def _phone_photo(width: int, height: int) -> bytes:
+    """A plate-like scene with gradients and sensor noise, saved like a phone camera would."""
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    draw.ellipse(
+        (width * 0.2, height * 0.15, width * 0.8, height * 0.85), fill=(235, 230, 220)
+    )
+    draw.ellipse(
+        (width * 0.35, height * 0.3, width * 0.65, height * 0.7), fill=(170, 90, 40)
+    )
+    noise = Image.effect_noise((width, height), 12).convert("RGB")
+    image = Image.blend(image, noise, 0.15).filter(ImageFilter.SMOOTH)
+
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uplink-mbps", type=float, default=20.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    bytes_per_second = args.uplink_mbps * 1_000_000 / 8
+    max_edge = nutrition_config.image_max_edge
+    quality = nutrition_config.image_jpeg_quality
+
+    print(f"max_edge={max_edge} quality={quality} uplink={args.uplink_mbps} Mbps")
+    print(
+        f"{'source':>10} {'bytes in':>10} {'bytes out':>10} {'prep ms':>8} "
+        f"{'upload ms':>10} {'upload ms':>10} {'tokens':>7} {'tokens':>7}"
+    )
+    print(f"{'':>10} {'':>10} {'':>10} {'':>8} {'before':>10} {'after':>10} {'before':>7} {'after':>7}")
+
+    for width, height in ((1280, 960), (3024, 4032), (4000, 3000), (4624, 3472)):
+        data = _phone_photo(width, height)
+
+        start = time.perf_counter()
+        for _ in range(args.runs):
+            prepared = ImageService.prepare_for_analysis(data, max_edge, quality)
+        prep_seconds = (time.perf_counter() - start) / args.runs
+
+        upload_before = len(data) / bytes_per_second
+        upload_after = len(prepared.data) / bytes_per_second + prep_seconds
+
+        print(
+            f"{f'{width}x{height}':>10} {len(data):>10} {len(prepared.data):>10} "
+            f"{prep_seconds * 1e3:>8.1f} {upload_before * 1e3:>10.1f} {upload_after * 1e3:>10.1f} "
+            f"{_estimate_image_tokens(width, height):>7} "
+            f"{_estimate_image_tokens(prepared.width, prepared.height):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Compare the sync and async nutrition pipelines under concurrent load.
+
+The sync path is driven the way Starlette drives a plain `def` endpoint: through
+anyio's worker threads, capped at 40 tokens. The async path awaits
+AsyncNutritionService directly on the event loop. Gemini is replaced with a fake
+client that sleeps for a fixed latency.
+
+Usage (from CalAI-Backend/):
+    python -m benchmarks.bench_nutrition_concurrency [--latency 0.2]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+import anyio.to_thread
+
+from app.models.nutrition_input_payload import NutritionInputPayload
+from app.services.async_nutrition_service import AsyncNutritionService
+from app.services.nutrition_service import NutritionService
+from benchmarks.fakes import FakeGeminiClient
+
+STARLETTE_THREADPOOL_TOKENS = 40
+
+
+def _payload(i: int) -> NutritionInputPayload:
+    return NutritionInputPayload(food_description=f"2 boiled eggs and toast #{i}")
+
+
+async def _run_sync(concurrency: int) -> float:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = STARLETTE_THREADPOOL_TOKENS
+
+    async def one(i: int):
+        await anyio.to_thread.run_sync(
+            NutritionService.log_food_nutrition_data_using_description, _payload(i)
+        )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def _run_async(concurrency: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            AsyncNutritionService.log_food_nutrition_data_using_description(
+                _payload(i)
+            )
+            for i in range(concurrency)
+        )
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--levels", type=int, nargs="+", default=[10, 40, 100, 200])
+    args = parser.parse_args()
+
+    NutritionService._client = FakeGeminiClient(latency_seconds=args.latency)
+
+    print(f"Fake Gemini latency: {args.latency * 1000:.0f} ms")
+    print(f"{'concurrency':>12} {'sync (s)':>10} {'async (s)':>10} {'sync rps':>10} {'async rps':>10}")
+    for level in args.levels:
+        # The services print every parsed response; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync_time = asyncio.run(_run_sync(level))
+            async_time = asyncio.run(_run_async(level))
+        print(
+            f"{level:>12} {sync_time:>10.3f} {async_time:>10.3f} "
+            f"{level / sync_time:>10.1f} {level / async_time:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
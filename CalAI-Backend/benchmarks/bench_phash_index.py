@@ -0,0 +1,62 @@
+"""
+Measure near-duplicate lookup time against index size, and dHash cost per image.
+
+Lookups are a linear Hamming scan over one scope, so time grows with the number
+of images kept per user; the default of 50 keeps it in the microsecond range.
+
+Usage (from CalAI-Backend/):
+    python -m benchmarks.bench_phash_index
+"""
+
+import io
+import random
+import time
+
+from PIL import Image
+
+from app.services.perceptual_hash import PerceptualHashIndex, dhash_from_bytes
+from benchmarks.fakes import sample_nutrition_response
+
+LOOKUPS = 2000
+
+
+def _bench_lookups(size: int) -> float:
+    index = PerceptualHashIndex(max_entries_per_scope=size)
+    result = sample_nutrition_response()
+    rng = random.Random(size)
+    for _ in range(size):
+        index.add("user", rng.getrandbits(64), result)
+
+    # Random probes almost never match, so every lookup scans the full scope
+    probes = [rng.getrandbits(64) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for probe in probes:
+        index.find("user", probe)
+    return (time.perf_counter() - start) / LOOKUPS
+
+
+def _bench_dhash(width: int, height: int, runs: int = 10) -> float:
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    data = buffer.getvalue()
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        dhash_from_bytes(data)
+    return (time.perf_counter() - start) / runs
+
+
+def main() -> None:
+    print(f"{'index size':>12} {'lookup (us)':>12}")
+    for size in (10, 50, 100, 1_000, 10_000):
+        print(f"{size:>12} {_bench_lookups(size) * 1e6:>12.1f}")
+
+    print()
+    print(f"{'image':>12} {'dHash (ms)':>12}")
+    for width, height in ((1280, 960), (4032, 3024)):
+        print(f"{f'{width}x{height}':>12} {_bench_dhash(width, height) * 1e3:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Measure event-loop lag while concurrent image uploads are saved, comparing the
+previous read-everything-then-write handler with UploadStore.save_multipart,
+which parses the multipart body as it streams in, as /upload/image does now.
+
+A ticker coroutine sleeps 1 ms in a loop and records how late it wakes up;
+that lateness is the delay every other request on the loop would see. The
+legacy handler gets SpooledTemporaryFile-backed UploadFiles, as Starlette
+handed them over after parsing a multipart body; UploadStore gets the raw
+body in network-sized chunks.
+
+Usage (from CalAI-Backend/):
+    python -m benchmarks.bench_upload_event_loop [--uploads 16] [--size-mb 10]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from fastapi import UploadFile
+
+from app.config.upload_config import upload_config
+from app.services.upload_store import UploadStore
+
+TICK_SECONDS = 0.001
+# Roughly what uvicorn hands over per receive() of a request body
+BODY_CHUNK_BYTES = 64 * 1024
+BOUNDARY = "calai-bench"
+
+
+async def _legacy_save(image: UploadFile, upload_dir: str) -> None:
+    """The previous /upload/image body: one read of the whole file, written on the loop."""
+    file_extension = image.filename.split(".")[-1] if "." in image.filename else "jpg"
+    file_path = os.path.join(upload_dir, f"{uuid.uuid4()}.{file_extension}")
+    with open(file_path, "wb") as f:
+        content = await image.read()
+        f.write(content)
+
+
+def _make_upload(data: bytes) -> UploadFile:
+    # Starlette spools multipart files over 1 MB to disk
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    spooled.write(data)
+    spooled.seek(0)
+    return UploadFile(file=spooled, filename="meal.jpg")
+
+
+async def _multipart_body(data: bytes):
+    yield (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"image\"; "
+        'filename="meal.jpg"\r\nContent-Type: image/jpeg\r\n\r\n'
+    ).encode()
+    for start in range(0, len(data), BODY_CHUNK_BYTES):
+        yield data[start : start + BODY_CHUNK_BYTES]
+        # A real body arrives over the network; let other tasks run between chunks
+        await asyncio.sleep(0)
+    yield f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def _ticker(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(time.perf_counter() - start - TICK_SECONDS)
+
+
+async def _run(label: str, save, uploads: list) -> None:
+    lags: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(save(upload) for upload in uploads))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await ticker
+
+    lags_ms = sorted(lag * 1e3 for lag in lags)
+    p99 = lags_ms[int(len(lags_ms) * 0.99) - 1] if lags_ms else 0.0
+    print(
+        f"{label:<14} {elapsed:>8.2f} {statistics.median(lags_ms):>10.2f} "
+        f"{p99:>10.2f} {lags_ms[-1]:>10.2f}"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    data = os.urandom(int(args.size_mb * 1024 * 1024))
+
+    with tempfile.TemporaryDirectory() as upload_dir:
+        upload_config.upload_dir = upload_dir
+        upload_config.max_upload_bytes = len(data)
+        store = UploadStore(upload_config)
+
+        print(f"uploads={args.uploads} size={args.size_mb} MB")
+        print(f"{'handler':<14} {'total s':>8} {'lag p50 ms':>10} {'lag p99 ms':>10} {'lag max ms':>10}")
+
+        await _run(
+            "legacy",
+            lambda upload: _legacy_save(upload, upload_dir),
+            [_make_upload(data) for _ in range(args.uploads)],
+        )
+        await _run(
+            "UploadStore",
+            lambda body: store.save_multipart(
+                body, f"multipart/form-data; boundary={BOUNDARY}"
+            ),
+            [_multipart_body(data) for _ in range(args.uploads)],
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=16)
+    parser.add_argument("--size-mb", type=float, default=10.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Offline stand-ins for the Gemini client used by the benchmarks.
+
+The fakes reproduce the shape of `google.genai` responses that NutritionService
+reads (`parsed`, `text`, `usage_metadata`) and sleep for a fixed latency instead
+of calling the API, so benchmarks measure our own overhead and concurrency.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.models.nutrition_output_payload import NutritionResponseModel, Portion
+
+
+def sample_nutrition_response() -> NutritionResponseModel:
+    """A small but realistic nutrition analysis result."""
+    return NutritionResponseModel(
+        foodName="Chicken Caesar Salad",
+        portion=Portion.CUP,
+        portionSize=2.0,
+        confidenceScore=8,
+        ingredients=[],
+        primaryConcerns=[],
+        suggestAlternatives=[],
+        overallHealthScore=75,
+        overallHealthComments="Balanced meal with good protein content",
+    )
+
+
+def _fake_response():
+    return SimpleNamespace(
+        parsed=sample_nutrition_response(),
+        text="0123456789012",
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=1250,
+            candidates_token_count=450,
+            total_token_count=1700,
+        ),
+    )
+
+
+class FakeGeminiClient:
+    """Mimics `genai.Client` with `models` (blocking) and `aio.models` (async)."""
+
+    def __init__(self, latency_seconds: float = 0.2):
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(generate_content=self._generate_content_async)
+        )
+
+    def _generate_content(self, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency_seconds)
+        return _fake_response()
+
+    async def _generate_content_async(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency_seconds)
+        return _fake_response()
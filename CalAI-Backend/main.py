@@ -1,16 +1,22 @@
 import json
 import os
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import File, UploadFile
-from fastapi.staticfiles import StaticFiles
-import uuid
+from fastapi import Header
 from app.agent import agent
-from app.endpoints import nutrition
+from app.endpoints import nutrition, uploads
+from app.services.http_client import HttpClientPool
+from app.config.upload_config import upload_config
+from app.services.upload_store import upload_store
+from app.services.upload_janitor import upload_janitor
+from app.services.chat_history_cache import chat_history_cache
+from app.services.chat_database import Database
+from app.exceptions import BaseCalAIException
+from app.models.error_models import ErrorCode
 from app.utils.envManager import get_env_variable, get_env_variable_safe
 from app.middleware.exception_handlers import setup_exception_handlers
 # AFTER (Disabled):
@@ -24,7 +30,20 @@ logfire.configure(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for FastAPI app."""
+    try:
+        app.state.chat_db = await Database.connect()
+        app.state.chat_db.start()
+    except ValueError as e:
+        # Nutrition endpoints work without chat storage; chat endpoints answer 503
+        print(f"Chat database disabled: {e}")
+        app.state.chat_db = None
+    if upload_config.janitor_enabled:
+        upload_janitor.start()
     yield
+    await upload_janitor.stop()
+    if app.state.chat_db is not None:
+        await app.state.chat_db.aclose()
+    await HttpClientPool.aclose()
 
 
 isProd = get_env_variable_safe("PROD", "false").lower() == "true"
@@ -51,12 +70,40 @@ app.include_router(nutrition.router, prefix="/nutrition")
 app.include_router(agent.router, prefix="/chat")
 
 # Create uploads directory on startup
-os.makedirs("uploads", exist_ok=True)
-
-@app.post("/upload/image")
-async def upload_image(image: UploadFile = File(...)):
+os.makedirs(upload_config.upload_dir, exist_ok=True)
+
+@app.post(
+    "/upload/image",
+    # The body is parsed by the handler as it streams, so describe it here
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "required": ["image"],
+                        "properties": {"image": {"type": "string", "format": "binary"}},
+                    }
+                }
+            },
+        }
+    },
+)
+async def upload_image(
+    request: Request,
+    content_sha256: Optional[str] = Header(None, alias="X-Content-SHA256"),
+):
     """
-    Upload image and return a publicly accessible URL
+    Upload image and return a publicly accessible URL.
+
+    Images are stored by content hash; uploading content that is already stored
+    returns the existing URL. Clients may send the hex SHA-256 of the file in
+    X-Content-SHA256 to skip storing the body when the content is known.
+
+    The multipart body is read straight from the request stream: a
+    Content-Length over the limit is rejected before any of it is read, and a
+    body without one is cut off once the image crosses UPLOAD_MAX_BYTES.
     """
     try:
         # # Validate file is an image (check extension since content_type may be missing)
@@ -69,27 +116,31 @@ async def upload_image(image: UploadFile = File(...)):
         #             detail="File must be an image (jpg, jpeg, png, gif, bmp, webp)"
         #         )
         
-        # Generate unique filename
-        file_extension = image.filename.split('.')[-1] if '.' in image.filename else 'jpg'
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        file_path = os.path.join("uploads", unique_filename)
-        
-        # Save file
-        with open(file_path, "wb") as f:
-            content = await image.read()
-            f.write(content)
+        upload_store.check_content_length(request.headers.get("content-length"))
+        # Parse the body as it arrives and write the image to disk off the event loop, hashing as we go
+        stored = await upload_store.save_multipart(
+            request.stream(),
+            request.headers.get("content-type", ""),
+            field_name="image",
+            expected_sha256=content_sha256,
+        )
         
         # Return URL
         # For local: http://10.0.2.2:8000/uploads/filename.jpg
         # For production: https://your-railway-url.up.railway.app/uploads/filename.jpg
-        base_url = os.getenv("BASE_URL", "http://localhost:8000")
-        image_url = f"{base_url}/uploads/{unique_filename}"
+        image_url = f"{upload_config.base_url}/uploads/{stored.filename}"
         
         return {
             "success": True,
             "imageUrl": image_url,
-            "filename": unique_filename
+            "filename": stored.filename,
+            "size": stored.size_bytes,
+            "sha256": stored.sha256,
+            "deduplicated": stored.deduplicated,
         }
+    except BaseCalAIException as e:
+        status_code = 413 if e.error_code == ErrorCode.IMAGE_TOO_LARGE else 400
+        raise HTTPException(status_code=status_code, detail=e.message)
     except Exception as e:
         logfire.error(f"Image upload failed: {str(e)}")
         raise HTTPException(
@@ -97,8 +148,8 @@ async def upload_image(image: UploadFile = File(...)):
             detail=f"Upload failed: {str(e)}"
         )
 
-# Serve uploaded images as static files
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+# Serve uploaded images with caching headers, range requests and thumbnails
+app.include_router(uploads.router, prefix="/uploads")
 
 @app.get("/")
 async def root():
@@ -126,7 +177,18 @@ async def health_check():
         "google_api_configured": bool(os.getenv("GOOGLE_API_KEY")),
         "openai_api_configured": bool(os.getenv("OPENAI_API_KEY")),
         "supabase_configured": bool(os.getenv("SUPABASE_URL") and os.getenv("SUPABASE_KEY")),
+        "chat_storage": (
+            app.state.chat_db.storage.name if app.state.chat_db is not None else None
+        ),
+        "chat_storage_reachable": (
+            await app.state.chat_db.ping() if app.state.chat_db is not None else False
+        ),
         "environment": "production" if os.getenv("PROD", "false").lower() == "true" else "development",
+        "uploads": upload_janitor.stats(),
+        "chat_history_cache": chat_history_cache.stats(),
+        "chat_write_queue": (
+            app.state.chat_db.write_queue.stats() if app.state.chat_db is not None else None
+        ),
     }
     
     return checks